@@ -1,6 +1,7 @@
 # API 连接器包初始化文件
 # 导出所有 API 连接器类
 
+from .session import get_session, close_session
 from .base import BaseAPIConnector
 from .dify import DifyAPIConnector
 from .ragflow import RAGflowAPIConnector
@@ -9,6 +10,8 @@ from .coze import CozeAPIConnector
 from .n8n import N8NAPIConnector
 
 __all__ = [
+    'get_session',
+    'close_session',
     'BaseAPIConnector',
     'DifyAPIConnector',
     'RAGflowAPIConnector',
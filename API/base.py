@@ -4,6 +4,8 @@ from typing import Dict, Any, List, Optional, Tuple
 from abc import ABC, abstractmethod
 import time
 
+from .session import get_session
+
 class BaseAPIConnector(ABC):
     """API连接器基类"""
     
@@ -25,7 +27,7 @@ class BaseAPIConnector(ABC):
 
         for attempt in range(self.retry_count):
             try:
-                response = requests.post(url, headers=headers, json=data, timeout=self.timeout)
+                response = get_session().post(url, headers=headers, json=data, timeout=self.timeout)
                 return response
             except Exception as e:
                 last_exception = e
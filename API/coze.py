@@ -2,8 +2,8 @@ import json
 import time
 import re
 from typing import Dict, List, Tuple
-import requests
 from .base import BaseAPIConnector
+from .session import get_session
 
 class CozeAPIConnector(BaseAPIConnector):
     """Coze API连接器"""
@@ -39,7 +39,7 @@ class CozeAPIConnector(BaseAPIConnector):
             for key, value in kwargs.items():
                 if key not in data and key not in ["conversation_id", "user", "bot_id"]:
                     data[key] = value
-            response = requests.post(api_url, headers=self.headers, json=data, timeout=30)
+            response = get_session().post(api_url, headers=self.headers, json=data, timeout=30)
             if response.status_code == 200:
                 result = response.json()
                 if "messages" in result and result["messages"]:
@@ -1,11 +1,11 @@
 import json
 import time
 from typing import Dict, List, Tuple
-import requests
 
 # 兼容包导入与脚本直接运行两种方式
 try:
     from .base import BaseAPIConnector  # 包内相对导入
+    from .session import get_session
 except Exception:  # 当直接运行本文件时没有父包
     import os, sys
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -13,6 +13,7 @@ except Exception:  # 当直接运行本文件时没有父包
     if project_root not in sys.path:
         sys.path.insert(0, project_root)
     from API.base import BaseAPIConnector  # 绝对导入
+    from API.session import get_session
 
 class DifyAPIConnector(BaseAPIConnector):
     """Dify API连接器"""
@@ -56,7 +57,7 @@ class DifyAPIConnector(BaseAPIConnector):
                 "response_mode": "blocking",
                 "user": kwargs.get("user", "user_" + str(int(time.time())))
             }
-            response = requests.post(endpoint, headers=self.headers, json=data, timeout=30)
+            response = get_session().post(endpoint, headers=self.headers, json=data, timeout=30)
             if response.status_code == 200:
                 result = response.json()
                 if "answer" in result:
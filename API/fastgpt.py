@@ -1,8 +1,8 @@
 import json
 import time
 from typing import Dict, List, Tuple
-import requests
 from .base import BaseAPIConnector
+from .session import get_session
 
 class FastGPTAPIConnector(BaseAPIConnector):
     """FastGPT API连接器"""
@@ -36,7 +36,7 @@ class FastGPTAPIConnector(BaseAPIConnector):
             if "variables" in kwargs:
                 data["variables"] = kwargs["variables"]
                 
-            response = requests.post(endpoint, headers=self.headers, json=data, timeout=self.timeout)
+            response = get_session().post(endpoint, headers=self.headers, json=data, timeout=self.timeout)
             
             if response.status_code == 200:
                 result = response.json()
@@ -88,7 +88,7 @@ class FastGPTAPIConnector(BaseAPIConnector):
             if "variables" in kwargs:
                 data["variables"] = kwargs["variables"]
                 
-            response = requests.post(endpoint, headers=self.headers, json=data, timeout=self.timeout)
+            response = get_session().post(endpoint, headers=self.headers, json=data, timeout=self.timeout)
             
             if response.status_code == 200:
                 result = response.json()
@@ -1,8 +1,8 @@
 import json
 import time
 from typing import Dict, List, Tuple
-import requests
 from .base import BaseAPIConnector
+from .session import get_session
 
 class N8NAPIConnector(BaseAPIConnector):
     """N8N API连接器"""
@@ -39,7 +39,7 @@ class N8NAPIConnector(BaseAPIConnector):
                 request_url = f"{self.base_url.rstrip('/')}/api/v1/workflows/run"
                 if workflow_id:
                     request_url = f"{self.base_url.rstrip('/')}/api/v1/workflows/{workflow_id}/execute"
-            response = requests.post(request_url, headers=self.headers, json=data, timeout=30)
+            response = get_session().post(request_url, headers=self.headers, json=data, timeout=30)
             if response.status_code == 200:
                 result = response.json()
                 if isinstance(result, dict):
@@ -1,8 +1,11 @@
 import json
+import logging
 import time
 from typing import Dict, List, Tuple
-import requests
 from .base import BaseAPIConnector
+from .session import get_session
+
+logger = logging.getLogger(__name__)
 
 class RAGflowAPIConnector(BaseAPIConnector):
     """RAGflow API连接器"""
@@ -31,13 +34,12 @@ class RAGflowAPIConnector(BaseAPIConnector):
             if "session_id" in kwargs:
                 data["session_id"] = kwargs["session_id"]
             
-            print(f"[DEBUG] 发送请求到: {endpoint}")
-            print(f"[DEBUG] 请求数据: {data}")
+            logger.debug("发送请求到: %s, 请求数据: %s", endpoint, data)
             
-            response = requests.post(endpoint, headers=self.headers, json=data, timeout=self.timeout)
+            response = get_session().post(endpoint, headers=self.headers, json=data, timeout=self.timeout)
             
-            print(f"[DEBUG] 响应状态码: {response.status_code}")
-            print(f"[DEBUG] 响应内容: {response.text}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("响应状态码: %s, 响应内容: %.2000s", response.status_code, response.text)
             
             if response.status_code == 200:
                 result = response.json()
@@ -68,7 +70,7 @@ class RAGflowAPIConnector(BaseAPIConnector):
                     response_text = f"RAGflow API调用失败: HTTP {response.status_code}"
                     
         except Exception as e:
-            print(f"[DEBUG] 异常: {e}")
+            logger.warning("RAGflow 请求异常: %s", e)
             response_text = f"RAGflow API调用出错: {str(e)}"
         
         request_time = time.time() - start_time
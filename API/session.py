@@ -0,0 +1,43 @@
+"""
+共享HTTP会话：
+所有 API 连接器共用一个带连接池的 requests.Session，
+复用 TCP/TLS 连接，避免每次请求重新握手。
+链接抓取使用独立的会话（见 link_fetcher），不共享 Cookie 与连接。
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_session = None
+_lock = threading.Lock()
+
+
+def get_session(pool_connections: int = 16, pool_maxsize: int = 32) -> requests.Session:
+    """
+    获取共享的HTTP会话（首次调用时创建）
+
+    Args:
+        pool_connections: 缓存连接池的主机数
+        pool_maxsize: 每个主机的最大连接数
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def close_session():
+    """关闭共享的HTTP会话，释放连接池"""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
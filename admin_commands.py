@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+管理员指令模块
+用于注册和分发管理员指令：精确匹配走字典查找，带参数的指令走前缀树匹配，
+指令提交到执行器中异步执行（可指定与消息处理共用的串行执行器，使指令修改配置时不与消息处理并发），
+不阻塞wxauto的消息回调线程
+作者：dolphi
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_COMMAND_KEY = None  # 前缀树中保存指令对象的键
+
+
+class AdminCommand:
+    """管理员指令"""
+
+    __slots__ = ('name', 'handler', 'help', 'exact', 'show_in_help')
+
+    def __init__(self, name: str, handler: Callable, help: str = "", exact: bool = True, show_in_help: bool = True):
+        """
+        Args:
+            name: 指令名称，如 "/当前用户"
+            handler: 处理函数 handler(chat, content, arg)
+            help: 帮助说明
+            exact: True为精确匹配，False为前缀匹配（名称后面的内容作为参数）
+            show_in_help: 是否显示在指令列表中
+        """
+        self.name = name
+        self.handler = handler
+        self.help = help
+        self.exact = exact
+        self.show_in_help = show_in_help
+
+
+class CommandRegistry:
+    """管理员指令注册表"""
+
+    def __init__(self, max_workers: int = 1, executor=None):
+        """
+        初始化指令注册表
+
+        Args:
+            max_workers: 执行指令的线程数，默认为1以保证指令按顺序执行（未指定 executor 时使用）
+            executor: 执行指令的执行器（提供 submit(func, *args) 方法），None表示使用独立的指令线程
+        """
+        self._exact: Dict[str, AdminCommand] = {}   # 精确匹配指令
+        self._trie: Dict = {}                        # 前缀匹配指令的前缀树
+        self._commands: List[AdminCommand] = []      # 按注册顺序保存，用于生成帮助
+        self.max_workers = max_workers
+        self.executor = executor
+        self._executor = None
+
+    def command(self, name: str, help: str = "", exact: bool = True, aliases=()):
+        """
+        装饰器：注册指令
+
+        Args:
+            name: 指令名称
+            help: 帮助说明
+            exact: 是否精确匹配
+            aliases: 指令别名（不显示在帮助中）
+        """
+        def decorator(handler):
+            self.register(name, handler, help, exact)
+            for alias in aliases:
+                self.register(alias, handler, help, exact, show_in_help=False)
+            return handler
+        return decorator
+
+    def register(self, name: str, handler: Callable, help: str = "", exact: bool = True, show_in_help: bool = True):
+        """注册指令"""
+        command = AdminCommand(name, handler, help, exact, show_in_help)
+        if exact:
+            self._exact[name] = command
+        else:
+            node = self._trie
+            for char in name:
+                node = node.setdefault(char, {})
+            node[_COMMAND_KEY] = command
+        self._commands.append(command)
+        return command
+
+    def match(self, content: str) -> Tuple[Optional[AdminCommand], str]:
+        """
+        匹配指令
+
+        Returns:
+            (指令对象, 参数)，未匹配时返回 (None, "")
+        """
+        command = self._exact.get(content)
+        if command:
+            return command, ""
+
+        # 沿前缀树匹配最长的指令前缀
+        matched = None
+        matched_len = 0
+        node = self._trie
+        for index, char in enumerate(content):
+            node = node.get(char)
+            if node is None:
+                break
+            if _COMMAND_KEY in node:
+                matched = node[_COMMAND_KEY]
+                matched_len = index + 1
+        if matched:
+            return matched, content[matched_len:].strip()
+        return None, ""
+
+    def help_text(self, header: str = "", footer: str = "") -> str:
+        """根据注册的指令生成帮助文本"""
+        lines = [header] if header else []
+        for command in self._commands:
+            if not command.show_in_help:
+                continue
+            line = f"[{command.name}{'' if command.exact else '***'}]"
+            if command.help:
+                line += f" {command.help}"
+            lines.append(line)
+        if footer:
+            lines.append(footer)
+        return "\n".join(lines)
+
+    def dispatch(self, chat, content: str) -> bool:
+        """
+        分发指令：匹配成功后提交到执行器执行，立即返回
+
+        Returns:
+            是否匹配到指令
+        """
+        command, arg = self.match(content)
+        if command is None:
+            return False
+        executor = self.executor
+        if executor is None:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="admin_cmd")
+            executor = self._executor
+        executor.submit(self._run, command, chat, content, arg)
+        return True
+
+    def _run(self, command: AdminCommand, chat, content: str, arg: str):
+        """在执行器中执行指令"""
+        try:
+            command.handler(chat, content, arg)
+        except Exception as e:
+            logger.exception("管理员指令执行失败: %s", command.name)
+            try:
+                chat.SendMsg(f"{content} 执行失败: {e}")
+            except Exception:
+                pass
+
+    def shutdown(self):
+        """关闭指令线程（外部传入的执行器由其所有者关闭）"""
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
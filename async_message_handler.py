@@ -7,14 +7,25 @@
 """
 
 import asyncio
+import logging
 import threading
 import time
+from concurrent.futures import Future
 from datetime import datetime
 from collections import deque
-from typing import Dict, List
-import traceback
+from itertools import islice
+from typing import Dict, List, Tuple
 
 from message_processor import MessageProcessor
+from message_envelope import MessageEnvelope
+from metrics import (API_LATENCY, CACHE, ERRORS, MESSAGES, PROCESSING, QUEUE_SIZE, QUEUE_WAIT, REPLY_LATENCY,
+                     SEND_LATENCY, SHED, metrics_server, summary as metrics_summary)
+from rpa_executor import rpa, unwrap_chat
+from send_scheduler import SendScheduler
+from text_segmenter import split_text
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
 
 class AsyncMessageHandler:
     """异步消息处理器"""
@@ -33,12 +44,15 @@ class AsyncMessageHandler:
         self.max_log_lines = max_log_lines
 
         # 消息处理器
-        self.message_processor = MessageProcessor(
-            enable_ocr=self.config.get('enable_ocr', False),
-            download_path=self.config.get('download_path', './downloads')
-        )
+        self.message_processor = self._create_message_processor()
+
+        # 发送调度器（自适应发送间隔、同窗口合并发送、单窗口限速）
+        self.send_scheduler = SendScheduler(**self._sender_settings())
+
+        # 消息链路追踪
+        self._apply_tracing_config()
 
-        # 消息队列
+        # 消息队列（元素为 (priority, seq, MessageEnvelope)）
         self.message_queue = None
         self.processing_messages = {}  # 正在处理的消息 {message_id: task}
 
@@ -47,8 +61,9 @@ class AsyncMessageHandler:
         self.wx_send_lock = asyncio.Lock()  # 微信发送操作锁
         self.wx_sender_task = None  # 专用的微信发送任务
         
-        # 日志系统
+        # 日志系统：环形缓冲区，每条日志有递增序号（最新一条的序号为 log_seq）
         self.process_logs = deque(maxlen=max_log_lines)  # 自动限制行数
+        self.log_seq = 0
         self.log_lock = threading.Lock()
         
         # 事件循环
@@ -61,25 +76,119 @@ class AsyncMessageHandler:
         # API客户端（从wxbot_preview导入）
         self.client = None
         self.wx = None
+
+        self._register_metrics()
         
+    def _processor_settings(self) -> Dict:
+        """消息处理器相关的配置项（MessageProcessor 的构造参数）"""
+        return {
+            'enable_ocr': self.config.get('enable_ocr', False),
+            'download_path': self.config.get('download_path', './downloads'),
+            'ocr_workers': self.config.get('ocr_workers', 1),
+            'cache_max_mb': self.config.get('download_cache_max_mb', 2048),
+            'cache_max_age_days': self.config.get('download_cache_max_age_days', 30),
+            'enable_document': self.config.get('enable_document_extraction', True),
+            'document_max_tokens': self.config.get('document_max_tokens', 3000),
+            'document_workers': self.config.get('document_workers'),
+            'enable_stt': self.config.get('enable_stt', False),
+            'stt_engine': self.config.get('stt_engine', 'vosk'),
+            'stt_model_path': self.config.get('stt_model_path', ''),
+            'stt_workers': self.config.get('stt_workers', 1),
+            'stt_max_pending': self.config.get('stt_max_pending', 4),
+            'enable_link_fetch': self.config.get('enable_link_fetch', True),
+            'link_timeout': self.config.get('link_timeout', 8),
+            'link_max_kb': self.config.get('link_max_kb', 2048),
+            'link_cache_ttl': self.config.get('link_cache_ttl', 3600),
+        }
+
+    def _sender_settings(self) -> Dict:
+        """发送调度相关的配置项（SendScheduler 的构造参数）"""
+        return {
+            'min_gap': self.config.get('send_min_gap', 0.2),
+            'max_gap': self.config.get('send_max_gap', 5.0),
+            'initial_gap': self.config.get('send_initial_gap', 0.5),
+            'per_chat_per_minute': self.config.get('send_per_chat_per_minute', 20),
+            'per_chat_burst': self.config.get('send_per_chat_burst', 5),
+            'reorder_window': self.config.get('send_reorder_window', 8),
+            'merge_replies': self.config.get('send_merge_replies', False),
+            'merge_max_chars': self.config.get('send_merge_max_chars', 2000),
+        }
+
+    def _apply_tracing_config(self):
+        """根据配置启用/停用消息链路追踪（默认关闭，需在配置中开启 enable_tracing）"""
+        tracer.configure(enabled=self.config.get('enable_tracing', False),
+                         path=self.config.get('trace_file', 'logs/traces.jsonl'))
+
+    def _register_metrics(self):
+        """注册采集时读取的指标（队列长度、缓存命中、RPA放弃的任务等已有统计）"""
+        QUEUE_SIZE.set_function(lambda: self.message_queue.qsize() if self.message_queue else 0, queue='message')
+        QUEUE_SIZE.set_function(lambda: self.wx_send_queue.qsize() if self.wx_send_queue else 0, queue='send')
+        QUEUE_SIZE.set_function(rpa.pending, queue='rpa')
+        PROCESSING.set_function(lambda: len(self.processing_messages))
+        CACHE.set_function(lambda: self.message_processor.content_store.stats['hits'], result='hit')
+        CACHE.set_function(lambda: self.message_processor.content_store.stats['misses'], result='miss')
+        SHED.set_function(lambda: rpa.stats['expired'], reason='rpa_expired')
+        SHED.set_function(lambda: rpa.stats['cancelled'], reason='rpa_cancelled')
+
+    def _apply_metrics_config(self):
+        """根据配置启动/停止本地指标HTTP服务（默认关闭，需在配置中开启 enable_metrics）"""
+        if self.config.get('enable_metrics', False):
+            metrics_server.start(int(self.config.get('metrics_port', 9108)))
+        else:
+            metrics_server.stop()
+
+    def _create_message_processor(self) -> MessageProcessor:
+        """根据配置创建消息处理器"""
+        return MessageProcessor(**self._processor_settings())
+
+    def apply_config(self, config: Dict):
+        """
+        应用新的配置，仅在相关配置变化时重建消息处理器与发送调度器
+
+        Args:
+            config: 配置字典
+        """
+        old_settings = self._processor_settings()
+        old_sender_settings = self._sender_settings()
+        self.config = config or {}
+        self._apply_tracing_config()
+        if self.is_running:
+            self._apply_metrics_config()
+        if self._sender_settings() != old_sender_settings:
+            self.send_scheduler = SendScheduler(**self._sender_settings())
+            self.log_process("INFO", "发送调度配置已更新")
+        if self._processor_settings() != old_settings:
+            old_processor = self.message_processor
+            self.message_processor = self._create_message_processor()
+            old_processor.close()
+            self.log_process("INFO", "消息处理器配置已更新")
+
     def log_process(self, level: str, message: str, message_id: str = None):
         """
         记录处理日志
         
         Args:
-            level: 日志级别 (INFO, WARNING, ERROR)
+            level: 日志级别 (DEBUG, INFO, WARNING, ERROR)
             message: 日志信息
             message_id: 消息ID（可选）
         """
+        levelno = logging.getLevelName(level)
+        if not isinstance(levelno, int):
+            levelno = logging.INFO
+        # 级别未启用时不做任何格式化
+        if not logger.isEnabledFor(levelno):
+            return
+
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        log_entry = f"[{timestamp}][{level}]"
+        if message_id:
+            log_entry += f"[{message_id}]"
+        log_entry += f" {message}"
         with self.log_lock:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            log_entry = f"[{timestamp}][{level}]"
-            if message_id:
-                log_entry += f"[{message_id}]"
-            log_entry += f" {message}"
-            
             self.process_logs.append(log_entry)
-            print(log_entry)  # 同时输出到控制台
+            self.log_seq += 1
+        # 同时写入日志系统（文件/控制台，由后台线程批量写出）；tailed 表示界面已通过日志缓冲区显示
+        logger.log(levelno, message, extra={'message_id': message_id, 'tailed': True})
     
     def get_logs(self, lines: int = None) -> List[str]:
         """
@@ -97,6 +206,25 @@ class AsyncMessageHandler:
             else:
                 return list(self.process_logs)[-lines:]
     
+    def get_logs_since(self, cursor: int = 0) -> Tuple[List[str], int]:
+        """
+        增量获取日志：只返回序号大于 cursor 的日志，耗时与新日志条数成正比
+
+        Args:
+            cursor: 上次调用返回的游标，首次调用传0
+
+        Returns:
+            (新日志列表, 新游标)；若新日志多于缓冲区容量，只返回仍保留的部分
+        """
+        with self.log_lock:
+            count = min(self.log_seq - cursor, len(self.process_logs))
+            if count <= 0:
+                return [], self.log_seq
+            logs = list(islice(reversed(self.process_logs), count))
+            cursor = self.log_seq
+        logs.reverse()
+        return logs, cursor
+
     def clear_logs(self):
         """清空日志"""
         with self.log_lock:
@@ -108,48 +236,47 @@ class AsyncMessageHandler:
         
         Args:
             chat: 聊天对象
-            message: 消息对象
-            api_config: API配置字典
+            message: 消息信封（MessageEnvelope），也兼容wxauto消息对象
+            api_config: API配置字典，None表示使用信封上的配置
             priority: 优先级（数字越小优先级越高）
         """
-        message_id = f"{chat.who}_{int(time.time()*1000)}"
-
-        message_data = {
-            'id': message_id,
-            'chat': chat,
-            'message': message,
-            'api_config': api_config,
-            'priority': priority,
-            'timestamp': time.time(),
-            'status': 'queued'
-        }
+        envelope = MessageEnvelope.from_message(message, chat)
+        if api_config is not None:
+            envelope.api_config = api_config
+        envelope.status = 'queued'
+        envelope.mark('queued')
 
-        await self.message_queue.put((priority, message_id, message_data))
-        content_preview = getattr(message, 'content', str(message))[:50]
-        self.log_process("INFO", f"消息已加入队列: {content_preview}...", message_id)
+        # 以递增序号作为第二排序键，同优先级按到达顺序处理
+        await self.message_queue.put((priority, envelope.seq, envelope))
+        self.log_process("INFO", f"消息已加入队列(类型: {envelope.type})", envelope.message_id)
     
-    async def process_single_message(self, message_data: Dict):
+    async def process_single_message(self, envelope: MessageEnvelope):
         """
         处理单个消息
         
         Args:
-            message_data: 消息数据字典
+            envelope: 消息信封
         """
-        message_id = message_data['id']
-        chat = message_data['chat']
-        message = message_data['message']
-        api_config = message_data['api_config']
+        message_id = envelope.message_id
+        chat = envelope.chat
+        api_config = envelope.api_config
         
         try:
             # 更新处理状态
-            message_data['status'] = 'processing'
+            envelope.status = 'processing'
+            envelope.mark('processing')
+            if 'queued' in envelope.timestamps:
+                QUEUE_WAIT.observe(envelope.timestamps['processing'] - envelope.timestamps['queued'])
 
             # 使用MessageProcessor提取实际内容
-            extracted_content = self.message_processor.extract_content(message)
-            msg_type = getattr(message, 'type', 'unknown')
+            # 下载等UI操作在RPA线程中执行，OCR/文档提取/语音识别在进程池中执行，不阻塞事件循环
+            extracted_content = await self.message_processor.extract_content_async(envelope)
+            msg_type = envelope.type
+            envelope.mark('extracted')
 
             self.log_process("INFO", f"开始处理消息(类型: {msg_type})", message_id)
-            self.log_process("INFO", f"提取内容: {extracted_content[:100]}...", message_id)
+            # 消息内容只在DEBUG级别记录
+            self.log_process("DEBUG", f"提取内容: {extracted_content[:100]}...", message_id)
             
             # 立即回复处理中状态（可选）
             if hasattr(chat, 'SendMsg'):
@@ -160,6 +287,7 @@ class AsyncMessageHandler:
             start_time = time.time()
             reply = await self.call_api_async(extracted_content, api_config, message_id)
             process_time = time.time() - start_time
+            envelope.mark('api_done')
             
             self.log_process("INFO", f"API调用完成，耗时: {process_time:.2f}秒", message_id)
             
@@ -167,46 +295,58 @@ class AsyncMessageHandler:
             if len(reply) >= 2000:
                 segments = self.split_long_text(reply)
                 self.log_process("INFO", f"长消息分为 {len(segments)} 段发送", message_id)
+                envelope.pending_sends += len(segments)
                 for index, segment in enumerate(segments, 1):
                     # 加入微信发送队列而不是直接发送
                     send_data = {
                         'chat': chat,
                         'message': segment,
-                        'at_user': message.sender if hasattr(message, 'sender') and message.sender else None,
+                        'at_user': envelope.sender or None,
                         'message_id': message_id,
-                        'segment_info': f"{index}/{len(segments)}"
+                        'segment_info': f"{index}/{len(segments)}",
+                        'envelope': envelope
                     }
                     await self.wx_send_queue.put(send_data)
             else:
                 # 单条消息也加入发送队列
+                envelope.pending_sends += 1
                 send_data = {
                     'chat': chat,
                     'message': reply,
-                    'at_user': message.sender if hasattr(message, 'sender') and message.sender else None,
+                    'at_user': envelope.sender or None,
                     'message_id': message_id,
-                    'segment_info': None
+                    'segment_info': None,
+                    'envelope': envelope
                 }
                 await self.wx_send_queue.put(send_data)
                 self.log_process("INFO", f"消息已加入发送队列，长度: {len(reply)} 字符", message_id)
             
-            message_data['status'] = 'completed'
-            self.log_process("INFO", f"消息处理完成(类型: {msg_type}): {extracted_content[:50]}...", message_id)
+            envelope.mark('send_queued')
+            if envelope.status == 'processing':
+                envelope.status = 'completed'
+            self.log_process("INFO", f"消息处理完成(类型: {msg_type})", message_id)
             
         except Exception as e:
-            message_data['status'] = 'error'
+            envelope.status = 'error'
+            ERRORS.inc(stage='process', error=type(e).__name__)
             error_msg = f"消息处理失败: {str(e)}"
             self.log_process("ERROR", error_msg, message_id)
             
             # 发送错误提示给用户（也通过队列发送）
             if hasattr(chat, 'SendMsg'):
+                envelope.pending_sends += 1
                 error_send_data = {
                     'chat': chat,
                     'message': "抱歉，处理您的消息时出现错误，请稍后再试。",
                     'at_user': None,
                     'message_id': message_id,
-                    'segment_info': None
+                    'segment_info': None,
+                    'envelope': envelope
                 }
                 await self.wx_send_queue.put(error_send_data)
+                envelope.mark('send_queued')
+            elif envelope.pending_sends <= 0:
+                self._finish_message(envelope, 'error')
         
         finally:
             # 清理处理中的消息记录
@@ -225,6 +365,8 @@ class AsyncMessageHandler:
         Returns:
             API回复内容
         """
+        platform = 'unknown'
+        start_time = time.monotonic()
         try:
             platform = api_config.get('platform', 'openai').lower()
             api_key = api_config.get('api_key', '')
@@ -245,10 +387,13 @@ class AsyncMessageHandler:
                 # 默认使用OpenAI兼容API
                 response_text = await self._call_openai_api(api_key, base_url, model, prompt, content, message_id)
             
+            API_LATENCY.observe(time.monotonic() - start_time, platform=platform, status='ok')
             self.log_process("INFO", f"API调用成功，回复长度: {len(response_text)} 字符", message_id)
             return response_text
             
         except Exception as e:
+            API_LATENCY.observe(time.monotonic() - start_time, platform=platform, status='error')
+            ERRORS.inc(stage='api', error=type(e.__cause__ or e.__context__ or e).__name__)
             self.log_process("ERROR", f"API调用失败: {str(e)}", message_id)
             return "API调用出错，请稍后再试。"
     
@@ -358,65 +503,167 @@ class AsyncMessageHandler:
     
     def split_long_text(self, text: str, chunk_size: int = 2000) -> List[str]:
         """
-        分割长文本
+        分割长文本（按段落、句子等自然边界切分，代码块和表格保持完整）
         
         Args:
             text: 要分割的文本
-            chunk_size: 每段的大小
+            chunk_size: 每段的最大长度
             
         Returns:
             分割后的文本列表
         """
-        return [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
+        return split_text(text, chunk_size)
     
+    @staticmethod
+    def _send_key(send_data: Dict) -> str:
+        """发送消息所属聊天窗口的标识"""
+        chat = unwrap_chat(send_data['chat'])
+        return getattr(chat, 'who', None) or str(id(chat))
+
+    def _send_batch_sync(self, batch: List[Dict]) -> List[tuple]:
+        """
+        在RPA线程中依次发送同一聊天窗口的一批消息
+
+        Returns:
+            每条消息的 (耗时, 异常)，发送成功时异常为None
+        """
+        results = []
+        gap = self.send_scheduler.pacer.intra_batch_gap()
+        for index, send_data in enumerate(batch):
+            if index:
+                time.sleep(gap)
+            target = unwrap_chat(send_data['chat'])
+            start = time.monotonic()
+            error = None
+            try:
+                if send_data['at_user']:
+                    target.SendMsg(msg=send_data['message'], at=send_data['at_user'])
+                else:
+                    target.SendMsg(send_data['message'])
+            except Exception as e:
+                error = e
+            duration = time.monotonic() - start
+            self.send_scheduler.record(duration, error is None)
+            results.append((duration, error))
+        return results
+
+    @staticmethod
+    def _finish_message(envelope: MessageEnvelope, status: str, **attributes):
+        """消息处理结束：记录回复耗时指标并结束追踪"""
+        MESSAGES.inc(type=envelope.type, status=status)
+        stamps = envelope.timestamps
+        if 'sent' in stamps:
+            REPLY_LATENCY.observe(stamps['sent'] - stamps['received'], route=envelope.route)
+        tracer.finish(envelope, status, **attributes)
+
+    @classmethod
+    def _finish_send(cls, send_data: Dict, error=None):
+        """一条回复发送结束：消息的所有回复都发送完成后记录发送时间并结束追踪"""
+        envelope = send_data.get('envelope')
+        if not isinstance(envelope, MessageEnvelope):
+            return
+        if error is not None:
+            envelope.status = 'error'
+        envelope.pending_sends -= 1
+        if envelope.pending_sends <= 0:
+            envelope.mark('sent')
+            segment_info = send_data.get('segment_info')
+            cls._finish_message(envelope, 'error' if envelope.status == 'error' else 'ok',
+                                segments=int(segment_info.split('/')[1]) if segment_info else 1)
+
+    async def _send_batch(self, batch: List[Dict]):
+        """按调度器给出的发送间隔等待后，在RPA线程中发送一批消息（窗口限速已在取批次时处理）"""
+        chat_key = self._send_key(batch[0])
+        if not hasattr(unwrap_chat(batch[0]['chat']), 'SendMsg'):
+            for send_data in batch:
+                self._finish_send(send_data, AttributeError("SendMsg"))
+            return
+        # 可选：合并同一@对象的相邻短回复，减少UI操作次数
+        batch = self.send_scheduler.merge(batch)
+
+        delay = self.send_scheduler.delay_before(chat_key, len(batch))
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        # 使用锁确保微信操作的原子性，整批消息作为一个RPA任务执行，窗口只需激活一次
+        async with self.wx_send_lock:
+            future = rpa.submit(self._send_batch_sync, batch, name=f"send_batch:{chat_key}")
+            results = await asyncio.wrap_future(future)
+        self.send_scheduler.finish_batch()
+
+        if len(batch) > 1:
+            self.log_process("INFO", f"窗口 {chat_key} 连续发送 {len(batch)} 条消息")
+        for send_data, (duration, error) in zip(batch, results):
+            message_id = send_data.get('message_id', 'unknown')
+            SEND_LATENCY.observe(duration)
+            if error is not None:
+                ERRORS.inc(stage='send', error=type(error).__name__)
+            for original in send_data.get('merged', (send_data,)):
+                self._finish_send(original, error)
+            if 'merged' in send_data:
+                for merged_data in send_data['merged']:
+                    if error is not None:
+                        self.log_process("ERROR", f"微信发送失败（合并消息）: {str(error)}", merged_data.get('message_id', 'unknown'))
+                    else:
+                        self.log_process("INFO", f"消息已合并为一条发送（共 {len(send_data['merged'])} 条，{len(send_data['message'])} 字符），耗时: {duration:.2f}秒", merged_data.get('message_id', 'unknown'))
+            elif error is not None:
+                self.log_process("ERROR", f"微信发送失败: {str(error)}", message_id)
+            elif send_data['segment_info']:
+                self.log_process("INFO", f"发送第 {send_data['segment_info']} 段消息完成，耗时: {duration:.2f}秒", message_id)
+            else:
+                self.log_process("INFO", f"消息发送完成，长度: {len(send_data['message'])} 字符，耗时: {duration:.2f}秒", message_id)
+
     async def wx_message_sender(self):
-        """专用的微信消息发送处理器 - 串行化所有微信RPA操作"""
+        """专用的微信消息发送处理器 - 按聊天窗口重排并合并发送，发送间隔根据发送耗时与失败率自适应调整"""
         self.log_process("INFO", "微信消息发送器启动")
 
+        pending = deque()  # 已从发送队列取出、等待发送的消息
+        stopping = False
         while True:
             try:
-                # 从发送队列获取消息
-                try:
-                    send_data = await asyncio.wait_for(self.wx_send_queue.get(), timeout=1.0)
-                except asyncio.TimeoutError:
-                    # 若已请求停止且队列为空，则退出
-                    if not self.is_running and self.wx_send_queue.empty():
+                if not pending:
+                    if stopping:
                         break
-                    continue
-
-                # 哨兵：用于优雅退出
-                if send_data is None:
-                    break
-
-                # 使用锁确保微信操作的原子性
-                async with self.wx_send_lock:
+                    # 从发送队列获取消息
                     try:
-                        chat = send_data['chat']
-                        message = send_data['message']
-                        at_user = send_data['at_user']
-                        message_id = send_data['message_id']
-                        segment_info = send_data['segment_info']
-
-                        if hasattr(chat, 'SendMsg'):
-                            # 执行微信发送操作
-                            if at_user:
-                                chat.SendMsg(msg=message, at=at_user)
-                            else:
-                                chat.SendMsg(message)
+                        send_data = await asyncio.wait_for(self.wx_send_queue.get(), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        # 若已请求停止且队列为空，则退出
+                        if not self.is_running and self.wx_send_queue.empty():
+                            break
+                        continue
 
-                            # 记录发送日志
-                            if segment_info:
-                                self.log_process("INFO", f"发送第 {segment_info} 段消息完成", message_id)
-                            else:
-                                self.log_process("INFO", f"消息发送完成，长度: {len(message)} 字符", message_id)
+                    # 哨兵：用于优雅退出
+                    if send_data is None:
+                        break
+                    pending.append(send_data)
 
-                            # 微信操作间隔，避免过快操作导致问题
-                            await asyncio.sleep(0.5)
+                # 取出所有已排队的消息，以便按聊天窗口重排合并
+                while not stopping and not self.wx_send_queue.empty():
+                    send_data = self.wx_send_queue.get_nowait()
+                    if send_data is None:
+                        # 哨兵：发送完已取出的消息后退出
+                        stopping = True
+                    else:
+                        pending.append(send_data)
 
-                    except Exception as e:
-                        self.log_process("ERROR", f"微信发送失败: {str(e)}", send_data.get('message_id', 'unknown'))
-                        # 发送失败时稍微等待更长时间
-                        await asyncio.sleep(1.0)
+                batch = self.send_scheduler.take_batch(pending, self._send_key)
+                if not batch:
+                    # 所有待发送窗口都已限速：等待最早的窗口恢复令牌，期间有新消息到达时立即重新调度
+                    delay = self.send_scheduler.next_ready_delay(pending, self._send_key)
+                    if stopping:
+                        await asyncio.sleep(delay)
+                        continue
+                    try:
+                        send_data = await asyncio.wait_for(self.wx_send_queue.get(), timeout=max(0.01, delay))
+                    except asyncio.TimeoutError:
+                        continue
+                    if send_data is None:
+                        stopping = True
+                    else:
+                        pending.append(send_data)
+                    continue
+                await self._send_batch(batch)
 
             except Exception as e:
                 self.log_process("ERROR", f"微信发送器错误: {str(e)}")
@@ -424,6 +671,25 @@ class AsyncMessageHandler:
 
         self.log_process("INFO", "微信消息发送器已停止")
 
+    async def cache_maintenance_loop(self, interval: float = 600):
+        """
+        下载缓存维护循环：定期在后台线程中执行LRU淘汰，超出容量上限时提前执行
+
+        Args:
+            interval: 定期淘汰的间隔（秒）
+        """
+        loop = asyncio.get_running_loop()
+        last_run = 0.0
+        while self.is_running:
+            await asyncio.sleep(5)
+            store = self.message_processor.content_store
+            if store.needs_eviction() or time.time() - last_run >= interval:
+                last_run = time.time()
+                try:
+                    await loop.run_in_executor(None, store.evict)
+                except Exception as e:
+                    self.log_process("ERROR", f"下载缓存淘汰失败: {str(e)}")
+
     async def message_processor_loop(self):
         """消息处理主循环"""
         self.log_process("INFO", "异步消息处理器启动")
@@ -437,15 +703,15 @@ class AsyncMessageHandler:
                 
                 # 从队列获取消息（优先级队列）
                 try:
-                    _, message_id, message_data = await asyncio.wait_for(
+                    _, _, envelope = await asyncio.wait_for(
                         self.message_queue.get(), timeout=1.0
                     )
                 except asyncio.TimeoutError:
                     continue
                 
                 # 创建处理任务
-                task = asyncio.create_task(self.process_single_message(message_data))
-                self.processing_messages[message_id] = task
+                task = asyncio.create_task(self.process_single_message(envelope))
+                self.processing_messages[envelope.message_id] = task
                 
                 # 不等待任务完成，继续处理下一个消息
                 
@@ -461,6 +727,7 @@ class AsyncMessageHandler:
             return
         
         self.is_running = True
+        self._apply_metrics_config()
         
         # 创建新的事件循环
         def run_async_handler():
@@ -476,7 +743,8 @@ class AsyncMessageHandler:
             async def run_both():
                 processor_task = asyncio.create_task(self.message_processor_loop())
                 self.wx_sender_task = asyncio.create_task(self.wx_message_sender())
-                await asyncio.gather(processor_task, self.wx_sender_task)
+                cache_task = asyncio.create_task(self.cache_maintenance_loop())
+                await asyncio.gather(processor_task, self.wx_sender_task, cache_task)
 
             self.loop.run_until_complete(run_both())
         
@@ -495,12 +763,30 @@ class AsyncMessageHandler:
             task.cancel()
         
         self.processing_messages.clear()
+
+        # 释放OCR进程池
+        self.message_processor.close()
+        metrics_server.stop()
         
         if self.loop:
             self.loop.call_soon_threadsafe(self.loop.stop)
         
         self.log_process("INFO", "异步消息处理器已停止")
     
+    def transcribe_voice(self, message) -> Future:
+        """
+        在事件循环中进行语音转文字（供分发线程调用，不等待结果）
+
+        Returns:
+            转写文本的 Future，处理器未运行时结果为空字符串
+        """
+        loop = self.loop
+        if not self.is_running or loop is None or not loop.is_running():
+            future = Future()
+            future.set_result("")
+            return future
+        return asyncio.run_coroutine_threadsafe(self.message_processor.transcribe_voice_async(message), loop)
+
     def get_status(self) -> Dict:
         """获取处理器状态"""
         return {
@@ -509,7 +795,11 @@ class AsyncMessageHandler:
             'processing_count': len(self.processing_messages),
             'max_concurrent': self.max_concurrent,
             'log_lines': len(self.process_logs),
-            'max_log_lines': self.max_log_lines
+            'max_log_lines': self.max_log_lines,
+            'download_cache': self.message_processor.content_store.get_stats(),
+            'sender': self.send_scheduler.get_stats(),
+            'rpa': rpa.get_status(),
+            'metrics': metrics_summary(),
         }
 
 # 全局实例
@@ -521,27 +811,28 @@ def sync_add_message(chat, message, api_config=None):
     用于从同步代码中调用异步处理
     """
     try:
-        msg_type = getattr(message, 'type', 'unknown')
-        content_preview = getattr(message, 'content', str(message))[:50]
-        print(f"[DEBUG] sync_add_message 被调用: {chat.who} - 类型:{msg_type} - {content_preview}")
-            
+        envelope = MessageEnvelope.from_message(message, chat)
+        if api_config is not None:
+            envelope.api_config = api_config
+        logger.debug("sync_add_message 被调用: %s - 类型:%s - %.50s", chat.who, envelope.type, envelope.content)
+
         if not async_handler.is_running:
-            print("[DEBUG] 异步处理器未运行，正在启动...")
+            logger.info("异步处理器未运行，正在启动...")
             async_handler.start()
             # 等待一下让处理器启动
             time.sleep(0.5)
             
-        # 生成唯一的消息ID，避免重复处理
-        import time
-        message_id = f"{chat.who}_{int(time.time()*1000)}"
+        # 消息ID由信封生成，避免重复处理
+        message_id = envelope.message_id
             
-        print(f"[DEBUG] 消息ID: {message_id}")
-        print(f"[DEBUG] 异步处理器状态: running={async_handler.is_running}, loop={async_handler.loop is not None}")
+        logger.debug("消息ID: %s, 异步处理器状态: running=%s, loop=%s",
+                     message_id, async_handler.is_running, async_handler.loop is not None)
             
         # 检查是否已经在处理队列中
         if hasattr(async_handler, '_processing_ids'):
             if message_id in async_handler._processing_ids:
-                print(f"消息 {message_id} 已在处理队列中，跳过重复添加")
+                logger.info("消息 %s 已在处理队列中，跳过重复添加", message_id)
+                SHED.inc(reason='duplicate')
                 return
         else:
             async_handler._processing_ids = set()
@@ -551,49 +842,41 @@ def sync_add_message(chat, message, api_config=None):
             
         # 在新线程中运行异步操作
         def run_async():
-            print(f"[DEBUG] run_async 线程已启动: {message_id}")
+            logger.debug("run_async 线程已启动: %s", message_id)
             try:
                 if async_handler.loop and async_handler.loop.is_running():
-                    print(f"[DEBUG] 向事件循环添加任务: {message_id}")
                     future = asyncio.run_coroutine_threadsafe(
-                        async_handler.add_message(chat, message, api_config),
+                        async_handler.add_message(chat, envelope),
                         async_handler.loop
                     )
-                    print(f"[DEBUG] run_coroutine_threadsafe 调用完成: {message_id}")
+                    logger.debug("已向事件循环添加任务: %s", message_id)
 
                     def cleanup_callback(fut):
                         try:
-                            print(f"[DEBUG] cleanup_callback 开始执行: {message_id}")
                             async_handler._processing_ids.discard(message_id)
                             if fut.cancelled():
-                                print(f"[WARNING] 异步任务被取消: {message_id}")
+                                logger.warning("异步任务被取消: %s", message_id)
                             elif fut.exception():
                                 exc = fut.exception()
-                                print(f"[ERROR] 异步任务 '{message_id}' 异常: {exc}")
-                                traceback.print_exception(type(exc), exc, exc.__traceback__)
+                                logger.error("异步任务 '%s' 异常: %s", message_id, exc,
+                                             exc_info=(type(exc), exc, exc.__traceback__))
                             else:
-                                print(f"[DEBUG] 异步任务成功完成: {message_id}")
+                                logger.debug("异步任务成功完成: %s", message_id)
                         except Exception as e:
-                            print(f"[ERROR] cleanup_callback 自身异常: {e}")
-                            traceback.print_exc()
-                        finally:
-                            print(f"[DEBUG] cleanup_callback 执行完毕: {message_id}")
+                            logger.exception("cleanup_callback 自身异常: %s", e)
 
                     future.add_done_callback(cleanup_callback)
                 else:
-                    print(f"[ERROR] 事件循环不可用，无法处理消息: {message_id}")
+                    logger.error("事件循环不可用，无法处理消息: %s", message_id)
                     async_handler._processing_ids.discard(message_id)
 
             except Exception as e:
-                print(f"[ERROR] run_async 线程内发生严重错误: {e}")
-                traceback.print_exc()
+                logger.exception("run_async 线程内发生严重错误: %s", e)
                 async_handler._processing_ids.discard(message_id)
             
         # 在新线程中运行以避免阻塞
         threading.Thread(target=run_async, daemon=True).start()
-        print(f"[DEBUG] 已启动处理线程: {message_id}")
+        logger.debug("已启动处理线程: %s", message_id)
             
     except Exception as e:
-        print(f"[ERROR] sync_add_message 异常: {e}")
-        import traceback
-        traceback.print_exc()
\ No newline at end of file
+        logger.exception("sync_add_message 异常: %s", e)
\ No newline at end of file
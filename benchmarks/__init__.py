@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能测试工具包
+在没有微信客户端、不访问网络的环境（如Linux）中，用进程内的假微信对象与本地模拟的AI接口服务
+驱动完整的消息处理链路，测量吞吐量、延迟分布与内存占用
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.run_load --help
+作者：dolphi
+"""
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+假微信模块
+替换 wxauto（WeChat、聊天窗口、消息对象）以及只在Windows上可用的 win32clipboard / win32con，
+并替换会读取 email.txt 的 email_send；SendMsg 只记录调用并按设定的UI耗时阻塞，
+用于在没有微信客户端的环境中运行机器人的消息处理链路
+作者：dolphi
+"""
+
+import random
+import sys
+import threading
+import time
+import types
+from typing import Callable, Dict, List, Optional
+
+
+def fixed_latency(seconds: float) -> Callable[[], float]:
+    """固定耗时"""
+    return lambda: seconds
+
+
+def uniform_latency(low: float, high: float) -> Callable[[], float]:
+    """均匀分布耗时"""
+    return lambda: random.uniform(low, high)
+
+
+class SendRecord:
+    """一次 SendMsg 调用"""
+
+    __slots__ = ('who', 'msg', 'at', 'started', 'finished')
+
+    def __init__(self, who, msg, at, started, finished):
+        self.who = who
+        self.msg = msg
+        self.at = at
+        self.started = started
+        self.finished = finished
+
+
+class SendLog:
+    """所有假聊天窗口共用的发送记录"""
+
+    def __init__(self):
+        self.records: List[SendRecord] = []
+        self.concurrent_violations = 0  # SendMsg 被并发调用的次数（真实微信UI不允许）
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def begin(self):
+        with self._lock:
+            self._active += 1
+            if self._active > 1:
+                self.concurrent_violations += 1
+
+    def end(self, record: SendRecord):
+        with self._lock:
+            self._active -= 1
+            self.records.append(record)
+
+    def ui_time(self) -> float:
+        """SendMsg 累计耗时（秒）"""
+        with self._lock:
+            return sum(record.finished - record.started for record in self.records)
+
+
+class FakeChat:
+    """假聊天窗口"""
+
+    def __init__(self, who: str, send_log: SendLog, ui_latency: Callable[[], float] = fixed_latency(0.05),
+                 fail_rate: float = 0.0):
+        """
+        Args:
+            who: 聊天窗口名称
+            send_log: 发送记录
+            ui_latency: 返回每次 SendMsg 耗时（秒）的函数
+            fail_rate: SendMsg 抛出异常的概率
+        """
+        self.who = who
+        self.send_log = send_log
+        self.ui_latency = ui_latency
+        self.fail_rate = fail_rate
+
+    def SendMsg(self, msg: str, at=None, **kwargs):
+        self.send_log.begin()
+        started = time.monotonic()
+        try:
+            time.sleep(max(0.0, self.ui_latency()))
+            if self.fail_rate and random.random() < self.fail_rate:
+                raise LookupError(f"Find Control Timeout: {self.who}")
+        finally:
+            self.send_log.end(SendRecord(self.who, msg, at, started, time.monotonic()))
+        return {'status': '成功'}
+
+    def __repr__(self):
+        return f"FakeChat({self.who!r})"
+
+
+class FakeMessage:
+    """假消息对象（与 wxauto 消息对象的常用属性一致）"""
+
+    def __init__(self, content: str, sender: str = "", type: str = 'text', attr: str = 'friend',
+                 info: Optional[Dict] = None):
+        self.content = content
+        self.sender = sender
+        self.sender_remark = sender
+        self.type = type
+        self.attr = attr
+        self.info = info or {}
+        self.control = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.content[:20]!r})"
+
+
+class FriendMessage(FakeMessage):
+    pass
+
+
+class SystemMessage(FakeMessage):
+    def __init__(self, content: str, **kwargs):
+        kwargs.setdefault('attr', 'system')
+        super().__init__(content, **kwargs)
+
+
+class FakeWeChat:
+    """假微信客户端"""
+
+    def __init__(self, nickname: str = "dolphin", send_log: Optional[SendLog] = None,
+                 ui_latency: Callable[[], float] = fixed_latency(0.05), send_fail_rate: float = 0.0,
+                 add_listen_latency: float = 0.0):
+        self.nickname = nickname
+        self.send_log = send_log or SendLog()
+        self.ui_latency = ui_latency
+        self.send_fail_rate = send_fail_rate
+        self.add_listen_latency = add_listen_latency
+        self.listen: Dict[str, tuple] = {}
+        self.chats: Dict[str, FakeChat] = {}
+
+    def chat(self, who: str) -> FakeChat:
+        """获取（或创建）聊天窗口"""
+        chat = self.chats.get(who)
+        if chat is None:
+            chat = self.chats[who] = FakeChat(who, self.send_log, self.ui_latency, self.send_fail_rate)
+        return chat
+
+    def IsOnline(self) -> bool:
+        return True
+
+    def StartListening(self):
+        pass
+
+    def StopListening(self, *args, **kwargs):
+        pass
+
+    def AddListenChat(self, nickname: str, callback=None):
+        time.sleep(self.add_listen_latency)
+        chat = self.chat(nickname)
+        self.listen[nickname] = (chat, callback)
+        return chat
+
+    def RemoveListenChat(self, nickname: str):
+        self.listen.pop(nickname, None)
+
+    def SendMsg(self, msg: str, who: str = None, at=None, **kwargs):
+        return self.chat(who or "文件传输助手").SendMsg(msg, at=at)
+
+    def deliver(self, who: str, message: FakeMessage):
+        """模拟监听线程收到消息：调用 AddListenChat 注册的回调"""
+        chat, callback = self.listen[who]
+        callback(message, chat)
+
+
+def install_fake_modules(wechat_factory: Callable[[], FakeWeChat] = FakeWeChat):
+    """
+    在 sys.modules 中注册假的 wxauto、wxauto.msgs、win32clipboard、win32con、email_send 模块
+
+    必须在导入 wxbot_preview 之前调用
+
+    Args:
+        wechat_factory: wxauto.WeChat 的替代类/工厂函数
+    """
+    wxauto = types.ModuleType('wxauto')
+    wxauto.WeChat = wechat_factory
+    msgs = types.ModuleType('wxauto.msgs')
+    msgs.FriendMessage = FriendMessage
+    msgs.SystemMessage = SystemMessage
+    wxauto.msgs = msgs
+
+    clipboard = types.ModuleType('win32clipboard')
+    clipboard._text = ""
+    clipboard.OpenClipboard = lambda *args: None
+    clipboard.CloseClipboard = lambda: None
+    clipboard.EmptyClipboard = lambda: None
+    clipboard.GetClipboardData = lambda *args: clipboard._text
+    clipboard.SetClipboardText = lambda text, *args: setattr(clipboard, '_text', text)
+    win32con = types.ModuleType('win32con')
+    win32con.CF_UNICODETEXT = 13
+
+    email_send = types.ModuleType('email_send')
+    email_send.sent = []
+    email_send.send_email = lambda receiver="", subject="", content="": email_send.sent.append((subject, content))
+
+    sys.modules.update({
+        'wxauto': wxauto,
+        'wxauto.msgs': msgs,
+        'win32clipboard': clipboard,
+        'win32con': win32con,
+        'email_send': email_send,
+    })
@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+热点路径微基准测试
+覆盖路由（get_api_config_for_chat、process_message 过滤）、长文本分段、消息预处理、
+各平台连接器的请求/响应解析以及异步处理器的队列入队/出队；
+结果可保存为JSON基线，之后的运行与基线比较：中位数变慢超过阈值（并超过基线自身的波动）
+且 Mann-Whitney U 检验显著时判定为性能回退，以非零退出码结束
+
+    python -m benchmarks.microbench                                  # 运行并输出结果
+    python -m benchmarks.microbench --save benchmarks/baselines/local.json
+    python -m benchmarks.microbench --compare benchmarks/baselines/local.json
+    python -m benchmarks.microbench --filter routing --repeats 30
+
+基线与机器、Python版本相关，只应与同一环境下保存的基线比较
+作者：dolphi
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
+from benchmarks.fake_wechat import FakeChat, FakeWeChat, FriendMessage, SendLog, install_fake_modules
+
+BOT_NAME = "dolphin"
+DEFAULT_BASELINE = os.path.join(_ROOT, 'benchmarks', 'baselines', 'baseline.json')
+
+
+class Benchmark:
+    """一个微基准：setup() 返回执行一次被测操作的函数"""
+
+    def __init__(self, name: str, setup: Callable[[], Callable[[], object]], description: str = ""):
+        self.name = name
+        self.setup = setup
+        self.description = description
+
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, description: str = ""):
+    """注册微基准的装饰器"""
+    def decorator(setup):
+        BENCHMARKS[name] = Benchmark(name, setup, description or (setup.__doc__ or "").strip())
+        return setup
+    return decorator
+
+
+# -------------------------------
+# 测试环境
+# -------------------------------
+
+_bot = None
+
+
+def _bot_module():
+    """在假微信环境中导入 wxbot_preview 并加载测试配置（50个用户、20个群、5个API配置）"""
+    global _bot
+    if _bot is not None:
+        return _bot
+    workdir = tempfile.mkdtemp(prefix="wxbot_micro_")
+    os.chdir(workdir)  # 下载目录等相对路径落在临时目录中
+    install_fake_modules(lambda *args, **kwargs: FakeWeChat(BOT_NAME))
+    import wxbot_preview
+    from message_normalizer import MessageNormalizer
+
+    api_configs = [{'id': f'api{i}', 'name': f'接口{i}', 'platform': platform_name,
+                    'api_key': 'key', 'base_url': 'http://bench.local/v1', 'model': 'm', 'enabled': True}
+                   for i, platform_name in enumerate(('openai', 'dify', 'coze', 'ragflow', 'fastgpt'))]
+    wxbot_preview.config = {
+        'api_configs': api_configs,
+        'default_api_id': 'api0',
+        'listen_rules': {
+            'user_rules': [{'name': f'用户{i}', 'enabled': True, 'api_id': f'api{i % 5}'} for i in range(50)],
+            'group_rules': [{'name': f'群{i}', 'enabled': True, 'at_required': True, 'api_id': f'api{i % 5}'}
+                            for i in range(20)],
+            'global_bot_enabled': True,
+            'message_types_filter': {'enabled': True,
+                                     'allowed_types': ['text', 'link', 'image', 'file', 'voice', 'location']},
+        },
+        '管理员': '管理员',
+        '机器人名字': BOT_NAME,
+        'log_level': 'INFO',
+        'download_path': os.path.join(workdir, 'downloads'),
+        'enable_tracing': False,
+        'enable_metrics': False,
+    }
+    with _quiet():
+        wxbot_preview.update_global_config()
+    wxbot_preview.message_normalizer = MessageNormalizer(BOT_NAME)
+    _bot = wxbot_preview
+    return _bot
+
+
+@contextlib.contextmanager
+def _quiet():
+    """屏蔽被测代码中的 print 输出（输出到空设备的开销仍计入）"""
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def _long_text(chars: int = 10000) -> str:
+    paragraph = ("消息处理链路的性能取决于排队、内容提取、接口调用与发送调度。"
+                 "Each stage should be measured separately, e.g. with tracing spans. ") * 3
+    code = "```python\n" + "\n".join(f"print({i})" for i in range(30)) + "\n```\n"
+    text = ""
+    while len(text) < chars:
+        text += paragraph + "\n\n" + (code if len(text) % 3 == 0 else "")
+    return text[:chars]
+
+
+# -------------------------------
+# 路由与过滤
+# -------------------------------
+
+@benchmark("routing.get_api_config_for_chat")
+def _bench_routing():
+    """为规则列表末尾的群查找API配置（最坏情况：遍历全部用户规则与群规则）"""
+    bot = _bot_module()
+    return lambda: bot.get_api_config_for_chat('群19')
+
+
+@benchmark("routing.process_message_filtered")
+def _bench_process_filtered():
+    """process_message 过滤路径：未监听窗口的消息与未@机器人的群消息"""
+    bot = _bot_module()
+    stranger = FakeChat('陌生人', SendLog())
+    group_chat = FakeChat('群7', SendLog())
+    stranger_message = FriendMessage("你好，在吗？", sender='陌生人')
+    group_message = FriendMessage("大家晚上好[微笑]", sender='群成员')
+
+    def run():
+        with _quiet():
+            bot.process_message(stranger, stranger_message)
+            bot.process_message(group_chat, group_message)
+    return run
+
+
+@benchmark("preprocess.text")
+def _bench_preprocess_text():
+    """普通文本消息预处理"""
+    bot = _bot_module()
+    message = FriendMessage("请帮我总结一下今天的会议内容，重点是性能优化部分")
+
+    def run():
+        with _quiet():
+            return bot.preprocess_message_content(message)
+    return run
+
+
+@benchmark("preprocess.link")
+def _bench_preprocess_link():
+    """链接消息预处理（URL已在RPA线程中获取，不进行UI操作）"""
+    bot = _bot_module()
+    message = FriendMessage("[链接]", type='link', info={'url': 'https://example.com/article?id=1'})
+
+    def run():
+        with _quiet():
+            return bot.preprocess_message_content(message, 'https://example.com/article?id=1')
+    return run
+
+
+# -------------------------------
+# 长文本分段
+# -------------------------------
+
+@benchmark("segment.split_long_text_10k")
+def _bench_split_long():
+    """10000字符（含代码块）的长回复分段"""
+    bot = _bot_module()
+    text = _long_text(10000)
+    return lambda: bot.split_long_text(text)
+
+
+@benchmark("segment.split_long_text_short")
+def _bench_split_short():
+    """不需要分段的短回复"""
+    bot = _bot_module()
+    text = _long_text(1500)
+    return lambda: bot.split_long_text(text)
+
+
+# -------------------------------
+# 连接器请求/响应解析
+# -------------------------------
+
+_CANNED_RESPONSES = {
+    'dify': {'event': 'message', 'answer': '这是回复' * 50, 'conversation_id': 'c', 'message_id': 'm'},
+    'coze': {'messages': [{'role': 'assistant', 'type': 'verbose', 'content': '{}'},
+                          {'role': 'assistant', 'type': 'answer', 'content': '这是回复' * 50}], 'code': 0},
+    'openai_compatible': {'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': '这是回复' * 50}}]},
+    'n8n': {'output': '这是回复' * 50},
+}
+
+
+def _canned_session():
+    """在共享会话上挂载返回固定响应的适配器（不访问网络）"""
+    import requests
+    from requests.adapters import BaseAdapter
+    from API.session import get_session
+
+    class CannedAdapter(BaseAdapter):
+        def send(self, request, **kwargs):
+            if 'coze' in request.url:
+                key = 'coze'
+            else:
+                key = request.url.split('/')[3]
+            response = requests.Response()
+            response.status_code = 200
+            response._content = json.dumps(_CANNED_RESPONSES[key], ensure_ascii=False).encode('utf-8')
+            response.headers['Content-Type'] = 'application/json'
+            response.encoding = 'utf-8'
+            response.url = request.url
+            response.request = request
+            return response
+
+        def close(self):
+            pass
+
+    session = get_session()
+    adapter = CannedAdapter()
+    session.mount("http://bench.local/", adapter)
+    session.mount("https://api.coze.cn/", adapter)
+
+
+def _connector_benchmark(platform_name: str, url_key: str):
+    def setup():
+        _bot_module()
+        _canned_session()
+        import API
+        cls = {'dify': API.DifyAPIConnector, 'coze': API.CozeAPIConnector, 'ragflow': API.RAGflowAPIConnector,
+               'fastgpt': API.FastGPTAPIConnector, 'n8n': API.N8NAPIConnector}[platform_name]
+        base_url = ("https://api.coze.cn/open_api/v2/bot/7000000000000000000" if platform_name == 'coze'
+                    else f"http://bench.local/{url_key}/webhook" if platform_name == 'n8n'
+                    else f"http://bench.local/{url_key}/v1")
+        connector = cls(api_key='key', base_url=base_url, name=f"bench_{platform_name}")
+        messages = [{'role': 'user', 'content': '你好'}]
+        return lambda: connector.chat(messages)
+    return setup
+
+
+for _platform, _key in (('dify', 'dify'), ('coze', 'coze'), ('ragflow', 'openai_compatible'),
+                        ('fastgpt', 'openai_compatible'), ('n8n', 'n8n')):
+    benchmark(f"connector.{_platform}.chat", f"{_platform} 连接器发送请求并解析固定响应")(
+        _connector_benchmark(_platform, _key))
+
+
+# -------------------------------
+# 异步处理器队列
+# -------------------------------
+
+@benchmark("handler.queue_roundtrip_100")
+def _bench_queue():
+    """100条消息信封入队（add_message）并按优先级出队"""
+    _bot_module()
+    from async_message_handler import AsyncMessageHandler
+    from message_envelope import MessageEnvelope
+
+    handler = AsyncMessageHandler(config={'download_path': os.path.join(os.getcwd(), 'downloads'),
+                                          'enable_tracing': False})
+    logging.getLogger().setLevel(logging.INFO)
+    if not logging.getLogger().handlers:
+        logging.getLogger().addHandler(logging.NullHandler())
+    loop = asyncio.new_event_loop()
+    chat = FakeChat('用户1', SendLog())
+    api_config = {'id': 'api0', 'platform': 'openai'}
+
+    async def roundtrip():
+        handler.message_queue = asyncio.Queue()
+        for i in range(100):
+            await handler.add_message(chat, MessageEnvelope(f"消息{i}", chat, sender='用户1'), api_config)
+        for _ in range(100):
+            await handler.message_queue.get()
+
+    return lambda: loop.run_until_complete(roundtrip())
+
+
+# -------------------------------
+# 运行与比较
+# -------------------------------
+
+def _sampler(op: Callable[[], object], min_time: float) -> Callable[[], float]:
+    """
+    自动确定循环次数（单个样本耗时不少于 min_time），返回采集一个样本（每次操作的秒数）的函数；
+    计时期间关闭垃圾回收（与 timeit 一致）
+    """
+    def timed(loops: int) -> float:
+        gc.collect()
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for _ in range(loops):
+                op()
+            return time.perf_counter() - start
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    for _ in range(3):
+        op()
+    loops = 1
+    while loops < 1_000_000:
+        elapsed = timed(loops)
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    def sample() -> float:
+        return timed(loops) / loops
+    sample.loops = loops
+    return sample
+
+
+def _reference_setup():
+    """参照负载（纯Python的字符串、字典与JSON操作），用于估计两次运行之间机器速度的差异"""
+    data = {f'key{i}': ['值' * (i % 7), i, i / 3] for i in range(50)}
+
+    def run():
+        text = json.dumps(data, ensure_ascii=False)
+        return sum(len(part) for part in text.split(',')) + len(json.loads(text))
+    return run
+
+
+def run_benchmark(bench: Benchmark, repeats: int = 15, min_time: float = 0.05) -> Dict:
+    """
+    运行一个微基准
+
+    被测操作的每个样本之前先采集一个参照负载样本，两者交替进行，
+    参照负载的中位数反映本次测量期间的机器速度，比较时用于换算
+
+    Returns:
+        {'loops', 'samples'（每次操作的秒数）, 'median', 'mean', 'stdev', 'mad', 'reference'}
+    """
+    sample = _sampler(bench.setup(), min_time)
+    reference = _sampler(_reference_setup(), min_time / 5)
+    samples = []
+    reference_samples = []
+    for _ in range(repeats):
+        reference_samples.append(reference())
+        samples.append(sample())
+    median = statistics.median(samples)
+    return {
+        'loops': sample.loops,
+        'samples': samples,
+        'median': median,
+        'mean': statistics.fmean(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'mad': statistics.median(abs(value - median) for value in samples),
+        'reference': statistics.median(reference_samples),
+    }
+
+
+def mann_whitney_greater(baseline: List[float], current: List[float]) -> float:
+    """
+    Mann-Whitney U 检验（正态近似，含并列校正）：current 是否系统性地大于 baseline
+
+    Returns:
+        单侧 p 值
+    """
+    n1, n2 = len(baseline), len(current)
+    if not n1 or not n2:
+        return 1.0
+    combined = sorted([(value, 0) for value in baseline] + [(value, 1) for value in current])
+    ranks = [0.0] * len(combined)
+    tie_term = 0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        tie_term += (j - i + 1) ** 3 - (j - i + 1)
+        i = j + 1
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 1)
+    u = rank_sum - n2 * (n2 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / math.sqrt(variance)
+    return 1 - statistics.NormalDist().cdf(z)
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = 0.20, alpha: float = 0.01,
+            normalize: bool = True) -> List[Dict]:
+    """
+    与基线比较
+
+    判定为回退需同时满足：中位数变慢超过 max(threshold, 3 × (基线与本次的相对MAD之和))，且单侧检验 p < alpha；
+    变快的判定与之对称。normalize 为True时，先按同一微基准测量期间参照负载的速度比例换算本次结果，
+    抵消机器整体变快/变慢（如CPU频率、虚拟机争用）的影响
+
+    Returns:
+        每个微基准的比较结果，verdict 为 'regression'、'improvement'、'same' 或 'new'
+    """
+    results = []
+    for name, result in current.items():
+        base = baseline.get(name)
+        if base is None:
+            results.append({'name': name, 'verdict': 'new', 'median': result['median']})
+            continue
+        scale = 1.0
+        if normalize and result.get('reference') and base.get('reference'):
+            scale = result['reference'] / base['reference']
+        samples = [value / scale for value in result['samples']]
+        ratio = result['median'] / scale / base['median'] if base['median'] else float('inf')
+        noise = (base.get('mad', 0) / base['median'] if base['median'] else 0) + result['mad'] / result['median']
+        tolerance = max(threshold, 3 * noise)
+        verdict = 'same'
+        p_slower = mann_whitney_greater(base['samples'], samples)
+        p_faster = mann_whitney_greater(samples, base['samples'])
+        if ratio > 1 + tolerance and p_slower < alpha:
+            verdict = 'regression'
+        elif ratio < 1 - tolerance and p_faster < alpha:
+            verdict = 'improvement'
+        results.append({'name': name, 'verdict': verdict, 'median': result['median'],
+                        'baseline_median': base['median'], 'ratio': ratio, 'tolerance': tolerance,
+                        'p_value': p_slower if ratio >= 1 else p_faster, 'scale': scale})
+    return results
+
+
+def _environment() -> Dict:
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+    }
+
+
+def _format_time(seconds: float) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="wxbot 热点路径微基准")
+    parser.add_argument('--filter', help="只运行名称包含该字符串的微基准")
+    parser.add_argument('--repeats', type=int, default=15, help="每个微基准的样本数")
+    parser.add_argument('--min-time', type=float, default=0.05, help="单个样本的最短耗时（秒）")
+    parser.add_argument('--save', nargs='?', const=DEFAULT_BASELINE, help="将结果保存为基线文件")
+    parser.add_argument('--compare', nargs='?', const=DEFAULT_BASELINE, help="与基线文件比较")
+    parser.add_argument('--threshold', type=float, default=0.20, help="判定回退的最小变慢比例")
+    parser.add_argument('--alpha', type=float, default=0.01, help="显著性水平")
+    parser.add_argument('--no-normalize', action='store_true', help="比较时不按参照负载换算机器速度差异")
+    parser.add_argument('--list', action='store_true', help="列出所有微基准")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    # 微基准运行时会切换到临时目录，先把文件路径转为绝对路径
+    args.save = os.path.abspath(args.save) if args.save else None
+    args.compare = os.path.abspath(args.compare) if args.compare else None
+    if args.list:
+        for bench in BENCHMARKS.values():
+            print(f"{bench.name:<38} {bench.description}")
+        return 0
+
+    selected = [bench for name, bench in BENCHMARKS.items() if not args.filter or args.filter in name]
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('environment') != _environment():
+            print(f"警告: 基线的运行环境与当前不同，比较结果仅供参考\n  基线: {baseline.get('environment')}\n"
+                  f"  当前: {_environment()}")
+
+    results = {}
+    for bench in selected:
+        result = run_benchmark(bench, args.repeats, args.min_time)
+        results[bench.name] = result
+        print(f"{bench.name:<38} {_format_time(result['median']):>12}  ±{_format_time(result['mad']):>11}  "
+              f"(loops={result['loops']})", flush=True)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'created_at': datetime.now().isoformat(timespec='seconds'), 'environment': _environment(),
+                       'benchmarks': results}, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存: {args.save}")
+
+    if baseline is None:
+        return 0
+    comparison = compare(results, baseline.get('benchmarks', {}), args.threshold, args.alpha,
+                         normalize=not args.no_normalize)
+    print()
+    regressions = 0
+    for item in comparison:
+        if item['verdict'] == 'new':
+            print(f"{item['name']:<38} 新增（基线中没有）")
+            continue
+        mark = {'regression': '!! 回退', 'improvement': '提升', 'same': '持平'}[item['verdict']]
+        print(f"{item['name']:<38} {item['ratio']:6.2f}x  (容差 ±{item['tolerance']:.0%}, p={item['p_value']:.4f}, "
+              f"速度换算 {item['scale']:.2f})  {mark}")
+        regressions += item['verdict'] == 'regression'
+    missing = sorted(set(baseline.get('benchmarks', {})) - set(results))
+    if missing and not args.filter:
+        print(f"基线中的以下微基准未运行: {', '.join(missing)}")
+    if regressions:
+        print(f"\n性能回退: {regressions} 项", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟AI接口服务
+在本地端口上模拟 OpenAI、FastGPT、RAGflow（OpenAI兼容格式）、Dify、Coze、n8n 的对话接口，
+各平台可单独设置响应耗时分布、错误率与回复长度；
+Coze 连接器使用固定的官方地址，通过在共享会话上挂载改写地址的适配器转发到本地服务
+作者：dolphi
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+from requests.adapters import HTTPAdapter
+
+PLATFORMS = ('openai', 'fastgpt', 'ragflow', 'dify', 'coze', 'n8n')
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """
+    解析耗时分布
+
+    Args:
+        spec: "fixed:0.5"、"uniform:0.2:1.5"、"lognormal:0.8:0.5"（中位数、sigma）、
+              "exp:0.6"（均值）；单个数字等同于 fixed
+
+    Returns:
+        每次调用返回一个耗时（秒）的函数
+    """
+    parts = str(spec).split(':')
+    if len(parts) == 1:
+        value = float(parts[0])
+        return lambda: value
+    kind, args = parts[0], [float(part) for part in parts[1:]]
+    if kind == 'fixed':
+        return lambda: args[0]
+    if kind == 'uniform':
+        return lambda: random.uniform(args[0], args[1])
+    if kind == 'lognormal':
+        import math
+        mu = math.log(args[0])
+        return lambda: random.lognormvariate(mu, args[1])
+    if kind == 'exp':
+        return lambda: random.expovariate(1.0 / args[0])
+    raise ValueError(f"未知的耗时分布: {spec}")
+
+
+class BackendProfile:
+    """单个平台的模拟参数"""
+
+    def __init__(self, latency: str = "lognormal:0.8:0.4", error_rate: float = 0.0, reply_chars: int = 200,
+                 long_reply_chars: int = 4500):
+        """
+        Args:
+            latency: 响应耗时分布（见 parse_latency）
+            error_rate: 返回 HTTP 500 的概率
+            reply_chars: 回复的字符数
+            long_reply_chars: 问题中带 #long 标记时的回复字符数（超过2000时会触发长消息分段）
+        """
+        self.latency = parse_latency(latency)
+        self.latency_spec = latency
+        self.error_rate = error_rate
+        self.reply_chars = reply_chars
+        self.long_reply_chars = long_reply_chars
+        self.requests = 0
+        self.errors = 0
+
+
+def _make_reply(query: str, chars: int) -> str:
+    """生成指定长度的回复（按句子拼接，便于分段）"""
+    head = f"收到：{query[:40]}。"
+    sentence = "这是模拟接口生成的回复内容，用于测试消息处理链路的性能。"
+    body = sentence * (max(0, chars - len(head)) // len(sentence) + 1)
+    return (head + body)[:max(chars, len(head))]
+
+
+def _query_of(platform: str, payload: Dict) -> str:
+    """从请求体中取出用户问题"""
+    if platform in ('dify', 'coze', 'n8n'):
+        return str(payload.get('query', ''))
+    messages = payload.get('messages') or [{}]
+    return str(messages[-1].get('content', ''))
+
+
+def _response_body(platform: str, reply: str, payload: Dict) -> Dict:
+    """按平台格式构造响应"""
+    if platform == 'dify':
+        return {'event': 'message', 'answer': reply, 'conversation_id': 'mock', 'message_id': 'mock'}
+    if platform == 'coze':
+        return {'messages': [{'role': 'assistant', 'type': 'answer', 'content': reply, 'content_type': 'text'}],
+                'conversation_id': payload.get('conversation_id', ''), 'code': 0, 'msg': 'success'}
+    if platform == 'n8n':
+        return {'output': reply}
+    return {
+        'id': 'chatcmpl-mock',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': payload.get('model', 'mock'),
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': reply}, 'finish_reason': 'stop'}],
+        'usage': {'prompt_tokens': 0, 'completion_tokens': len(reply), 'total_tokens': len(reply)},
+    }
+
+
+class _MockRequestHandler(BaseHTTPRequestHandler):
+    backend: 'MockBackendServer' = None
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        # 路径的第一段为平台名，如 /dify/v1/chat-messages、/openai/v1/chat/completions
+        platform = self.path.strip('/').split('/', 1)[0]
+        profile = self.backend.profiles.get(platform)
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if profile is None:
+            self._reply(404, {'message': f'unknown platform: {platform}'})
+            return
+        try:
+            payload = json.loads(raw or b'{}')
+        except ValueError:
+            self._reply(400, {'message': 'invalid json'})
+            return
+
+        with self.backend.lock:
+            profile.requests += 1
+        time.sleep(max(0.0, profile.latency()))
+        if profile.error_rate and random.random() < profile.error_rate:
+            with self.backend.lock:
+                profile.errors += 1
+            self._reply(500, {'message': 'mock internal error'})
+            return
+        query = _query_of(platform, payload)
+        reply = _make_reply(query, profile.long_reply_chars if '#long' in query else profile.reply_chars)
+        self._reply(200, _response_body(platform, reply, payload))
+
+    def _reply(self, status: int, body: Dict):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockBackendServer:
+    """模拟AI接口服务（后台线程）"""
+
+    def __init__(self, profiles: Optional[Dict[str, BackendProfile]] = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            profiles: {平台: 模拟参数}，未提供的平台使用默认参数
+            host: 监听地址
+            port: 监听端口，0表示自动分配
+        """
+        self.profiles = {platform: BackendProfile() for platform in PLATFORMS}
+        self.profiles.update(profiles or {})
+        self.lock = threading.Lock()
+        handler = type('MockRequestHandler', (_MockRequestHandler,), {'backend': self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def base_url(self, platform: str) -> str:
+        """各平台的 base_url（与配置文件中填写的形式一致）"""
+        return {
+            'openai': f"{self.url}/openai/v1",
+            'fastgpt': f"{self.url}/fastgpt/api/v1",
+            'ragflow': f"{self.url}/ragflow/api/v1/chats_openai/mock/chat/completions",
+            'dify': f"{self.url}/dify/v1",
+            'coze': "https://api.coze.cn/open_api/v2/bot/7000000000000000000",
+            'n8n': f"{self.url}/n8n/webhook/mock",
+        }[platform]
+
+    def api_config(self, platform: str) -> Dict:
+        """生成指向本服务的 api_config"""
+        return {
+            'id': f"mock_{platform}",
+            'name': f"模拟{platform}",
+            'platform': platform,
+            'api_key': 'mock-key',
+            'base_url': self.base_url(platform),
+            'model': 'mock-model',
+            'prompt': 'You are a helpful assistant.',
+            'enabled': True,
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock_backend", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {platform: {'requests': profile.requests, 'errors': profile.errors}
+                    for platform, profile in self.profiles.items() if profile.requests}
+
+
+class _RewriteAdapter(HTTPAdapter):
+    """把发往固定地址的请求改写到本地模拟服务"""
+
+    def __init__(self, prefix: str, target: str, **kwargs):
+        super().__init__(**kwargs)
+        self.prefix = prefix
+        self.target = target
+
+    def send(self, request, **kwargs):
+        request.url = self.target + request.url[len(self.prefix):]
+        return super().send(request, **kwargs)
+
+
+def route_fixed_hosts(server: MockBackendServer):
+    """将 Coze 官方地址的请求转发到模拟服务（挂载到 API 连接器共用的会话上）"""
+    from API.session import get_session
+    get_session().mount("https://api.coze.cn/", _RewriteAdapter("https://api.coze.cn/", f"{server.url}/coze/"))
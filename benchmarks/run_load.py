@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线压力测试
+用假微信客户端和本地模拟AI接口驱动完整的消息处理链路
+（监听回调 -> 分发线程 -> process_message -> 异步处理器 -> 调用接口 -> 发送调度 -> RPA线程 SendMsg），
+按设定速率注入脚本化的消息负载，统计吞吐量、延迟分位数（p50/p95/p99）与内存占用
+
+    python -m benchmarks.run_load --messages 300 --chats 12 --rate 20
+    python -m benchmarks.run_load --platforms dify,coze --latency dify=lognormal:1.2:0.5 --error-rate coze=0.05
+    python -m benchmarks.run_load --script workload.json --json result.json
+
+脚本文件为JSON数组，每项形如 {"at": 0.5, "chat": "用户1", "content": "你好", "sender": "用户1"}，
+at 为相对开始时间的发送时刻（秒），群聊消息加 "group": true 且内容须@机器人（@dolphin）；
+内容中带 #long 的消息由模拟接口返回长回复（触发分段发送）
+
+注意：异步处理器只为 ragflow、coze、dify 使用专用连接器，其他平台（包括 fastgpt、n8n）
+走 OpenAI 兼容接口，n8n 的模拟服务返回的是 n8n 格式，因此会以接口错误计入结果
+作者：dolphi
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+# 允许以 python benchmarks/run_load.py 方式运行
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
+from benchmarks.fake_wechat import FakeWeChat, FriendMessage, install_fake_modules, uniform_latency
+from benchmarks.mock_backends import PLATFORMS, BackendProfile, MockBackendServer, route_fixed_hosts
+
+BOT_NAME = "dolphin"
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """分位数（最近秩法），values 为空时返回None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def _parse_mapping(items: List[str], default_key: str = '*') -> Dict[str, str]:
+    """解析 "平台=值" 形式的参数，不带平台名时作用于所有平台"""
+    result = {}
+    for item in items or []:
+        for part in item.split(','):
+            if not part:
+                continue
+            key, _, value = part.rpartition('=')
+            result[key or default_key] = value
+    return result
+
+
+def build_config(server: MockBackendServer, platforms: List[str], users: List[str], groups: List[str],
+                 workdir: str, args) -> Dict:
+    """生成测试用配置：用户/群组按顺序轮流绑定到各平台的模拟接口"""
+    api_configs = [server.api_config(platform) for platform in platforms]
+    user_rules = [{'name': name, 'enabled': True, 'api_id': api_configs[i % len(api_configs)]['id']}
+                  for i, name in enumerate(users)]
+    group_rules = [{'name': name, 'enabled': True, 'at_required': True,
+                    'api_id': api_configs[(i + len(users)) % len(api_configs)]['id']}
+                   for i, name in enumerate(groups)]
+    config = {
+        'api_configs': api_configs,
+        'default_api_id': api_configs[0]['id'],
+        'listen_rules': {'user_rules': user_rules, 'group_rules': group_rules, 'global_bot_enabled': True},
+        '管理员': '',
+        '机器人名字': BOT_NAME,
+        'prompt': 'You are a helpful assistant.',
+        'log_level': 'WARNING',
+        'download_path': os.path.join(workdir, 'downloads'),
+        'trace_file': os.path.join(workdir, 'traces.jsonl'),
+        'enable_tracing': args.trace,
+        'enable_metrics': False,
+        'enable_link_fetch': False,
+    }
+    if args.min_gap is not None:
+        config['send_min_gap'] = args.min_gap
+        config['send_initial_gap'] = args.min_gap
+    if args.per_chat_per_minute is not None:
+        config['send_per_chat_per_minute'] = args.per_chat_per_minute
+        config['send_per_chat_burst'] = max(5, int(args.per_chat_per_minute // 6))
+    return config
+
+
+def generate_workload(users: List[str], groups: List[str], count: int, rate: float,
+                      long_ratio: float, seed: int) -> List[Dict]:
+    """
+    生成泊松到达的消息负载：用户消息直接发送，群消息带@机器人；
+    long_ratio 比例的消息要求长回复（content 中带 #long 标记，模拟接口据此返回长回复）
+    """
+    rng = random.Random(seed)
+    chats = [(name, False) for name in users] + [(name, True) for name in groups]
+    workload = []
+    at = 0.0
+    for index in range(count):
+        at += rng.expovariate(rate) if rate > 0 else 0.0
+        name, is_group = rng.choice(chats)
+        text = f"第{index}条测试消息：请介绍一下消息处理链路的性能"
+        if rng.random() < long_ratio:
+            text += " #long"
+        workload.append({
+            'at': at,
+            'chat': name,
+            'sender': f"{name}_成员{rng.randint(1, 20)}" if is_group else name,
+            'group': is_group,
+            'content': f"@{BOT_NAME} {text}" if is_group else text,
+        })
+    return workload
+
+
+class LoadTest:
+    """一次压力测试"""
+
+    def __init__(self, args):
+        self.args = args
+        self.finished: List[Dict] = []
+        self.finished_lock = threading.Lock()
+        self.done = threading.Event()
+        self.expected = 0
+
+    def _on_finish(self, envelope, status):
+        stamps = envelope.timestamps
+        api_config = envelope.api_config or {}
+        record = {
+            'status': status,
+            'platform': api_config.get('platform', ''),
+            'latency': stamps.get('sent', stamps.get('finished', 0)) - stamps['received'],
+            'queue_wait': stamps.get('processing', 0) - stamps.get('queued', 0),
+            'api': stamps.get('api_done', 0) - stamps.get('extracted', 0),
+            'send_wait': stamps.get('sent', 0) - stamps.get('send_queued', 0),
+        }
+        with self.finished_lock:
+            self.finished.append(record)
+            if len(self.finished) >= self.expected:
+                self.done.set()
+
+    def run(self) -> Dict:
+        args = self.args
+        platforms = [platform for platform in args.platforms.split(',') if platform]
+        unknown = set(platforms) - set(PLATFORMS)
+        if unknown:
+            raise SystemExit(f"未知平台: {', '.join(sorted(unknown))}")
+
+        latencies = _parse_mapping(args.latency)
+        error_rates = _parse_mapping(args.error_rate)
+        profiles = {
+            platform: BackendProfile(latency=latencies.get(platform, latencies.get('*', "lognormal:0.8:0.4")),
+                                     error_rate=float(error_rates.get(platform, error_rates.get('*', 0))),
+                                     reply_chars=args.reply_chars, long_reply_chars=args.long_reply_chars)
+            for platform in PLATFORMS
+        }
+        server = MockBackendServer(profiles).start()
+        os.environ['NO_PROXY'] = ','.join(filter(None, [os.environ.get('NO_PROXY'), '127.0.0.1', 'localhost']))
+
+        fake_wx = FakeWeChat(BOT_NAME, ui_latency=uniform_latency(args.ui_latency * 0.5, args.ui_latency * 1.5),
+                             send_fail_rate=args.send_fail_rate)
+        install_fake_modules(lambda *a, **kw: fake_wx)
+        route_fixed_hosts(server)
+
+        if args.script:
+            with open(args.script, 'r', encoding='utf-8') as f:
+                workload = json.load(f)
+            names = sorted({item['chat'] for item in workload})
+            groups = [name for name in names if any(item['chat'] == name and item.get('group') for item in workload)]
+            users = [name for name in names if name not in groups]
+        else:
+            users = [f"用户{i}" for i in range(1, args.chats - args.chats // 3 + 1)]
+            groups = [f"测试群{i}" for i in range(1, args.chats // 3 + 1)]
+            workload = generate_workload(users, groups, args.messages, args.rate, args.long_ratio, args.seed)
+        self.expected = len(workload)
+
+        workdir = tempfile.mkdtemp(prefix="wxbot_bench_")
+        devnull = open(os.devnull, 'w', encoding='utf-8')
+        gc.collect()
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(devnull):
+                result = self._drive(server, fake_wx, platforms, users, groups, workload, workdir)
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            devnull.close()
+            server.stop()
+        result['memory'] = {'python_peak_mb': round(peak / 1048576, 2), 'max_rss_mb': _max_rss_mb()}
+        result['backends'] = server.get_stats()
+        return result
+
+    def _drive(self, server, fake_wx, platforms, users, groups, workload, workdir) -> Dict:
+        args = self.args
+        import wxbot_preview
+        import async_message_handler
+        from message_normalizer import MessageNormalizer
+        from metrics import ERRORS
+        from tracing import tracer
+
+        handler = async_message_handler.async_handler
+        handler.max_concurrent = args.concurrency
+        wxbot_preview.config = build_config(server, platforms, users, groups, workdir, args)
+        wxbot_preview.update_global_config()
+        wxbot_preview.wx = fake_wx
+        wxbot_preview.message_normalizer = MessageNormalizer(fake_wx.nickname)
+        for name in users + groups:
+            fake_wx.AddListenChat(nickname=name, callback=wxbot_preview.message_handle_callback)
+
+        # 记录每条消息处理结束（所有回复发送完成）的时间
+        original_finish = tracer.finish
+
+        def finish(envelope, status='ok', **attributes):
+            self._on_finish(envelope, status)
+            original_finish(envelope, status, **attributes)
+        tracer.finish = finish
+
+        handler.start()
+        deadline = time.monotonic() + 10
+        while handler.loop is None or not handler.loop.is_running():
+            if time.monotonic() > deadline:
+                raise RuntimeError("异步处理器启动超时")
+            time.sleep(0.01)
+
+        api_errors_before = ERRORS.total()
+        start = time.monotonic()
+        try:
+            for item in workload:
+                delay = start + item['at'] - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                message = FriendMessage(item['content'], sender=item.get('sender', item['chat']))
+                fake_wx.deliver(item['chat'], message)
+                # 消息ID精确到毫秒，同一窗口同一毫秒内的消息会被当作重复消息
+                time.sleep(0.001)
+            injected = time.monotonic() - start
+            completed = self.done.wait(args.timeout)
+            elapsed = time.monotonic() - start
+        finally:
+            tracer.finish = original_finish
+            handler.stop()
+            wxbot_preview.message_dispatcher.cancel_pending()
+
+        with self.finished_lock:
+            records = list(self.finished)
+        latencies = [record['latency'] for record in records]
+        by_platform = {}
+        for platform in platforms:
+            values = [record['latency'] for record in records if record['platform'] == platform]
+            if values:
+                by_platform[platform] = _latency_summary(values)
+        sends = fake_wx.send_log.records
+        return {
+            'messages': len(workload),
+            'completed': len(records),
+            'timed_out': not completed,
+            'errors': sum(1 for record in records if record['status'] != 'ok'),
+            'api_errors': int(ERRORS.total() - api_errors_before),
+            'inject_seconds': round(injected, 3),
+            'elapsed_seconds': round(elapsed, 3),
+            'throughput_per_s': round(len(records) / elapsed, 3) if elapsed else 0,
+            'latency': _latency_summary(latencies),
+            'latency_by_platform': by_platform,
+            'stages_p50': {stage: _round(percentile([record[stage] for record in records], 0.5))
+                           for stage in ('queue_wait', 'api', 'send_wait')},
+            'send_calls': len(sends),
+            'send_ui_seconds': round(fake_wx.send_log.ui_time(), 3),
+            'send_concurrent_violations': fake_wx.send_log.concurrent_violations,
+            'sender': handler.send_scheduler.get_stats(),
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 3)
+
+
+def _latency_summary(values: List[float]) -> Dict:
+    return {
+        'count': len(values),
+        'p50': _round(percentile(values, 0.5)),
+        'p95': _round(percentile(values, 0.95)),
+        'p99': _round(percentile(values, 0.99)),
+        'max': _round(max(values)) if values else None,
+    }
+
+
+def _max_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def format_report(result: Dict) -> str:
+    """生成文本报告"""
+    latency = result['latency']
+    lines = [
+        f"消息: {result['completed']}/{result['messages']} 完成"
+        + ("（超时）" if result['timed_out'] else "")
+        + f"，错误 {result['errors']}，接口错误 {result['api_errors']}",
+        f"耗时: 注入 {result['inject_seconds']}s，总计 {result['elapsed_seconds']}s，"
+        f"吞吐量 {result['throughput_per_s']} 条/秒",
+        f"端到端延迟(s): p50={latency['p50']} p95={latency['p95']} p99={latency['p99']} max={latency['max']}",
+        f"阶段p50(s): 排队 {result['stages_p50']['queue_wait']}，接口 {result['stages_p50']['api']}，"
+        f"发送等待 {result['stages_p50']['send_wait']}",
+    ]
+    for platform, summary in result['latency_by_platform'].items():
+        lines.append(f"  {platform:<8} n={summary['count']:<5} p50={summary['p50']} p95={summary['p95']} "
+                     f"p99={summary['p99']}")
+    lines.append(f"SendMsg: {result['send_calls']} 次，UI耗时 {result['send_ui_seconds']}s，"
+                 f"并发冲突 {result['send_concurrent_violations']}，调度 {result['sender']}")
+    lines.append(f"内存: Python峰值 {result['memory']['python_peak_mb']} MB，"
+                 f"进程最大RSS {result['memory']['max_rss_mb']} MB")
+    lines.append(f"模拟接口: {result['backends']}")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="wxbot 离线压力测试")
+    parser.add_argument('--messages', type=int, default=200, help="消息总数")
+    parser.add_argument('--chats', type=int, default=9, help="聊天窗口数（其中三分之一为群聊）")
+    parser.add_argument('--rate', type=float, default=20, help="平均到达速率（条/秒），0表示一次性注入")
+    parser.add_argument('--platforms', default="openai,dify,coze,ragflow,fastgpt",
+                        help=f"使用的平台，逗号分隔，可选 {','.join(PLATFORMS)}")
+    parser.add_argument('--latency', action='append', help="接口耗时分布，如 lognormal:0.8:0.4 或 dify=fixed:1.5")
+    parser.add_argument('--error-rate', action='append', help="接口错误率，如 0.02 或 coze=0.1")
+    parser.add_argument('--reply-chars', type=int, default=200, help="普通回复长度")
+    parser.add_argument('--long-ratio', type=float, default=0.05, help="要求长回复（触发分段）的消息比例")
+    parser.add_argument('--long-reply-chars', type=int, default=4500, help="长回复长度")
+    parser.add_argument('--ui-latency', type=float, default=0.08, help="SendMsg 平均UI耗时（秒）")
+    parser.add_argument('--send-fail-rate', type=float, default=0.0, help="SendMsg 失败率")
+    parser.add_argument('--concurrency', type=int, default=5, help="异步处理器最大并发数")
+    parser.add_argument('--min-gap', type=float, help="覆盖发送调度的最小发送间隔（秒）")
+    parser.add_argument('--per-chat-per-minute', type=float, help="覆盖每个窗口每分钟的发送上限")
+    parser.add_argument('--trace', action='store_true', help="同时写出链路追踪文件")
+    parser.add_argument('--script', help="脚本化负载文件（JSON）")
+    parser.add_argument('--seed', type=int, default=1, help="随机种子")
+    parser.add_argument('--timeout', type=float, default=300, help="等待全部消息完成的最长时间（秒）")
+    parser.add_argument('--json', help="将结果写入JSON文件")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = LoadTest(args).run()
+    print(format_report(result))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 1 if result['timed_out'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
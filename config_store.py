@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+配置文件存储模块
+配置的保存统一经过本模块：调用方线程（如Tk界面线程）只负责把配置序列化为文本，
+写盘由后台线程完成；短时间内的多次保存合并为一次写入，写入时先写临时文件并刷盘，
+再用 os.replace 原子替换，程序在写入中途退出也不会留下半截的 config.json；
+尚未写盘的配置在读取时直接返回，保存后立即重新加载也能读到最新内容；
+写盘失败时配置保留在内存中，按指数退避重试，错误信息见 last_error
+作者：dolphi
+"""
+
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_write_text(path: str, text: str):
+    """原子写入文本文件：写入同目录下的临时文件（名称唯一，多线程同时写入互不干扰）并刷盘后替换原文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp 创建的文件权限为 0600，沿用原文件的权限
+        os.chmod(tmp_path, os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class ConfigStore:
+    """JSON 配置文件存储（异步、合并、原子写入）"""
+
+    def __init__(self, path: str = "config.json", delay: float = 0.5, indent: int = 4,
+                 max_retry_delay: float = 30.0):
+        """
+        Args:
+            path: 配置文件路径
+            delay: 合并窗口（秒）：最后一次保存后等待该时长再写盘，期间的新保存覆盖旧内容
+            indent: JSON 缩进（与原配置文件格式一致）
+            max_retry_delay: 写盘失败后重试间隔的上限（秒），间隔从1秒起逐次加倍
+        """
+        self.path = path
+        self.delay = delay
+        self.indent = indent
+        self.max_retry_delay = max_retry_delay
+        self.writes = 0       # 实际写盘次数
+        self.saves = 0        # 保存请求次数
+        self.failures = 0     # 连续写盘失败次数
+        self.last_error: Optional[Exception] = None
+        self._pending: Optional[str] = None   # 尚未写盘的配置文本
+        self._pending_at = 0.0                # 最后一次保存的时间
+        self._retry_at = 0.0                  # 写盘失败后下次重试的时间
+        self._writing = False
+        self._cond = threading.Condition()
+        self._thread = None
+        atexit.register(self.flush)
+
+    def save(self, config: Dict):
+        """
+        保存配置（立即返回）
+
+        在调用方线程中序列化（配置之后被修改也不影响本次保存的内容，无法序列化时直接抛出异常），
+        写盘在后台线程中进行
+        """
+        text = json.dumps(config, ensure_ascii=False, indent=self.indent)
+        with self._cond:
+            self._pending = text
+            self._pending_at = time.monotonic()
+            self.saves += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._writer, name="config_store", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def load(self) -> Dict:
+        """读取配置：有尚未写盘的保存时返回其内容，否则读取配置文件"""
+        with self._cond:
+            pending = self._pending
+        if pending is not None:
+            return json.loads(pending)
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def exists(self) -> bool:
+        """配置文件是否存在（包括已保存但尚未写盘的情况）"""
+        with self._cond:
+            if self._pending is not None:
+                return True
+        return os.path.exists(self.path)
+
+    def flush(self, timeout: Optional[float] = 10) -> bool:
+        """
+        立即写入尚未写盘的配置并等待完成（程序退出时自动调用）
+
+        Returns:
+            是否在超时前全部写盘
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            if self._pending is None and not self._writing:
+                return True
+            if self._thread is None or not self._thread.is_alive():
+                text, self._pending = self._pending, None
+            else:
+                self._pending_at = 0.0  # 结束合并等待
+                self._retry_at = 0.0    # 写盘失败后等待重试时立即重试
+                self._cond.notify_all()
+                while self._pending is not None or self._writing:
+                    remaining = deadline - time.monotonic() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+        # 后台线程不可用（如解释器退出阶段）时在当前线程写入
+        return self._write(text)
+
+    def _write(self, text: str) -> bool:
+        """写盘，返回是否成功"""
+        try:
+            atomic_write_text(self.path, text)
+            self.writes += 1
+            self.failures = 0
+            self.last_error = None
+            return True
+        except Exception as e:
+            self.failures += 1
+            self.last_error = e
+            logger.error(f"保存配置文件失败（第 {self.failures} 次）: {self.path} - {e}")
+            return False
+
+    def _writer(self):
+        """后台线程：等待合并窗口结束后写入最新的配置，失败时保留配置并退避重试"""
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                wait = max(self._pending_at + self.delay, self._retry_at) - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                text = self._pending
+                self._writing = True
+            ok = False
+            try:
+                ok = self._write(text)
+            finally:
+                with self._cond:
+                    if ok:
+                        self._retry_at = 0.0
+                        # 写入期间没有新的保存时才清除（否则下一轮写入新内容）
+                        if self._pending is text:
+                            self._pending = None
+                    else:
+                        # 保留尚未写盘的配置（写入期间有新的保存时保留新内容），退避后重试
+                        backoff = min(self.max_retry_delay, 2.0 ** (self.failures - 1))
+                        self._retry_at = time.monotonic() + backoff
+                    self._writing = False
+                    self._cond.notify_all()
+
+    def get_stats(self) -> Dict:
+        with self._cond:
+            pending = self._pending is not None
+        return {'saves': self.saves, 'writes': self.writes, 'pending': pending,
+                'failures': self.failures,
+                'last_error': str(self.last_error) if self.last_error else None}
+
+
+# 全局配置存储（图形界面与机器人共用，保证读取到彼此尚未写盘的保存）
+config_store = ConfigStore()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内容寻址存储模块
+按文件内容哈希去重下载的图片/文件（重复文件使用硬链接指向同一份数据），
+并持久化缓存以哈希为键的OCR/文本提取结果；
+下载目录按容量和存放时间上限进行LRU淘汰，淘汰依据索引库而不扫描目录
+作者：dolphi
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+_HASH_CHUNK_SIZE = 1024 * 1024  # 计算哈希时每次读取1MB
+
+
+class ContentStore:
+    """内容寻址存储 + 提取结果缓存"""
+
+    # 淘汰候选项: (哈希, 数据文件路径, 大小, 最后访问时间, 链接数)
+    _CANDIDATE_QUERY = ("SELECT digest, path, size, last_access, "
+                        "(SELECT COUNT(*) FROM links WHERE links.digest = blobs.digest) FROM blobs")
+
+    def __init__(self, root: Union[str, Path], max_bytes: int = 2 * 1024 ** 3, max_age: float = 30 * 86400):
+        """
+        初始化存储
+
+        Args:
+            root: 下载目录，存储数据位于其下的 .store 目录
+            max_bytes: 下载内容占用空间上限（字节），0表示不限制
+            max_age: 内容最长保留时间（秒，按最后访问时间计算），0表示不限制
+        """
+        self.root = Path(root)
+        self.store_dir = self.root / ".store"
+        self.blob_dir = self.store_dir / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.store_dir / "index.db"), check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "digest TEXT NOT NULL, kind TEXT NOT NULL, content TEXT NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (digest, kind))"
+            )
+            # 每份内容一条记录，size 为实际占用空间（硬链接不重复计算）
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS blobs ("
+                "digest TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs (last_access)")
+            # 下载目录中指向某份内容的文件
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS links (path TEXT PRIMARY KEY, digest TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS links_digest ON links (digest)")
+            self.total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+        self.stats = {'hits': 0, 'misses': 0, 'evicted_files': 0, 'evicted_bytes': 0, 'last_eviction': None}
+
+    @staticmethod
+    def hash_file(path: Union[str, Path]) -> str:
+        """流式计算文件内容哈希（BLAKE2b-128）"""
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def blob_path(self, digest: str, suffix: str = "") -> Path:
+        """哈希对应的数据文件路径"""
+        return self.blob_dir / digest[:2] / f"{digest}{suffix.lower()}"
+
+    def ingest(self, path: Union[str, Path]) -> Tuple[str, Path]:
+        """
+        将下载的文件纳入存储：首次出现的内容登记为数据文件，重复内容替换为指向已有数据的硬链接
+
+        Args:
+            path: 刚下载的文件路径
+
+        Returns:
+            (内容哈希, 文件路径)
+        """
+        path = Path(path)
+        digest = self.hash_file(path)
+        blob = self.blob_path(digest, path.suffix)
+        data_path = blob
+        # 建立硬链接与登记索引在锁内完成，不会与淘汰删除同一份内容交错执行
+        with self._lock:
+            try:
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                if blob.exists():
+                    if not os.path.samefile(blob, path):
+                        # 重复内容：删除新下载的副本，改为硬链接到已有数据
+                        tmp_path = path.with_name(path.name + ".tmp")
+                        os.link(blob, tmp_path)
+                        os.replace(tmp_path, path)
+                        logger.info(f"重复文件已去重: {path.name} -> {digest}")
+                else:
+                    os.link(path, blob)
+            except OSError as e:
+                # 文件系统不支持硬链接等情况下保留原文件，仅缺少去重效果
+                logger.warning(f"内容去重失败，保留原文件: {path} - {e}")
+                if not blob.exists():
+                    data_path = path
+            self._register(digest, path, data_path)
+        return digest, path
+
+    def _register(self, digest: str, path: Path, data_path: Path):
+        """登记内容与下载文件（调用方持有锁）"""
+        now = time.time()
+        with self._db:
+            row = self._db.execute("SELECT size FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if row:
+                self._db.execute("UPDATE blobs SET last_access = ? WHERE digest = ?", (now, digest))
+            else:
+                size = data_path.stat().st_size
+                self._db.execute(
+                    "INSERT INTO blobs (digest, path, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (digest, str(data_path), size, now, now)
+                )
+                self.total_bytes += size
+            self._db.execute("INSERT OR REPLACE INTO links (path, digest) VALUES (?, ?)", (str(path), digest))
+
+    def get_result(self, digest: str, kind: str) -> Optional[str]:
+        """
+        获取缓存的提取结果
+
+        Args:
+            digest: 内容哈希
+            kind: 结果类型，如 "ocr"、"document"
+        """
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT content FROM results WHERE digest = ? AND kind = ?", (digest, kind)
+            ).fetchone()
+            if row:
+                self.stats['hits'] += 1
+                self._db.execute("UPDATE blobs SET last_access = ? WHERE digest = ?", (time.time(), digest))
+            else:
+                self.stats['misses'] += 1
+        return row[0] if row else None
+
+    def put_result(self, digest: str, kind: str, content: str):
+        """保存提取结果"""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (digest, kind, content, created_at) VALUES (?, ?, ?, ?)",
+                (digest, kind, content, time.time())
+            )
+
+    def needs_eviction(self) -> bool:
+        """占用空间是否超过上限"""
+        return bool(self.max_bytes) and self.total_bytes > self.max_bytes
+
+    def evict(self) -> int:
+        """
+        按LRU淘汰内容：先淘汰超过保留时间的内容，再按最后访问时间淘汰直到低于容量上限
+        （降到上限的90%，避免频繁触发）。提取结果缓存体积很小，予以保留。
+        删除前在锁内重新检查，选出之后又被访问或新增了链接的内容（如正在OCR/提取的文件）本轮不删除。
+
+        Returns:
+            淘汰的内容数量
+        """
+        now = time.time()
+        candidates = []
+        with self._lock:
+            if self.max_age:
+                candidates.extend(self._db.execute(
+                    self._CANDIDATE_QUERY + " WHERE last_access < ?", (now - self.max_age,)
+                ).fetchall())
+            remaining = self.total_bytes - sum(row[2] for row in candidates)
+            if self.max_bytes and remaining > self.max_bytes:
+                target = self.max_bytes * 0.9
+                expired = {row[0] for row in candidates}
+                for row in self._db.execute(self._CANDIDATE_QUERY + " ORDER BY last_access"):
+                    if remaining <= target:
+                        break
+                    if row[0] in expired:
+                        continue
+                    candidates.append(row)
+                    remaining -= row[2]
+
+        evicted = [row for row in candidates if self._remove_blob(*row)]
+
+        if evicted:
+            freed = sum(row[2] for row in evicted)
+            self.stats['evicted_files'] += len(evicted)
+            self.stats['evicted_bytes'] += freed
+            logger.info(f"下载缓存淘汰 {len(evicted)} 项，释放 {freed / 1024 / 1024:.1f}MB")
+        self.stats['last_eviction'] = now
+        return len(evicted)
+
+    def _remove_blob(self, digest: str, blob_path: str, size: int, last_access: float, link_count: int) -> bool:
+        """
+        删除一份内容及其在下载目录中的所有硬链接：在锁内确认选出之后未被访问、链接数未变化后才删除
+
+        Returns:
+            是否已删除
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT last_access, (SELECT COUNT(*) FROM links WHERE digest = ?) FROM blobs WHERE digest = ?",
+                (digest, digest)
+            ).fetchone()
+            if row is None or row[0] != last_access or row[1] != link_count:
+                logger.debug(f"内容在淘汰前被再次使用，保留: {digest}")
+                return False
+            paths = [link[0] for link in self._db.execute("SELECT path FROM links WHERE digest = ?", (digest,))]
+            for file_path in paths + [blob_path]:
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"删除缓存文件失败: {file_path} - {e}")
+            with self._db:
+                self._db.execute("DELETE FROM links WHERE digest = ?", (digest,))
+                self._db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+                self.total_bytes -= size
+        return True
+
+    def get_stats(self) -> dict:
+        """获取缓存统计信息"""
+        with self._lock:
+            files = self._db.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+        return {
+            'files': files,
+            'total_mb': round(self.total_bytes / 1024 / 1024, 2),
+            'max_mb': round(self.max_bytes / 1024 / 1024, 2) if self.max_bytes else 0,
+            **self.stats,
+        }
+
+    def close(self):
+        """关闭索引数据库"""
+        with self._lock:
+            self._db.close()
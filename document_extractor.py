@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档文本提取模块
+按扩展名选择提取器（PDF、DOCX、XLSX、TXT、Markdown），以生成器方式逐段读取文本，
+达到字数/页数/行数上限后立即停止，保证大文件也只占用有限内存；提取在进程池中执行
+DOCX直接从压缩包中流式解析 word/document.xml，无需额外依赖；可选依赖：PDF需要 pypdf，XLSX需要 openpyxl
+作者：dolphi
+"""
+
+import logging
+import os
+import threading
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Union
+from xml.etree.ElementTree import iterparse
+
+logger = logging.getLogger(__name__)
+
+# 估算token数量时每个token对应的字符数（中文约1.5字/token）
+CHARS_PER_TOKEN = 1.5
+# 纯文本按块读取的大小
+_TEXT_CHUNK_SIZE = 64 * 1024
+# WordprocessingML 命名空间
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+# 扩展名 -> 提取器，提取器签名: extractor(path, limits) -> Iterator[str]
+_EXTRACTORS: Dict[str, Callable[[str, dict], Iterator[str]]] = {}
+
+
+def register_extractor(*extensions: str):
+    """装饰器：为指定扩展名注册提取器"""
+    def decorator(func):
+        for ext in extensions:
+            _EXTRACTORS[ext.lower()] = func
+        return func
+    return decorator
+
+
+def is_supported(path: Union[str, Path]) -> bool:
+    """是否支持该文件类型"""
+    return Path(path).suffix.lower() in _EXTRACTORS
+
+
+@register_extractor('.txt', '.md', '.markdown', '.csv', '.log')
+def _extract_plain_text(path: str, limits: dict) -> Iterator[str]:
+    """纯文本/Markdown：按块流式读取，自动识别UTF-8与GBK编码"""
+    encoding = 'utf-8-sig'
+    with open(path, 'rb') as f:
+        head = f.read(_TEXT_CHUNK_SIZE)
+    try:
+        head.decode(encoding)
+    except UnicodeDecodeError as e:
+        # 仅当错误不是由块尾截断的多字节字符引起时才判定为GBK
+        if e.start < len(head) - 4:
+            encoding = 'gbk'
+    with open(path, 'r', encoding=encoding, errors='replace') as f:
+        for chunk in iter(lambda: f.read(_TEXT_CHUNK_SIZE), ''):
+            yield chunk
+
+
+@register_extractor('.pdf')
+def _extract_pdf(path: str, limits: dict) -> Iterator[str]:
+    """PDF：逐页提取，最多 max_pages 页"""
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    for index, page in enumerate(reader.pages):
+        if index >= limits['max_pages']:
+            yield f"\n...（仅提取前{limits['max_pages']}页）"
+            return
+        text = page.extract_text() or ""
+        if text.strip():
+            yield f"\n[第{index + 1}页]\n{text}"
+
+
+@register_extractor('.docx')
+def _extract_docx(path: str, limits: dict) -> Iterator[str]:
+    """
+    DOCX：从压缩包中流式解析 word/document.xml，按文档顺序逐段落提取，表格按行提取
+    （每个表格最多 max_rows 行）；已处理的元素随即清空，调用方停止读取时立即关闭文件
+    """
+    with zipfile.ZipFile(path) as archive, archive.open('word/document.xml') as xml:
+        paragraph = []  # 当前段落的文本片段
+        tables = []  # 嵌套表格栈，每项为 [已读行数, 当前行的单元格, 当前单元格的段落]
+        in_properties = False  # 段落属性中的 <w:tab> 是制表位定义，不是正文
+        for event, element in iterparse(xml, events=('start', 'end')):
+            tag = element.tag
+            if event == 'start':
+                if tag == _W + 'pPr':
+                    in_properties = True
+                elif tag == _W + 'tbl':
+                    tables.append([0, [], []])
+                elif tables and tag == _W + 'tr':
+                    tables[-1][1] = []
+                elif tables and tag == _W + 'tc':
+                    tables[-1][2] = []
+                continue
+
+            if tag == _W + 'pPr':
+                in_properties = False
+            elif tag == _W + 't':
+                paragraph.append(element.text or "")
+            elif tag == _W + 'tab' and not in_properties:
+                paragraph.append("\t")
+            elif tag in (_W + 'br', _W + 'cr'):
+                paragraph.append("\n")
+            elif tag == _W + 'p':
+                text = "".join(paragraph)
+                paragraph = []
+                if tables:
+                    tables[-1][2].append(text)
+                elif text.strip():
+                    yield text + "\n"
+            elif tables and tag == _W + 'tc':
+                tables[-1][1].append(" ".join(part.strip() for part in tables[-1][2] if part.strip()))
+            elif tables and tag == _W + 'tr':
+                table = tables[-1]
+                table[0] += 1
+                if table[0] <= limits['max_rows']:
+                    yield " | ".join(table[1]) + "\n"
+                elif table[0] == limits['max_rows'] + 1:
+                    yield f"...（仅提取前{limits['max_rows']}行）\n"
+            elif tag == _W + 'tbl':
+                tables.pop()
+            else:
+                continue
+            element.clear()
+
+
+@register_extractor('.xlsx', '.xlsm')
+def _extract_xlsx(path: str, limits: dict) -> Iterator[str]:
+    """XLSX：只读模式逐行读取，每个工作表最多 max_rows 行"""
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            yield f"\n[工作表 {sheet.title}]\n"
+            for row_index, row in enumerate(sheet.iter_rows(values_only=True)):
+                if row_index >= limits['max_rows']:
+                    yield f"...（仅提取前{limits['max_rows']}行）\n"
+                    break
+                if any(cell is not None for cell in row):
+                    yield " | ".join("" if cell is None else str(cell) for cell in row) + "\n"
+    finally:
+        workbook.close()
+
+
+def extract_document(path: str, max_chars: int = 4500, max_pages: int = 50, max_rows: int = 500) -> str:
+    """
+    提取文档文本（可在工作进程中执行）
+
+    Args:
+        path: 文件路径
+        max_chars: 最多提取的字符数
+        max_pages: PDF最多提取的页数
+        max_rows: 表格最多提取的行数
+
+    Returns:
+        提取的文本，超出上限时截断并附加说明
+    """
+    extractor = _EXTRACTORS.get(Path(path).suffix.lower())
+    if extractor is None:
+        return ""
+    limits = {'max_pages': max_pages, 'max_rows': max_rows}
+    parts = []
+    length = 0
+    for piece in extractor(path, limits):
+        if length + len(piece) >= max_chars:
+            parts.append(piece[:max_chars - length])
+            parts.append(f"\n...（内容过长，已截取前{max_chars}字）")
+            break
+        parts.append(piece)
+        length += len(piece)
+    return "".join(parts).strip()
+
+
+class DocumentExtractor:
+    """文档文本提取服务（进程池）"""
+
+    def __init__(self, max_workers: Optional[int] = None, max_tokens: int = 3000,
+                 max_pages: int = 50, max_rows: int = 500):
+        """
+        初始化提取服务（进程池在首次提交任务时创建）
+
+        Args:
+            max_workers: 工作进程数，默认为CPU核心数的一半
+            max_tokens: 提取文本的token预算
+            max_pages: PDF最多提取的页数
+            max_rows: 表格最多提取的行数
+        """
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+        self.max_chars = int(max_tokens * CHARS_PER_TOKEN)
+        self.max_pages = max_pages
+        self.max_rows = max_rows
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_supported(path: Union[str, Path]) -> bool:
+        """是否支持该文件类型"""
+        return is_supported(path)
+
+    def submit(self, path: Union[str, Path]) -> Future:
+        """
+        提交提取任务
+
+        Returns:
+            提取文本的 Future
+        """
+        with self._lock:
+            if self._executor is None:
+                logger.info(f"启动文档提取进程池，工作进程数: {self.max_workers}")
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            executor = self._executor
+        return executor.submit(extract_document, str(path), self.max_chars, self.max_pages, self.max_rows)
+
+    def shutdown(self, wait: bool = False):
+        """关闭进程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+链接内容抓取模块
+从消息本身（get_url()、info 中的 <url>、控件值）获取链接URL，无需模拟右键复制；
+通过独立的HTTP会话抓取网页（限制大小与耗时），用 html.parser 提取标题和正文，
+并按URL缓存结果（带过期时间，条目数有上限）；
+链接来自聊天成员，只抓取 http/https 链接，且目标主机（包括每次重定向后的主机）解析出的地址
+必须是公网地址，拒绝本机、内网、链路本地和保留地址，防止借机器人访问内网服务（SSRF）；
+建立连接后再检查实际连接的对端地址，防止检查之后域名重新解析到内网地址（DNS重绑定）；
+抓取会话不保存Cookie、不使用环境变量中的代理，与API连接器的共享会话相互隔离
+作者：dolphi
+"""
+
+import asyncio
+import ipaddress
+import logging
+import re
+import socket
+import threading
+import time
+from collections import OrderedDict
+from html.parser import HTMLParser
+from http.cookiejar import DefaultCookiePolicy
+from typing import List, Optional
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+logger = logging.getLogger(__name__)
+
+_URL_RE = re.compile(r'https?://[^\s<>"\']+')
+_INFO_URL_RE = re.compile(r'<url>(.*?)</url>', re.S)
+_SPACE_RE = re.compile(r'[ \t\r\f\v\u00a0\u3000]+')
+_BLANK_LINES_RE = re.compile(r'\n\s*\n+')
+_META_CHARSET_RE = re.compile(rb'charset=["\']?([A-Za-z0-9_-]+)', re.I)
+
+# 不包含正文的标签，其中的文本全部丢弃
+_SKIP_TAGS = {'script', 'style', 'noscript', 'template', 'svg', 'nav', 'header', 'footer', 'aside', 'form', 'iframe'}
+# 块级标签，结束时换行
+_BLOCK_TAGS = {'p', 'div', 'br', 'li', 'tr', 'section', 'article', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+               'blockquote', 'pre', 'table', 'ul', 'ol'}
+
+
+class UnsafeURLError(ValueError):
+    """链接不允许抓取（协议不支持或指向非公网地址）"""
+
+
+def _is_public_address(address: str) -> bool:
+    """是否为公网地址（排除本机、内网、链路本地、保留、组播等地址）"""
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def check_url(url: str) -> List[str]:
+    """
+    检查链接是否允许抓取：只允许 http/https，主机名解析出的所有地址都必须是公网地址
+
+    Returns:
+        解析出的地址列表
+
+    Raises:
+        UnsafeURLError: 不允许抓取
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        raise UnsafeURLError(f"不支持的链接协议: {parts.scheme or '无'}")
+    host = parts.hostname
+    if not host:
+        raise UnsafeURLError(f"链接缺少主机名: {url}")
+    try:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+    except ValueError:
+        raise UnsafeURLError(f"链接端口无效: {url}")
+    try:
+        infos = socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)
+    except socket.gaierror as e:
+        raise UnsafeURLError(f"无法解析主机 {host}: {e}")
+    addresses = sorted({info[4][0] for info in infos})
+    for address in addresses:
+        if not _is_public_address(address):
+            raise UnsafeURLError(f"拒绝抓取非公网地址: {host} -> {address}")
+    return addresses
+
+
+def _check_peer(sock, host: str):
+    """检查已建立连接的对端地址是否为公网地址，否则关闭连接"""
+    address = sock.getpeername()[0]
+    if not _is_public_address(address):
+        sock.close()
+        raise UnsafeURLError(f"拒绝抓取非公网地址: {host} -> {address}")
+
+
+class _PublicHTTPConnection(HTTPConnection):
+    """只允许连接公网地址的HTTP连接"""
+
+    def _new_conn(self):
+        sock = super()._new_conn()
+        _check_peer(sock, self.host)
+        return sock
+
+
+class _PublicHTTPSConnection(HTTPSConnection):
+    """只允许连接公网地址的HTTPS连接（先检查对端地址再进行TLS握手）"""
+
+    def _new_conn(self):
+        sock = super()._new_conn()
+        _check_peer(sock, self.host)
+        return sock
+
+
+class _PublicHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _PublicHTTPConnection
+
+
+class _PublicHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _PublicHTTPSConnection
+
+
+class _PublicOnlyAdapter(HTTPAdapter):
+    """连接池中的每个新连接都检查对端地址"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _PublicHTTPConnectionPool,
+            'https': _PublicHTTPSConnectionPool,
+        }
+
+
+def create_fetch_session(pool_maxsize: int = 8) -> requests.Session:
+    """创建链接抓取专用的HTTP会话：不保存Cookie、不读取环境代理，只连接公网地址"""
+    session = requests.Session()
+    session.trust_env = False
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    adapter = _PublicOnlyAdapter(pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def extract_url(message) -> Optional[str]:
+    """
+    从消息对象中获取链接URL（不模拟点击，但 get_url() 与控件值会访问微信界面，应在RPA线程中调用）
+
+    依次尝试：get_url()（Plus版本）、info 中的 <url> 标签、控件值中的URL
+    """
+    try:
+        if hasattr(message, 'get_url'):
+            url = message.get_url()
+            if url:
+                return url.strip()
+    except Exception as e:
+        logger.warning(f"get_url() 获取链接失败: {e}")
+
+    info = getattr(message, 'info', None)
+    if isinstance(info, str):
+        match = _INFO_URL_RE.search(info)
+        if match:
+            return match.group(1).strip().replace('&amp;', '&')
+    elif isinstance(info, dict) and isinstance(info.get('url'), str) and info['url']:
+        return info['url'].strip()
+
+    try:
+        control = getattr(message, 'control', None)
+        if control is not None and hasattr(control, 'GetValuePattern'):
+            pattern = control.GetValuePattern()
+            value = pattern.Value if pattern else ""
+            match = _URL_RE.search(value or "")
+            if match:
+                return match.group(0)
+    except Exception as e:
+        logger.warning(f"从控件值获取链接失败: {e}")
+    return None
+
+
+class _ReadableParser(HTMLParser):
+    """提取网页标题、描述与正文文本"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.description = ""
+        self.parts = []
+        self._skip_depth = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == 'title':
+            self._in_title = True
+        elif tag == 'meta':
+            attrs = dict(attrs)
+            name = (attrs.get('name') or attrs.get('property') or '').lower()
+            if name in ('description', 'og:description') and not self.description:
+                self.description = (attrs.get('content') or '').strip()
+            elif name == 'og:title' and not self.title:
+                self.title = (attrs.get('content') or '').strip()
+        elif tag == 'br':
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == 'title':
+            self._in_title = False
+        elif tag in _BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_data(self, data):
+        if self._in_title:
+            if not self.title:
+                self.title = data.strip()
+        elif not self._skip_depth:
+            self.parts.append(data)
+
+
+def extract_readable(html: str, max_chars: int = 3000) -> dict:
+    """
+    从HTML中提取可读内容
+
+    Returns:
+        {'title': 标题, 'description': 描述, 'text': 正文（最多 max_chars 字）}
+    """
+    parser = _ReadableParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception as e:
+        logger.warning(f"网页解析不完整: {e}")
+
+    lines = []
+    for line in "".join(parser.parts).split('\n'):
+        line = _SPACE_RE.sub(' ', line).strip()
+        # 过短的行多为菜单、按钮等，丢弃
+        if len(line) >= 4:
+            lines.append(line)
+    text = _BLANK_LINES_RE.sub('\n', "\n".join(lines)).strip()
+    if len(text) > max_chars:
+        text = text[:max_chars] + f"\n...（内容过长，已截取前{max_chars}字）"
+    return {'title': parser.title, 'description': parser.description, 'text': text}
+
+
+class LinkFetcher:
+    """链接内容抓取服务（带URL缓存）"""
+
+    def __init__(self, timeout: float = 8, max_bytes: int = 2 * 1024 * 1024, max_chars: int = 3000,
+                 cache_ttl: float = 3600, cache_size: int = 256, max_redirects: int = 5):
+        """
+        初始化抓取服务
+
+        Args:
+            timeout: 单次抓取总耗时上限（秒）
+            max_bytes: 网页最多读取的字节数
+            max_chars: 正文最多保留的字符数
+            cache_ttl: 缓存有效期（秒）
+            cache_size: 缓存条目数上限，超出时淘汰最久未使用的条目
+            max_redirects: 最多跟随的重定向次数（每次重定向都重新检查目标地址）
+        """
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # url -> (过期时间, 结果)
+        self._lock = threading.Lock()
+        self._session = None
+        self.headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                          "(KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+            "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.5",
+        }
+
+    def _get_cached(self, url: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._cache.get(url)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._cache[url]
+                return None
+            self._cache.move_to_end(url)
+            return entry[1]
+
+    def _put_cached(self, url: str, result: dict):
+        with self._lock:
+            self._cache[url] = (time.monotonic() + self.cache_ttl, result)
+            self._cache.move_to_end(url)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def fetch(self, url: str) -> dict:
+        """
+        抓取链接并提取可读内容（阻塞调用）
+
+        Returns:
+            {'url', 'title', 'description', 'text'}
+
+        Raises:
+            UnsafeURLError: 链接（或重定向目标）不是公网的 http/https 地址
+            抓取失败、超时或内容不是网页时抛出异常
+        """
+        cached = self._get_cached(url)
+        if cached is not None:
+            logger.info(f"命中链接缓存: {url}")
+            return cached
+
+        deadline = time.monotonic() + self.timeout
+        response = self._open(url, deadline)
+        with response:
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '')
+            if content_type and 'html' not in content_type and 'text' not in content_type:
+                raise ValueError(f"不支持的内容类型: {content_type}")
+
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= self.max_bytes:
+                    logger.info(f"网页超过 {self.max_bytes} 字节，仅解析前部内容: {url}")
+                    break
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"抓取超时: {url}")
+            body = b"".join(chunks)[:self.max_bytes]
+            encoding = response.encoding if 'charset' in content_type.lower() else None
+            if not encoding:
+                # 响应头未声明编码时从网页 <meta charset> 中获取
+                match = _META_CHARSET_RE.search(body[:4096])
+                encoding = match.group(1).decode('ascii') if match else 'utf-8'
+            final_url = response.url
+
+        try:
+            html = body.decode(encoding, errors='replace')
+        except LookupError:
+            html = body.decode('utf-8', errors='replace')
+        result = extract_readable(html, self.max_chars)
+        result['url'] = final_url
+        self._put_cached(url, result)
+        return result
+
+    def _get_session(self) -> requests.Session:
+        """获取抓取专用会话（首次调用时创建）"""
+        with self._lock:
+            if self._session is None:
+                self._session = create_fetch_session()
+            return self._session
+
+    def _open(self, url: str, deadline: float):
+        """逐跳请求并跟随重定向，每一跳请求前都检查目标地址，连接建立后再检查对端地址"""
+        session = self._get_session()
+        current = url
+        for _ in range(self.max_redirects + 1):
+            check_url(current)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"抓取超时: {url}")
+            response = session.get(current, headers=self.headers, timeout=min(self.timeout, remaining),
+                                   stream=True, allow_redirects=False)
+            if not response.is_redirect:
+                return response
+            location = response.headers.get('Location', '')
+            response.close()
+            current = urljoin(current, location)
+        raise ValueError(f"重定向次数超过 {self.max_redirects} 次: {url}")
+
+    async def fetch_async(self, url: str) -> dict:
+        """在线程池中抓取链接，不阻塞事件循环"""
+        return await asyncio.get_running_loop().run_in_executor(None, self.fetch, url)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._cache.clear()
+
+    def close(self):
+        """关闭抓取会话，释放连接池"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监听器管理模块
+用于增量同步微信监听窗口：对比期望监听集合与当前已注册集合，只添加/移除差异部分；
+添加时优先处理曾经成功注册过的窗口，每个窗口只尝试一次，失败的窗口在后台按指数退避重试，
+不拖慢其他窗口的注册，并记录每个窗口的就绪状态供界面展示
+作者：dolphi
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+from typing import Callable, Dict, Iterable, List, Optional
+
+from config_store import atomic_write_text
+
+logger = logging.getLogger(__name__)
+
+# 窗口就绪状态
+READY = 'ready'         # 已注册监听
+PENDING = 'pending'     # 等待首次注册
+RETRYING = 'retrying'   # 注册失败，等待后台重试
+FAILED = 'failed'       # 重试次数用尽
+
+
+def _timer_scheduler(func: Callable[[], None], delay: float):
+    """默认的重试调度：delay 秒后在定时器线程中执行"""
+    timer = threading.Timer(delay, func)
+    timer.daemon = True
+    timer.start()
+
+
+class ListenerReconciler:
+    """监听器增量同步器"""
+
+    def __init__(self, add_func: Callable[[str], bool], remove_func: Callable[[str], None], log_func=print,
+                 retry_scheduler: Optional[Callable[[Callable[[], None], float], None]] = None,
+                 retry_base: float = 2.0, retry_max_delay: float = 60.0, max_retries: int = 6,
+                 state_file: Optional[str] = None, on_status: Optional[Callable[[str, Dict], None]] = None):
+        """
+        初始化监听器同步器
+
+        Args:
+            add_func: 添加监听的函数（只尝试一次），参数为聊天名称，成功返回True
+            remove_func: 移除监听的函数，参数为聊天名称
+            log_func: 日志输出函数
+            retry_scheduler: 重试调度函数 retry_scheduler(func, delay)，默认使用定时器线程；
+                             微信UI操作不能并发，机器人传入提交到RPA执行器的调度函数
+            retry_base: 首次重试的等待秒数，之后每次翻倍
+            retry_max_delay: 重试等待的上限（秒）
+            max_retries: 后台重试的最大次数，0表示不重试
+            state_file: 记录曾经成功注册过的窗口的文件（下次启动时优先注册），None表示不保存
+            on_status: 窗口就绪状态变化回调 on_status(name, status)
+        """
+        self.add_func = add_func
+        self.remove_func = remove_func
+        self.log = log_func
+        self.retry_scheduler = retry_scheduler or _timer_scheduler
+        self.retry_base = retry_base
+        self.retry_max_delay = retry_max_delay
+        self.max_retries = max_retries
+        self.state_file = state_file
+        self.on_status = on_status
+
+        self.registered = set()  # 当前已注册的监听窗口
+        self.readiness: Dict[str, Dict] = {}  # 窗口名 -> {'state', 'attempts', 'error', 'next_retry', 'since'}
+        self.known_good = self._load_known_good()  # 曾经成功注册过的窗口
+        self._retry_tokens: Dict[str, object] = {}  # 窗口名 -> 最近一次安排的重试，旧的重试执行时发现不一致即放弃
+
+        # 后台同步状态
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pending = None  # 待执行的最新同步请求 (desired, on_progress, [on_done...])
+        self.progress = {'running': False, 'done': 0, 'total': 0, 'current': None}
+
+    def reset(self, registered: Iterable[str] = ()):
+        """重置已注册集合（例如微信客户端重新初始化后），并取消尚未执行的后台重试"""
+        with self._lock:
+            self.registered = set(registered)
+            self._retry_tokens.clear()
+            self.readiness = {name: self._status(READY) for name in self.registered}
+
+    def forget(self, name: str):
+        """不再跟踪该窗口：取消尚未执行的后台重试并移除其就绪状态（例如添加失败后已从配置中回滚）"""
+        with self._lock:
+            self._retry_tokens.pop(name, None)
+            if name not in self.registered:
+                self.readiness.pop(name, None)
+
+    # ---------------- 就绪状态 ----------------
+
+    @staticmethod
+    def _status(state: str, attempts: int = 0, error: str = None, next_retry: float = None) -> Dict:
+        return {'state': state, 'attempts': attempts, 'error': error, 'next_retry': next_retry, 'since': time.time()}
+
+    def _set_status(self, name: str, state: str, **kwargs):
+        status = self._status(state, **kwargs)
+        with self._lock:
+            self.readiness[name] = status
+        if self.on_status:
+            try:
+                self.on_status(name, dict(status))
+            except Exception as e:
+                self.log(f"监听状态回调异常: {e}")
+
+    def get_readiness(self) -> Dict[str, Dict]:
+        """每个窗口的就绪状态（副本）"""
+        with self._lock:
+            return {name: dict(status) for name, status in self.readiness.items()}
+
+    def summary(self) -> Dict[str, int]:
+        """按状态统计窗口数：{'total', 'ready', 'pending', 'retrying', 'failed'}"""
+        with self._lock:
+            states = [status['state'] for status in self.readiness.values()]
+        result = {state: states.count(state) for state in (READY, PENDING, RETRYING, FAILED)}
+        result['total'] = len(states)
+        return result
+
+    # ---------------- 已知可用窗口 ----------------
+
+    def _load_known_good(self) -> set:
+        if not self.state_file or not os.path.exists(self.state_file):
+            return set()
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return set(json.load(f).get('known_good', []))
+        except Exception as e:
+            logger.warning(f"读取监听状态文件失败: {self.state_file} - {e}")
+            return set()
+
+    def _remember(self, name: str):
+        """记录成功注册的窗口（原子写入，避免写入中断损坏文件）"""
+        with self._lock:
+            if name in self.known_good:
+                return
+            self.known_good.add(name)
+            names = sorted(self.known_good)
+        if not self.state_file:
+            return
+        try:
+            atomic_write_text(self.state_file, json.dumps({'known_good': names}, ensure_ascii=False, indent=2))
+        except Exception as e:
+            logger.warning(f"保存监听状态文件失败: {self.state_file} - {e}")
+
+    # ---------------- 添加与后台重试 ----------------
+
+    def _try_add(self, name: str):
+        """
+        尝试添加一次监听（异常视为失败）
+
+        Returns:
+            (是否成功, 异常信息)
+        """
+        error = None
+        try:
+            ok = bool(self.add_func(name))
+        except Exception as e:
+            ok = False
+            error = str(e)
+            self.log(f"添加监听异常: {name} - {e}")
+        if ok:
+            with self._lock:
+                self.registered.add(name)
+            self._set_status(name, READY)
+            self._remember(name)
+        return ok, error
+
+    def _schedule_retry(self, name: str, attempts: int, error: str = None):
+        """安排第 attempts 次后台重试，超过最大次数时标记为失败"""
+        if attempts > self.max_retries:
+            self._set_status(name, FAILED, attempts=attempts - 1, error=error)
+            self.log(f"添加监听失败（已重试 {attempts - 1} 次，放弃）: {name}")
+            return
+        delay = min(self.retry_max_delay, self.retry_base * 2 ** (attempts - 1))
+        self._set_status(name, RETRYING, attempts=attempts - 1, error=error, next_retry=time.time() + delay)
+        token = object()
+        with self._lock:
+            self._retry_tokens[name] = token
+        self.retry_scheduler(lambda: self._retry(name, attempts, token), delay)
+
+    def _retry(self, name: str, attempts: int, token: object):
+        """后台重试一次添加监听"""
+        with self._lock:
+            if self._retry_tokens.get(name) is not token or name in self.registered:
+                return  # 已重置、已注册、已不再需要监听或有更新的重试
+            del self._retry_tokens[name]
+        ok, error = self._try_add(name)
+        if ok:
+            self.log(f"后台重试添加监听成功: {name}（第 {attempts} 次重试）")
+        else:
+            self._schedule_retry(name, attempts + 1, error)
+
+    def diff(self, desired: Iterable[str]):
+        """
+        计算差异
+
+        Returns:
+            (需要添加的列表, 需要移除的列表)，添加列表保持期望顺序
+        """
+        desired_list = []
+        seen = set()
+        for name in desired:
+            if name and name not in seen:
+                seen.add(name)
+                desired_list.append(name)
+        with self._lock:
+            to_add = [name for name in desired_list if name not in self.registered]
+            to_remove = [name for name in self.registered if name not in seen]
+            # 曾经成功注册过的窗口排在前面（排序稳定，其余保持期望顺序）
+            to_add.sort(key=lambda name: name not in self.known_good)
+        return to_add, to_remove
+
+    def reconcile(self, desired: Iterable[str], on_progress: Optional[Callable] = None) -> Dict[str, List[str]]:
+        """
+        同步执行一次增量同步
+
+        Args:
+            desired: 期望的监听窗口列表
+            on_progress: 进度回调 on_progress(done, total, name, ok)
+
+        Returns:
+            {'added': [...], 'removed': [...], 'failed': [...]}，failed 中的窗口若仍可重试会在后台继续重试
+        """
+        desired = list(desired)
+        to_add, to_remove = self.diff(desired)
+        with self._lock:
+            # 不再需要的窗口不再展示状态，对应的后台重试随之失效
+            wanted = set(desired)
+            for name in list(self.readiness):
+                if name not in wanted and name not in self.registered:
+                    del self.readiness[name]
+                    self._retry_tokens.pop(name, None)
+        total = len(to_add) + len(to_remove)
+        result = {'added': [], 'removed': [], 'failed': []}
+        self.progress = {'running': True, 'done': 0, 'total': total, 'current': None}
+
+        if total == 0:
+            self.progress['running'] = False
+            self.log("监听器已是最新状态，无需同步")
+            return result
+
+        self.log(f"开始同步监听器：新增 {len(to_add)} 个，移除 {len(to_remove)} 个")
+        done = 0
+        for name in to_remove:
+            self.progress['current'] = name
+            ok = True
+            try:
+                self.remove_func(name)
+                result['removed'].append(name)
+            except Exception as e:
+                ok = False
+                result['failed'].append(name)
+                self.log(f"移除监听失败: {name} - {e}")
+            # 无论移除是否成功都不再视为已注册，避免反复尝试
+            with self._lock:
+                self.registered.discard(name)
+                self.readiness.pop(name, None)
+            done += 1
+            self.progress['done'] = done
+            if on_progress:
+                on_progress(done, total, name, ok)
+
+        for name in to_add:
+            # 本次同步会重新尝试，之前安排的后台重试作废
+            with self._lock:
+                self._retry_tokens.pop(name, None)
+            self._set_status(name, PENDING)
+        for name in to_add:
+            self.progress['current'] = name
+            ok, error = self._try_add(name)
+            if ok:
+                result['added'].append(name)
+            else:
+                result['failed'].append(name)
+                self._schedule_retry(name, 1, error)
+            done += 1
+            self.progress['done'] = done
+            if on_progress:
+                on_progress(done, total, name, ok)
+
+        self.progress['running'] = False
+        self.progress['current'] = None
+        self.log(f"监听器同步完成：新增 {len(result['added'])}，移除 {len(result['removed'])}，失败 {len(result['failed'])}")
+        return result
+
+    def reconcile_async(self, desired: Iterable[str], on_progress: Optional[Callable] = None,
+                        on_done: Optional[Callable] = None):
+        """
+        在后台线程中执行增量同步
+
+        同步进行中再次调用时，只保留最新一次请求，在当前同步结束后执行。
+
+        Args:
+            desired: 期望的监听窗口列表
+            on_progress: 进度回调 on_progress(done, total, name, ok)
+            on_done: 完成回调 on_done(result)
+        """
+        with self._lock:
+            # 被覆盖请求的完成回调同样需要在最终同步后通知
+            callbacks = self._pending[2] if self._pending else []
+            if on_done:
+                callbacks.append(on_done)
+            self._pending = (list(desired), on_progress, callbacks)
+            if self._worker and self._worker.is_alive():
+                self.log("监听器同步进行中，已合并本次同步请求")
+                return
+            self._worker = threading.Thread(target=self._run_pending, daemon=True)
+            self._worker.start()
+
+    def _run_pending(self):
+        """后台线程：依次执行待处理的同步请求"""
+        while True:
+            with self._lock:
+                request = self._pending
+                self._pending = None
+                if request is None:
+                    self._worker = None
+                    return
+            desired, on_progress, callbacks = request
+            try:
+                result = self.reconcile(desired, on_progress)
+            except Exception as e:
+                self.log(f"监听器同步异常: {e}\n{traceback.format_exc()}")
+                result = {'added': [], 'removed': [], 'failed': list(desired)}
+                self.progress['running'] = False
+            for callback in callbacks:
+                try:
+                    callback(result)
+                except Exception as e:
+                    self.log(f"监听器同步完成回调异常: {e}")
+
+    def is_busy(self) -> bool:
+        """是否有同步正在进行"""
+        with self._lock:
+            return bool(self._worker and self._worker.is_alive())
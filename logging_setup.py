@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志配置模块
+基于标准库 logging：级别不满足时在格式化之前直接丢弃（消息使用 %s 延迟格式化），
+日志记录只放入队列，由后台线程批量格式化并写入文件（按大小轮转）和控制台，
+调用方几乎不承担I/O开销
+作者：dolphi
+"""
+
+import logging
+import os
+import queue
+import sys
+import threading
+from typing import Optional
+
+_LOG_FORMAT = "[%(asctime)s][%(levelname)s][%(name)s]%(message_id_tag)s %(message)s"
+_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_handler = None  # 全局唯一的后台日志处理器
+
+
+class _ContextFormatter(logging.Formatter):
+    """支持可选的 message_id 字段（通过 extra={'message_id': ...} 传入）"""
+
+    def format(self, record):
+        message_id = getattr(record, 'message_id', None)
+        record.message_id_tag = f"[{message_id}]" if message_id else ""
+        return super().format(record)
+
+
+class BackgroundBatchHandler(logging.Handler):
+    """
+    后台批量写日志的处理器
+
+    emit() 只把日志记录放入队列；后台线程每次取出队列中的全部记录，
+    格式化后一次性写入文件（超过 max_bytes 时轮转）和控制台
+    """
+
+    def __init__(self, log_file: Optional[str] = None, max_bytes: int = 10 * 1024 * 1024,
+                 backup_count: int = 5, console_level: int = logging.INFO,
+                 console_skip_tailed: bool = False, batch_size: int = 500):
+        """
+        Args:
+            log_file: 日志文件路径，None表示不写文件
+            max_bytes: 单个日志文件的大小上限（字节）
+            backup_count: 保留的历史日志文件数
+            console_level: 输出到控制台（stdout）的最低级别
+            console_skip_tailed: 控制台不输出已在界面日志缓冲区中显示的记录（record.tailed）
+            batch_size: 每批最多写入的记录数
+        """
+        super().__init__()
+        self.log_file = log_file
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.console_level = console_level
+        self.console_skip_tailed = console_skip_tailed
+        self.batch_size = batch_size
+        self.setFormatter(_ContextFormatter(_LOG_FORMAT, _DATE_FORMAT))
+
+        self._queue = queue.SimpleQueue()
+        self._stream = None
+        self._size = 0
+        if log_file:
+            os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+            self._open()
+        self._thread = threading.Thread(target=self._writer, name="log_writer", daemon=True)
+        self._thread.start()
+
+    def emit(self, record):
+        # 在调用线程中固定消息内容与异常信息，格式化留给后台线程
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        self._queue.put(record)
+
+    def _open(self):
+        self._stream = open(self.log_file, 'a', encoding='utf-8')
+        self._size = self._stream.tell()
+
+    def _rotate(self):
+        """按大小轮转：wxbot.log -> wxbot.log.1 -> ... -> wxbot.log.N"""
+        self._stream.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.log_file}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.log_file}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.log_file, f"{self.log_file}.1")
+        else:
+            os.remove(self.log_file)
+        self._open()
+
+    def _writer(self):
+        """后台线程：批量取出日志记录并写入"""
+        while True:
+            records = [self._queue.get()]
+            try:
+                while len(records) < self.batch_size:
+                    records.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            stop = records[-1] is None
+            records = [record for record in records if record is not None]
+            try:
+                self._write(records)
+            except Exception:
+                pass
+            if stop:
+                break
+
+    def _write(self, records):
+        file_lines = []
+        console_lines = []
+        for record in records:
+            line = self.format(record)
+            file_lines.append(line)
+            if record.levelno >= self.console_level and not (
+                    self.console_skip_tailed and getattr(record, 'tailed', False)):
+                console_lines.append(line)
+        if self._stream is not None and file_lines:
+            text = "\n".join(file_lines) + "\n"
+            self._stream.write(text)
+            self._stream.flush()
+            self._size += len(text.encode('utf-8'))
+            if self.max_bytes and self._size >= self.max_bytes:
+                self._rotate()
+        if console_lines:
+            stream = sys.stdout
+            if stream is not None:
+                stream.write("\n".join(console_lines) + "\n")
+
+    def close(self):
+        """写完队列中的日志后停止后台线程"""
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        super().close()
+
+
+def setup_logging(level="INFO", log_file: Optional[str] = "logs/wxbot.log", max_bytes: int = 10 * 1024 * 1024,
+                  backup_count: int = 5, console_level="INFO", console_skip_tailed: bool = False):
+    """
+    配置根日志记录器（重复调用时只更新记录级别，输出位置以首次调用为准）
+
+    Args:
+        level: 记录的最低级别，如 "DEBUG"、"INFO"
+        log_file: 日志文件路径，None表示不写文件
+        max_bytes: 单个日志文件的大小上限（字节）
+        backup_count: 保留的历史日志文件数
+        console_level: 输出到控制台的最低级别
+        console_skip_tailed: 控制台不输出已在界面日志缓冲区中显示的记录
+    """
+    global _handler
+    root = logging.getLogger()
+    root.setLevel(logging.getLevelName(level) if isinstance(level, str) else level)
+    if _handler is None:
+        console_level = logging.getLevelName(console_level) if isinstance(console_level, str) else console_level
+        _handler = BackgroundBatchHandler(log_file, max_bytes, backup_count, console_level, console_skip_tailed)
+        root.addHandler(_handler)
+    return _handler
+
+
+def set_level(level):
+    """运行时调整日志级别"""
+    logging.getLogger().setLevel(logging.getLevelName(level) if isinstance(level, str) else level)
+
+
+def shutdown_logging():
+    """写完剩余日志并关闭后台线程"""
+    global _handler
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler.close()
+        _handler = None
@@ -21,13 +21,21 @@ import threading    # 多线程支持
 import ctypes       # 用于在线程中抛出异常
 import inspect      # 检查对象类型
 import queue        # 队列，用于线程间传递数据
-import wxbot_preview  # 导入机器人服务模块
+import multiprocessing  # 进程池支持（OCR）
+from logging_setup import setup_logging
+from startup_timing import startup  # 启动阶段耗时统计
+from config_store import config_store  # 配置文件异步原子保存
+# 机器人服务模块 wxbot_preview 在首次启动机器人时才导入（在机器人线程中），界面无需等待其加载
 import time
 from datetime import datetime
 import tkinter       # 添加tkinter导入以处理TclError
 
 # 配置文件名称常量
 CONFIG_FILE = "config.json"
+# 日志窗口最多保留的行数，超出时删除最早的行
+MAX_OUTPUT_LINES = 3000
+# 每次刷新最多从输出队列取出的条数，避免日志突发时界面卡顿
+MAX_OUTPUT_DRAIN = 5000
 
 def _async_raise(tid, exctype):
     """
@@ -222,8 +230,8 @@ class ConfigEditor:
         self.setup_ui()
         self.load_config()
         
-        # 初始化异步日志跟踪
-        self._last_async_log_count = 0
+        # 初始化异步日志跟踪（增量读取的游标）
+        self._async_log_cursor = 0
         
         # 开始定时更新机器人输出显示
         self.update_output()
@@ -492,14 +500,27 @@ class ConfigEditor:
         try:
             if hasattr(self, 'output_text'):
                 timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                log_entry = f"[{timestamp}] {message}\n"
-                self.output_text.config(state=tk.NORMAL)
-                self.output_text.insert(tk.END, log_entry)
-                self.output_text.see(tk.END)
-                self.output_text.config(state=tk.DISABLED)
+                self.append_output(f"[{timestamp}] {message}\n")
         except Exception as e:
             print(f"日志输出错误: {e}")
 
+    def append_output(self, text):
+        """
+        向日志窗口追加文本：一次插入，超过 MAX_OUTPUT_LINES 行时删除最早的行，
+        用户向上滚动查看时不自动滚动到底部
+        """
+        if not text:
+            return
+        follow = self.output_text.yview()[1] >= 0.999
+        self.output_text.config(state=tk.NORMAL)
+        self.output_text.insert(tk.END, text)
+        line_count = int(self.output_text.index('end-1c').split('.')[0])
+        if line_count > MAX_OUTPUT_LINES:
+            self.output_text.delete("1.0", f"{line_count - MAX_OUTPUT_LINES + 1}.0")
+        self.output_text.config(state=tk.DISABLED)
+        if follow:
+            self.output_text.see(tk.END)
+
     def save_api_config(self):
         """保存API配置"""
         try:
@@ -535,8 +556,7 @@ class ConfigEditor:
                 self.config['api_configs'] = api_configs
                 # 更新内存中的配置
                 self.api_configs = api_configs
-                with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-                    json.dump(self.config, f, ensure_ascii=False, indent=4)
+                config_store.save(self.config)
             
             self.log_message(f"已保存 {len(api_configs)} 个API配置")
             messagebox.showinfo("成功", "API配置已保存")
@@ -633,8 +653,7 @@ class ConfigEditor:
             # 保存到配置文件
             if hasattr(self, 'config'):
                 self.config['listen_rules'] = listen_rules
-                with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-                    json.dump(self.config, f, ensure_ascii=False, indent=4)
+                config_store.save(self.config)
             
             # 记录全局设置
             global_status = "启用" if listen_rules['global_bot_enabled'] else "禁用"
@@ -678,8 +697,7 @@ class ConfigEditor:
             # 保存到配置文件
             if hasattr(self, 'config'):
                 self.config.update(bot_settings)
-                with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-                    json.dump(self.config, f, ensure_ascii=False, indent=4)
+                config_store.save(self.config)
             
             self.log_message("机器人设置已保存")
             messagebox.showinfo("成功", "机器人设置已保存")
@@ -706,8 +724,7 @@ class ConfigEditor:
             # 保存到配置文件
             if hasattr(self, 'config'):
                 self.config['memo_data'] = memo_data
-                with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-                    json.dump(self.config, f, ensure_ascii=False, indent=4)
+                config_store.save(self.config)
             
             self.log_message(f"已保存 {len(memo_data)} 个备忘录项目")
             messagebox.showinfo("成功", "备忘录已保存")
@@ -1586,11 +1603,31 @@ class ConfigEditor:
     def update_async_status(self):
         """更新异步处理器状态显示"""
         try:
-            import wxbot_preview
-            if hasattr(wxbot_preview, 'async_message_handler'):
+            # 机器人模块尚未导入（未启动过）时不触发导入
+            wxbot_preview = sys.modules.get('wxbot_preview')
+            if wxbot_preview is None:
+                self.async_status_var.set("异步处理器: 已停止")
+                self.async_status_label.config(bootstyle="danger")
+            elif hasattr(wxbot_preview, 'async_message_handler'):
                 status = wxbot_preview.async_message_handler.async_handler.get_status()
                 if status['is_running']:
                     status_text = f"异步处理器: 运行中 | 队列:{status['queue_size']} | 处理中:{status['processing_count']} | 日志:{status['log_lines']}/{status['max_log_lines']}"
+                    summary = status.get('metrics') or {}
+                    if summary.get('api_p95') is not None:
+                        status_text += f" | API p95:{summary['api_p95']:.1f}s"
+                    if summary.get('reply_p95') is not None:
+                        status_text += f" | 回复 p95:{summary['reply_p95']:.1f}s"
+                    if summary.get('errors') or summary.get('shed'):
+                        status_text += f" | 错误:{summary['errors']} 丢弃:{summary['shed']}"
+                    # 各监听窗口的就绪状态（注册失败的窗口在后台重试）
+                    listener_status = wxbot_preview.get_listener_status()
+                    if listener_status and listener_status['summary']['total']:
+                        counts = listener_status['summary']
+                        status_text += f" | 监听就绪:{counts['ready']}/{counts['total']}"
+                        waiting = [f"{name}({'重试中' if item['state'] == 'retrying' else '失败' if item['state'] == 'failed' else '注册中'})"
+                                   for name, item in listener_status['chats'].items() if item['state'] != 'ready']
+                        if waiting:
+                            status_text += " 未就绪:" + ", ".join(waiting[:5]) + (" 等" if len(waiting) > 5 else "")
                     self.async_status_label.config(bootstyle="success")
                 else:
                     status_text = "异步处理器: 已停止"
@@ -1599,6 +1636,14 @@ class ConfigEditor:
         except (ImportError, AttributeError):
             self.async_status_var.set("异步处理器: 不可用")
             self.async_status_label.config(bootstyle="secondary")
+
+        # 配置写盘失败时提示（配置保留在内存中，后台退避重试）
+        config_stats = config_store.get_stats()
+        if config_stats['last_error'] and config_stats['pending']:
+            error = config_stats['last_error']
+            error = error if len(error) <= 60 else error[:60] + "..."
+            self.async_status_var.set(f"{self.async_status_var.get()} | 配置保存失败(第{config_stats['failures']}次，重试中): {error}")
+            self.async_status_label.config(bootstyle="warning")
         
         # 每3秒更新一次状态
         self.root.after(3000, self.update_async_status)
@@ -1768,7 +1813,7 @@ class ConfigEditor:
             2. 读取 JSON 数据，并根据各配置项生成对应的UI组件。
         """
         try:
-            if not os.path.exists(CONFIG_FILE):
+            if not config_store.exists():
                 # 创建新版配置文件结构
                 base_config = {
                     # 机器人设置
@@ -1805,13 +1850,12 @@ class ConfigEditor:
                     ]
                 }
                 
-                with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-                    json.dump(base_config, f, ensure_ascii=False, indent=4)
+                config_store.save(base_config)
+                config_store.flush()
                 messagebox.showinfo("提示", f"已创建默认配置文件：\n{os.path.abspath(CONFIG_FILE)}\n请根据需求修改配置")
                 
             # 读取配置文件
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                self.config = json.load(f)
+            self.config = config_store.load()
             
             # 加载各个模块的配置
             self.load_api_configs()
@@ -1925,8 +1969,7 @@ class ConfigEditor:
                     new_config[key] = widget.get("1.0", tk.END).strip()
                 else:
                     new_config[key] = widget.get()
-            with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-                json.dump(new_config, f, ensure_ascii=False, indent=4)
+            config_store.save(new_config)
             messagebox.showinfo("成功", "配置已保存，建议重启机器人以生效")
             self.load_config()
         except Exception as e:
@@ -1961,6 +2004,9 @@ class ConfigEditor:
                         pythoncom.CoInitialize()
                     except ImportError:
                         pass
+                    startup.reset()
+                    with startup.phase('import'):
+                        import wxbot_preview
                     wxbot_preview.start_bot()
                 except Exception as e:
                     print("机器人运行时出错：", e)
@@ -1994,6 +2040,7 @@ class ConfigEditor:
             if self.bot_thread and self.bot_thread.is_alive():
                 # _async_raise(self.bot_thread.ident, KeyboardInterrupt)
                 # self.bot_thread.join(timeout=10)
+                import wxbot_preview
                 wxbot_preview.stop_bot() # 调用 wxbot_preview 模块的停止函数
                 self.status_var.set("状态：机器人已关闭")
                 self.toggle_bot_button.config(text="启动机器人", command=self.start_bot, bootstyle="primary")
@@ -2016,43 +2063,43 @@ class ConfigEditor:
         定时检查输出队列和异步处理器日志，将机器人线程的输出显示在文本框中
         每100毫秒检查一次
         """
+        chunks = []
+        try:
+            # 取出机器人线程输出队列中的内容（每次最多 MAX_OUTPUT_DRAIN 条）
+            for _ in range(MAX_OUTPUT_DRAIN):
+                chunks.append(self.output_queue.get_nowait())
+        except queue.Empty:
+            pass
+
         try:
-            # 检查机器人线程输出队列
-            while not self.output_queue.empty():
-                text = self.output_queue.get_nowait()
-                self.output_text.config(state=tk.NORMAL)
-                self.output_text.insert(tk.END, text)
-                self.output_text.see(tk.END)
-                self.output_text.config(state=tk.DISABLED)
-            
             # 检查异步处理器日志（如果可用）
             try:
-                import wxbot_preview
+                wxbot_preview = sys.modules.get('wxbot_preview')
                 if hasattr(wxbot_preview, 'async_message_handler'):
-                    # 获取新的日志条目
-                    logs = wxbot_preview.async_message_handler.async_handler.get_logs(10)  # 获取最近10条
-                    if logs and hasattr(self, '_last_async_log_count'):
-                        new_logs = logs[self._last_async_log_count:]
-                        if new_logs:
-                            self.output_text.config(state=tk.NORMAL)
-                            for log in new_logs:
-                                self.output_text.insert(tk.END, log + "\n")
-                            self.output_text.see(tk.END)
-                            self.output_text.config(state=tk.DISABLED)
-                    
-                    self._last_async_log_count = len(logs)
+                    # 只获取上次读取之后的新日志
+                    new_logs, self._async_log_cursor = \
+                        wxbot_preview.async_message_handler.async_handler.get_logs_since(self._async_log_cursor)
+                    chunks.extend(log + "\n" for log in new_logs)
             except (ImportError, AttributeError):
                 pass
-                
-        except queue.Empty:
-            pass
+
+            # 本轮所有内容合并为一次插入
+            if chunks:
+                self.append_output("".join(chunks))
+        except Exception as e:
+            print(f"日志输出错误: {e}", file=sys.__stdout__)
         self.root.after(100, self.update_output)
 
 def main():
     """程序入口函数：创建窗口并启动主事件循环"""
+    # 日志写入文件；机器人线程的控制台输出显示在界面上（INFO及以上），
+    # 异步处理器日志已通过日志缓冲区显示，不再重复输出到控制台
+    setup_logging(console_level="INFO", console_skip_tailed=True)
     root = ttk.Window()
     app = ConfigEditor(root)
     root.mainloop()
 
 if __name__ == "__main__":
+    # OCR等进程池在打包后的exe中需要此调用
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+消息信封模块
+用于在 wxauto 回调 -> 异步消息处理器 -> 微信发送器 之间传递消息，
+使用 __slots__ 固定字段，避免每条消息动态创建类对象
+作者：dolphi
+"""
+
+import itertools
+import time
+from typing import Dict, Optional
+
+_sequence = itertools.count(1)
+
+
+class MessageEnvelope:
+    """消息信封"""
+
+    __slots__ = (
+        'content',      # 处理后的消息内容（送给AI的文本）
+        'sender',       # 发送人
+        'attr',         # 消息属性（friend/self/system...）
+        'type',         # 消息类型（text/image/voice/link...）
+        'info',         # 原始消息信息，用于链接解析等
+        'chat_key',     # 聊天窗口标识（chat.who）
+        'chat',         # 聊天窗口对象
+        'raw',          # 原始wxauto消息对象，用于下载、语音转文字等
+        'transcript',   # 路由前完成的语音转写结果，None表示未转写
+        'route',        # 路由决策：user / group / admin
+        'api_config',   # 使用的API配置
+        'message_id',   # 消息ID
+        'seq',          # 全局递增序号，用于队列内稳定排序
+        'status',       # 处理状态：created / queued / processing / completed / error
+        'created_at',   # 创建时间（time.time()）
+        'timestamps',   # 各阶段时间戳 {阶段: time.monotonic()}
+        'pending_sends',  # 尚未发送完成的回复条数（归零时结束追踪）
+    )
+
+    def __init__(self, content: str, chat=None, sender: Optional[str] = None, attr: str = 'friend',
+                 type: str = 'text', info=None, raw=None, route: str = 'user', api_config: Dict = None,
+                 received_at: Optional[float] = None, transcript: Optional[str] = None):
+        self.content = content
+        self.chat = chat
+        self.chat_key = getattr(chat, 'who', '') if chat is not None else ''
+        self.sender = sender
+        self.attr = attr
+        self.type = type or 'text'
+        self.info = info if info is not None else {}
+        self.raw = raw
+        self.transcript = transcript
+        self.route = route
+        self.api_config = api_config
+        self.seq = next(_sequence)
+        self.created_at = time.time()
+        self.message_id = f"{self.chat_key}_{int(self.created_at * 1000)}"
+        self.status = 'created'
+        self.pending_sends = 0
+        now = time.monotonic()
+        if received_at is None:
+            self.timestamps = {'received': now}
+        else:
+            # 监听回调收到消息的时间；创建信封的时间（分发线程完成预处理）记为分发时间
+            self.timestamps = {'received': received_at, 'dispatched': now}
+
+    @classmethod
+    def from_message(cls, message, chat=None, content: Optional[str] = None, route: str = 'user',
+                     received_at: Optional[float] = None, transcript: Optional[str] = None):
+        """
+        从wxauto消息对象创建信封
+
+        Args:
+            message: wxauto消息对象
+            chat: 聊天窗口对象
+            content: 处理后的内容，None表示使用原始内容
+            route: 路由决策
+            received_at: 监听回调收到消息的时间（time.monotonic()），None表示当前时间
+            transcript: 语音消息在路由前的转写结果
+        """
+        if isinstance(message, cls):
+            return message
+        return cls(
+            content=message.content if content is None else content,
+            chat=chat,
+            sender=getattr(message, 'sender', None),
+            attr=getattr(message, 'attr', 'friend'),
+            type=getattr(message, 'type', 'text'),
+            info=getattr(message, 'info', None),
+            raw=message,
+            route=route,
+            received_at=received_at,
+            transcript=transcript,
+        )
+
+    def mark(self, stage: str):
+        """记录阶段时间戳"""
+        self.timestamps[stage] = time.monotonic()
+
+    def __repr__(self):
+        return f"MessageEnvelope(id={self.message_id!r}, type={self.type!r}, route={self.route!r})"
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+消息内容规范化模块
+在登录后按机器人昵称构建一次，对每条消息只做一次@识别、首尾空白与表情标签处理，
+后续的指令匹配、群聊@判断、AI输入等环节复用同一个规范化结果；
+消息内部的空白原样保留（管理员指令参数、AI设定等文本不被改动）
+作者：dolphi
+"""
+
+import re
+
+# 微信内置表情在文本中表现为 [微笑]、[捂脸] 这样的标签
+_EMOJI_TAG_RE = re.compile(r"\[[\u4e00-\u9fa5A-Za-z]{1,8}\]")
+
+
+class NormalizedContent:
+    """规范化后的消息内容"""
+
+    __slots__ = ('raw', 'text', 'plain', 'mentioned')
+
+    def __init__(self, raw: str, text: str, plain: str, mentioned: bool):
+        """
+        Args:
+            raw: 原始消息内容
+            text: 去除@机器人及首尾空白后的内容
+            plain: 在 text 基础上去除表情标签后的内容，用于关键字比较
+            mentioned: 消息中是否@了机器人
+        """
+        self.raw = raw
+        self.text = text
+        self.plain = plain
+        self.mentioned = mentioned
+
+    def __repr__(self):
+        return f"NormalizedContent(text={self.text!r}, mentioned={self.mentioned})"
+
+
+class MessageNormalizer:
+    """消息内容规范化器"""
+
+    def __init__(self, nickname: str = ""):
+        """
+        初始化规范化器
+
+        Args:
+            nickname: 机器人的微信昵称，为空时不识别@
+        """
+        self.nickname = nickname or ""
+        self.at_tag = "@" + self.nickname if self.nickname else ""
+        # 昵称可能包含正则元字符，必须转义；同时吞掉@后面跟随的空白（微信@某人后会跟一个四分之一空格 \u2005）
+        self._at_re = re.compile(re.escape(self.at_tag) + r"[ \u2005\u00a0]?") if self.at_tag else None
+
+    def normalize(self, content) -> NormalizedContent:
+        """
+        规范化消息内容
+
+        Args:
+            content: 原始消息内容
+
+        Returns:
+            NormalizedContent 对象
+        """
+        raw = content if isinstance(content, str) else str(content or "")
+        mentioned = bool(self.at_tag) and self.at_tag in raw
+        text = self._at_re.sub("", raw) if mentioned else raw
+        text = text.strip()  # str.strip 同样去除 \u2005、不间断空格与全角空格
+        plain = _EMOJI_TAG_RE.sub("", text).strip() if "[" in text else text
+        return NormalizedContent(raw, text, plain, mentioned)
@@ -2,34 +2,107 @@
 # -*- coding: utf-8 -*-
 """
 消息处理器模块
-用于处理不同类型的微信消息，提取实际可用内容
+用于处理不同类型的微信消息，提取实际可用内容；
+下载、语音转文字、读取链接等微信UI操作提交到RPA执行器串行执行，
+之后的OCR、文档解析、语音识别等计算在各自的进程池中进行
 作者：dolphi
 """
 
+import asyncio
 import logging
 from pathlib import Path
-from typing import Union, Optional
+from typing import Union, Optional, Tuple
 import re
+import threading
+
+from content_store import ContentStore
+from document_extractor import DocumentExtractor
+from link_fetcher import LinkFetcher, extract_url
+from ocr_service import OCRService
+from rpa_executor import SerialTaskExecutor, rpa
+from speech_to_text import SpeechToTextService
 
 class MessageProcessor:
     """消息处理器 - 处理各种类型的微信消息"""
     
-    def __init__(self, enable_ocr: bool = False, download_path: str = None):
+    def __init__(self, enable_ocr: bool = False, download_path: str = None, ocr_workers: int = 1,
+                 cache_max_mb: float = 2048, cache_max_age_days: float = 30,
+                 enable_document: bool = True, document_max_tokens: int = 3000, document_workers: int = None,
+                 enable_stt: bool = False, stt_engine: str = 'vosk', stt_model_path: str = "",
+                 stt_workers: int = 1, stt_max_pending: int = 4,
+                 enable_link_fetch: bool = True, link_timeout: float = 8, link_max_kb: int = 2048,
+                 link_cache_ttl: float = 3600, ui_executor: SerialTaskExecutor = None):
         """
         初始化消息处理器
         
         Args:
             enable_ocr: 是否启用图片OCR识别
             download_path: 文件下载路径
+            ocr_workers: OCR工作进程数（每个进程加载一份模型）
+            cache_max_mb: 下载目录占用空间上限（MB），0表示不限制
+            cache_max_age_days: 下载内容最长保留天数（按最后访问时间），0表示不限制
+            enable_document: 是否提取文件消息中的文档文本
+            document_max_tokens: 文档文本送入AI的token预算
+            document_workers: 文档提取工作进程数
+            enable_stt: 是否启用本地离线语音识别
+            stt_engine: 语音识别引擎（vosk / faster_whisper）
+            stt_model_path: 语音识别模型路径
+            stt_workers: 语音识别工作进程数
+            stt_max_pending: 同时处理的语音消息上限，避免语音突发挤占文本消息的处理
+            enable_link_fetch: 是否抓取链接消息的网页正文
+            link_timeout: 网页抓取耗时上限（秒）
+            link_max_kb: 网页最多读取的大小（KB）
+            link_cache_ttl: 网页内容缓存有效期（秒）
+            ui_executor: 执行微信UI操作的串行执行器，默认使用全局RPA执行器
         """
         self.enable_ocr = enable_ocr
         self.download_path = download_path or "./downloads"
-        
-        # 确保下载目录存在
-        Path(self.download_path).mkdir(parents=True, exist_ok=True)
+        # wxauto 的UI操作不是线程安全的，与发送消息等操作在同一线程中串行执行
+        self.ui_executor = ui_executor or rpa
+
+        # 共享的OCR服务（模型在工作进程中只加载一次）
+        self.ocr_service = OCRService(max_workers=ocr_workers) if enable_ocr else None
+
+        # 文档文本提取服务（PDF/DOCX/XLSX/TXT/Markdown）
+        self.document_extractor = DocumentExtractor(
+            max_workers=document_workers, max_tokens=document_max_tokens
+        ) if enable_document else None
+
+        # 本地语音识别服务，并发数受信号量限制（信号量在所属事件循环中按需创建）
+        self.speech_to_text = SpeechToTextService(
+            engine=stt_engine, model_path=stt_model_path, max_workers=stt_workers
+        ) if enable_stt else None
+        self.stt_max_pending = max(1, stt_max_pending)
+        self._voice_semaphore = None
+        self._voice_semaphore_loop = None
+
+        # 链接网页抓取服务（按URL缓存）
+        self.link_fetcher = LinkFetcher(
+            timeout=link_timeout, max_bytes=int(link_max_kb * 1024), cache_ttl=link_cache_ttl
+        ) if enable_link_fetch else None
+
+        # 内容寻址存储：重复图片/文件去重，缓存OCR等提取结果，按容量和时间LRU淘汰；
+        # 首次使用时才创建（同时创建下载目录），导入模块不会在工作目录中生成文件
+        self.cache_max_bytes = int(cache_max_mb * 1024 * 1024)
+        self.cache_max_age = cache_max_age_days * 86400
+        self._content_store = None
+        self._store_lock = threading.Lock()
         
         # 设置日志
         self.logger = logging.getLogger(__name__)
+
+    @property
+    def content_store(self) -> ContentStore:
+        """内容寻址存储（close 之后再次使用时重新打开索引）"""
+        store = self._content_store
+        if store is None:
+            with self._store_lock:
+                if self._content_store is None:
+                    self._content_store = ContentStore(
+                        self.download_path, max_bytes=self.cache_max_bytes, max_age=self.cache_max_age
+                    )
+                store = self._content_store
+        return store
     
     def extract_content(self, msg) -> str:
         """
@@ -93,17 +166,230 @@ class MessageProcessor:
             self.logger.error(f"消息内容提取失败: {e}")
             return f"[消息处理失败: {str(e)}]"
     
+    @staticmethod
+    def _source(msg):
+        """获取原始wxauto消息对象（消息信封携带在 raw 字段中），用于下载、转文字等操作"""
+        raw = getattr(msg, 'raw', None)
+        return raw if raw is not None else msg
+
+    async def _run_ui(self, func, *args, name: str = None, **kwargs):
+        """在RPA线程中执行微信UI操作并等待结果（不占用事件循环与线程池）"""
+        return await asyncio.wrap_future(self.ui_executor.submit(func, *args, name=name, timeout=None, **kwargs))
+
+    async def extract_content_async(self, msg) -> str:
+        """
+        异步提取消息内容，供事件循环中调用
+
+        下载、语音转文字、读取链接等UI操作在RPA线程中执行，计算哈希等文件操作在线程池中执行，
+        图片OCR、文档提取、语音识别分别提交到对应的进程池，均不阻塞事件循环中其他聊天的处理。
+
+        Args:
+            msg: 微信消息对象或消息信封
+
+        Returns:
+            提取的实际内容字符串
+        """
+        msg_type = getattr(msg, 'type', 'unknown')
+        if msg_type == 'image':
+            return await self._extract_image_content_async(msg)
+        if msg_type == 'file':
+            return await self._extract_file_content_async(msg)
+        if msg_type == 'voice':
+            return await self._extract_voice_content_async(msg)
+        if msg_type == 'link':
+            return await self._extract_link_content_async(msg)
+        if msg_type == 'merge':
+            # 展开合并转发需要读取界面
+            return await self._run_ui(self.extract_content, msg, name="extract_merge")
+        # 其余类型只读取消息属性，直接在事件循环中执行
+        return self.extract_content(msg)
+
+    async def _download_async(self, msg) -> Optional[Tuple[Path, str]]:
+        """
+        下载图片/文件/语音并纳入内容寻址存储：下载在RPA线程中执行，计算哈希在线程池中执行
+
+        Returns:
+            (文件路径, 内容哈希)，无法下载时返回None
+        """
+        source = self._source(msg)
+        if not hasattr(source, 'download'):
+            return None
+        store = self.content_store  # 打开存储时创建下载目录
+        downloaded = await self._run_ui(source.download, dir_path=self.download_path, name="download")
+        self.logger.info(f"下载成功: {downloaded}")
+        digest, path = await asyncio.get_running_loop().run_in_executor(None, store.ingest, downloaded)
+        return path, digest
+
+    async def _extract_image_content_async(self, msg) -> str:
+        """异步提取图片消息内容（OCR）"""
+        try:
+            self.logger.info("处理消息类型: image")
+            downloaded = await self._download_async(msg)
+            if downloaded is None:
+                return "[图片消息 - 无法下载]"
+            img_path, digest = downloaded
+            if not self.enable_ocr:
+                return f"[图片消息] 路径: {img_path}"
+
+            # 相同内容的图片直接使用缓存的OCR结果
+            ocr_text = self.content_store.get_result(digest, 'ocr')
+            if ocr_text is None:
+                try:
+                    ocr_text = await asyncio.wrap_future(self.ocr_service.submit(img_path))
+                except Exception as ocr_e:
+                    self.logger.error(f"OCR识别失败: {ocr_e}")
+                    return f"[图片消息] 路径: {img_path}"
+                if self.ocr_service.available:
+                    self.content_store.put_result(digest, 'ocr', ocr_text)
+            else:
+                self.logger.info(f"命中OCR结果缓存: {digest}")
+            return self._format_image_content(img_path, ocr_text)
+        except Exception as e:
+            self.logger.error(f"图片处理失败: {e}")
+            return f"[图片消息 - 处理失败: {str(e)}]"
+
+    async def _extract_file_content_async(self, msg) -> str:
+        """异步提取文件消息内容（文档文本）"""
+        try:
+            self.logger.info("处理消息类型: file")
+            downloaded = await self._download_async(msg)
+            if downloaded is None:
+                return f"[文件] {getattr(msg, 'content', '未知文件')} - 无法下载"
+            file_path, digest = downloaded
+            if not self.document_extractor or not self.document_extractor.is_supported(file_path):
+                return f"[文件] {file_path.name} - 已下载到: {file_path}"
+
+            text = self.content_store.get_result(digest, 'document')
+            if text is None:
+                try:
+                    text = await asyncio.wrap_future(self.document_extractor.submit(file_path))
+                except Exception as doc_e:
+                    self.logger.error(f"文档提取失败: {doc_e}")
+                    return f"[文件] {file_path.name} - 已下载到: {file_path}"
+                self.content_store.put_result(digest, 'document', text)
+            else:
+                self.logger.info(f"命中文档提取结果缓存: {digest}")
+            return self._format_file_content(file_path, text)
+        except Exception as e:
+            self.logger.error(f"文件处理失败: {e}")
+            return f"[文件] {getattr(msg, 'content', '未知文件')} - 处理失败: {str(e)}"
+
+    def _get_voice_semaphore(self) -> asyncio.Semaphore:
+        """获取当前事件循环的语音并发信号量（事件循环重建后重新创建）"""
+        loop = asyncio.get_running_loop()
+        if self._voice_semaphore_loop is not loop:
+            self._voice_semaphore = asyncio.Semaphore(self.stt_max_pending)
+            self._voice_semaphore_loop = loop
+        return self._voice_semaphore
+
+    async def transcribe_voice_async(self, msg) -> str:
+        """
+        语音转文字：优先本地语音识别，失败时回退到微信自带转文字（在RPA线程中执行）
+
+        Returns:
+            转写文本，均失败时返回空字符串
+        """
+        if self.speech_to_text and self.speech_to_text.available:
+            async with self._get_voice_semaphore():
+                try:
+                    downloaded = await self._download_async(msg)
+                    if downloaded is not None:
+                        audio_path, digest = downloaded
+                        text = self.content_store.get_result(digest, 'stt')
+                        if text is None:
+                            text = await asyncio.wrap_future(self.speech_to_text.submit(audio_path))
+                            self.content_store.put_result(digest, 'stt', text)
+                        else:
+                            self.logger.info(f"命中语音识别结果缓存: {digest}")
+                        if text.strip():
+                            self.logger.info("本地语音识别成功")
+                            return text.strip()
+                except Exception as e:
+                    self.logger.error(f"本地语音识别失败: {e}")
+        return await self._run_ui(self._voice_to_text, msg, name="voice_to_text")
+
+    async def _extract_voice_content_async(self, msg) -> str:
+        """异步提取语音消息内容，已在路由前转写的消息（信封带 transcript）直接使用转写结果"""
+        self.logger.info("处理消息类型: voice")
+        transcript = getattr(msg, 'transcript', None)
+        if transcript is None:
+            transcript = await self.transcribe_voice_async(msg)
+        if transcript:
+            return f"[语音转文字] {transcript}"
+        content = getattr(msg, 'content', '[语音消息]')
+        return f"[语音消息] {content} - 转换失败，请手动播放查看内容"
+
+    async def _extract_link_content_async(self, msg) -> str:
+        """异步提取链接消息内容（抓取网页正文，失败时回退到仅返回URL）"""
+        self.logger.info("处理消息类型: link")
+        # 预处理内容中通常已带有分发时获取的URL，取不到时才在RPA线程中读取消息
+        url = self._url_in_content(msg)
+        if not url:
+            url = await self._run_ui(extract_url, self._source(msg), name="get_url")
+        if url and self.link_fetcher:
+            try:
+                page = await self.link_fetcher.fetch_async(url)
+                self.logger.info(f"链接内容抓取成功: {url} ({len(page['text'])}字)")
+                return self._format_link_content(url, page)
+            except Exception as e:
+                self.logger.warning(f"链接内容抓取失败: {url} - {e}")
+        if url:
+            self.logger.info(f"提取链接URL: {url}")
+            return url
+        content = getattr(msg, 'content', '[链接消息]')
+        self.logger.warning(f"无法提取链接URL，返回 content: {content}")
+        return content
+
+    @staticmethod
+    def _format_link_content(url: str, page: dict) -> str:
+        """格式化链接网页内容"""
+        parts = [f"用户分享了一个链接：\n标题：{page.get('title') or '未知链接'}\nURL：{url}"]
+        if page.get('description'):
+            parts.append(f"摘要：{page['description']}")
+        if page.get('text'):
+            parts.append(f"\n网页正文：\n{page['text']}")
+        parts.append("\n请根据这个链接内容进行回复。")
+        return "\n".join(parts)
+
+    def close(self):
+        """释放OCR/文档提取/语音识别进程池、链接抓取会话、存储索引等资源（之后仍可继续使用，资源按需重新创建）"""
+        if self.ocr_service:
+            self.ocr_service.shutdown()
+        if self.document_extractor:
+            self.document_extractor.shutdown()
+        if self.speech_to_text:
+            self.speech_to_text.shutdown()
+        if self.link_fetcher:
+            self.link_fetcher.close()
+        with self._store_lock:
+            store, self._content_store = self._content_store, None
+        if store is not None:
+            store.close()
+
     def _extract_text_content(self, msg) -> str:
         """提取文本消息内容"""
         return getattr(msg, 'content', '') or '[空文本消息]'
     
+    def _voice_to_text(self, msg) -> str:
+        """使用wxauto的语音转文字功能（操作界面，应在RPA线程中调用），失败时返回空字符串"""
+        source = self._source(msg)
+        if not hasattr(source, 'to_text'):
+            self.logger.warning("消息对象不支持语音转文字功能")
+            return ""
+        try:
+            return (source.to_text() or "").strip()
+        except Exception as e:
+            self.logger.error(f"语音转文字失败: {e}")
+            return ""
+
     def _extract_voice_content(self, msg) -> str:
         """提取语音消息内容"""
         try:
-            # 尝试使用wxauto的语音转文字功能
-            if hasattr(msg, 'to_text'):
-                text_content = msg.to_text()
-                self.logger.info(f"语音转文字成功: {text_content[:50]}...")
+            # 尝试使用wxauto的语音转文字功能（操作界面，应在RPA线程中调用）
+            source = self._source(msg)
+            if hasattr(source, 'to_text'):
+                text_content = source.to_text()
+                self.logger.info("语音转文字成功")
                 return text_content
             else:
                 # 如果没有转换功能，返回语音消息提示
@@ -118,22 +404,12 @@ class MessageProcessor:
     def _extract_link_content(self, msg) -> str:
         """提取链接消息内容"""
         try:
-            # 优先尝试获取真实URL (Plus版本功能)
-            if hasattr(msg, 'get_url'):
-                url = msg.get_url()
-                if url:
-                    self.logger.info(f"通过 get_url() 提取链接URL: {url}")
-                    return url
-
-            # 降级处理1：从 info 属性中用正则提取
-            if hasattr(msg, 'info') and isinstance(msg.info, str):
-                url_match = re.search(r'<url>(.*?)<\/url>', msg.info)
-                if url_match:
-                    url = url_match.group(1)
-                    self.logger.info(f"通过正则从 info 中提取链接URL: {url}")
-                    return url
-
-            # 降级处理2：返回预处理的 content
+            url = self._resolve_link_url(msg)
+            if url:
+                self.logger.info(f"提取链接URL: {url}")
+                return url
+
+            # 降级处理：返回预处理的 content
             content = getattr(msg, 'content', '[链接消息]')
             self.logger.warning(f"无法提取链接URL，返回 content: {content}")
             return content
@@ -143,42 +419,89 @@ class MessageProcessor:
             content = getattr(msg, 'content', '[链接消息]')
             return f"[链接消息] {content} - 提取异常"
     
+    @staticmethod
+    def _url_in_content(msg) -> Optional[str]:
+        """从预处理内容中查找URL（分发时已获取或通过UI复制得到的URL）"""
+        url_match = re.search(r'https?://[^\s<>"\']+', getattr(msg, 'content', '') or '')
+        return url_match.group(0) if url_match else None
+
+    def _resolve_link_url(self, msg) -> Optional[str]:
+        """
+        获取链接URL：优先从预处理内容中查找，其次在RPA线程中从消息本身（get_url()、info、控件值）获取
+        """
+        return self._url_in_content(msg) or self.ui_executor.call(extract_url, self._source(msg), name="get_url")
+
+    def _download(self, msg) -> Optional[Tuple[Path, str]]:
+        """
+        下载图片/文件并纳入内容寻址存储（下载在RPA线程中执行）
+
+        Returns:
+            (文件路径, 内容哈希)，无法下载时返回None
+        """
+        source = self._source(msg)
+        if not hasattr(source, 'download'):
+            return None
+        store = self.content_store  # 打开存储时创建下载目录
+        downloaded = self.ui_executor.call(source.download, dir_path=self.download_path, name="download")
+        self.logger.info(f"下载成功: {downloaded}")
+        digest, path = store.ingest(downloaded)
+        return path, digest
+
+    @staticmethod
+    def _format_image_content(img_path, ocr_text: str) -> str:
+        """根据OCR结果格式化图片消息内容"""
+        if ocr_text.strip():
+            return f"[图片内容] {ocr_text}"
+        return f"[图片消息 - 无文字内容] 路径: {img_path}"
+
     def _extract_image_content(self, msg) -> str:
         """提取图片消息内容"""
         try:
             # 下载图片
-            if hasattr(msg, 'download'):
-                img_path = msg.download(dir_path=self.download_path)
-                self.logger.info(f"图片下载成功: {img_path}")
-                
-                # 如果启用OCR，尝试识别图片中的文字
-                if self.enable_ocr:
-                    try:
-                        ocr_text = self._perform_ocr(img_path)
-                        if ocr_text.strip():
-                            return f"[图片内容] {ocr_text}"
-                        else:
-                            return f"[图片消息 - 无文字内容] 路径: {img_path}"
-                    except Exception as ocr_e:
-                        self.logger.error(f"OCR识别失败: {ocr_e}")
-                        return f"[图片消息] 路径: {img_path}"
-                else:
-                    return f"[图片消息] 路径: {img_path}"
-            else:
+            downloaded = self._download(msg)
+            if downloaded is None:
                 return "[图片消息 - 无法下载]"
+            img_path, digest = downloaded
+
+            # 如果启用OCR，尝试识别图片中的文字
+            if self.enable_ocr:
+                try:
+                    ocr_text = self.content_store.get_result(digest, 'ocr')
+                    if ocr_text is None:
+                        ocr_text = self.ocr_service.submit(img_path).result()
+                        if self.ocr_service.available:
+                            self.content_store.put_result(digest, 'ocr', ocr_text)
+                    return self._format_image_content(img_path, ocr_text)
+                except Exception as ocr_e:
+                    self.logger.error(f"OCR识别失败: {ocr_e}")
+                    return f"[图片消息] 路径: {img_path}"
+            return f"[图片消息] 路径: {img_path}"
         except Exception as e:
             self.logger.error(f"图片处理失败: {e}")
             return f"[图片消息 - 处理失败: {str(e)}]"
     
+    @staticmethod
+    def _format_file_content(file_path: Path, text: str) -> str:
+        """根据文档提取结果格式化文件消息内容"""
+        if text.strip():
+            return f"[文件] {file_path.name}\n文件内容：\n{text}"
+        return f"[文件] {file_path.name} - 未提取到文本内容，已下载到: {file_path}"
+
     def _extract_file_content(self, msg) -> str:
         """提取文件消息内容"""
         try:
             filename = getattr(msg, 'content', '未知文件')
             
-            if hasattr(msg, 'download'):
-                file_path = msg.download(dir_path=self.download_path)
-                self.logger.info(f"文件下载成功: {file_path}")
-                return f"[文件] {filename} - 已下载到: {file_path}"
+            downloaded = self._download(msg)
+            if downloaded is not None:
+                file_path, digest = downloaded
+                if self.document_extractor and self.document_extractor.is_supported(file_path):
+                    text = self.content_store.get_result(digest, 'document')
+                    if text is None:
+                        text = self.document_extractor.submit(file_path).result()
+                        self.content_store.put_result(digest, 'document', text)
+                    return self._format_file_content(file_path, text)
+                return f"[文件] {file_path.name} - 已下载到: {file_path}"
             else:
                 return f"[文件] {filename} - 无法下载"
         except Exception as e:
@@ -190,7 +513,7 @@ class MessageProcessor:
         """提取位置消息内容"""
         try:
             # 尝试获取地址信息
-            address = getattr(msg, 'address', None)
+            address = getattr(self._source(msg), 'address', None)
             if address:
                 return f"[位置] {address}"
             else:
@@ -209,7 +532,7 @@ class MessageProcessor:
     def _extract_quote_content(self, msg) -> str:
         """提取引用消息内容"""
         try:
-            quote_content = getattr(msg, 'quote_content', '')
+            quote_content = getattr(self._source(msg), 'quote_content', '')
             reply_content = getattr(msg, 'content', '')
             
             if quote_content and reply_content:
@@ -226,8 +549,9 @@ class MessageProcessor:
         """提取合并转发消息内容"""
         try:
             # 尝试获取合并消息内容 (Plus版本功能)
-            if hasattr(msg, 'get_messages'):
-                messages = msg.get_messages()
+            source = self._source(msg)
+            if hasattr(source, 'get_messages'):
+                messages = source.get_messages()
                 if messages:
                     content = "\n".join(messages[:5])  # 限制显示前5条
                     if len(messages) > 5:
@@ -280,7 +604,7 @@ class MessageProcessor:
     
     def _perform_ocr(self, image_path: Union[str, Path]) -> str:
         """
-        对图片进行OCR识别
+        对图片进行OCR识别（同步等待OCR进程池的结果）
         
         Args:
             image_path: 图片路径
@@ -289,27 +613,9 @@ class MessageProcessor:
             识别出的文字内容
         """
         try:
-            # 这里可以集成各种OCR服务
-            # 例如：百度OCR、腾讯OCR、PaddleOCR等
-            
-            # 示例：使用PaddleOCR (需要安装 paddlepaddle 和 paddleocr)
-            try:
-                from paddleocr import PaddleOCR
-                ocr = PaddleOCR(use_angle_cls=True, lang='ch')
-                result = ocr.ocr(str(image_path), cls=True)
-                
-                if result and result[0]:
-                    text_lines = []
-                    for line in result[0]:
-                        if len(line) > 1 and line[1]:
-                            text_lines.append(line[1][0])
-                    return '\n'.join(text_lines)
-                else:
-                    return ""
-            except ImportError:
-                self.logger.warning("PaddleOCR未安装，跳过OCR识别")
-                return ""
-            
+            if self.ocr_service is None:
+                self.ocr_service = OCRService()
+            return self.ocr_service.submit(image_path).result()
         except Exception as e:
             self.logger.error(f"OCR识别失败: {e}")
             return ""
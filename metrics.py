@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标模块
+提供计数器、仪表和固定分桶直方图（记录时只做一次二分查找与加法），
+通过本地HTTP端点以 Prometheus 文本格式输出，并为图形界面生成精简摘要（如API耗时p95）
+作者：dolphi
+"""
+
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 默认分桶（秒）：覆盖从几毫秒的队列等待到数十秒的大模型调用
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class _Metric:
+    """指标基类：按标签值分组保存数值"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, object] = {}
+        self._functions: Dict[Tuple, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def set_function(self, func: Callable[[], float], **labels):
+        """采集时调用 func 获取数值（用于已有统计数据，如队列长度、缓存命中数）"""
+        self._functions[self._key(labels)] = func
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """(名称后缀, 标签文本, 数值) 列表"""
+        with self._lock:
+            values = dict(self._values)
+        for key, func in self._functions.items():
+            try:
+                values[key] = float(func())
+            except Exception:
+                continue
+        return [('', _label_text(self.labelnames, key), value) for key, value in sorted(values.items())]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """计数器（只增不减）"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        key = self._key(labels)
+        if key in self._functions:
+            return float(self._functions[key]())
+        return self._values.get(key, 0)
+
+    def total(self) -> float:
+        """所有标签值的合计"""
+        return sum(value for _, _, value in self.samples())
+
+
+class Gauge(Counter):
+    """仪表（可增可减的瞬时值）"""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class _HistogramValue:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    """固定分桶直方图"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        """记录一个观测值"""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = _HistogramValue(len(self.buckets) + 1)
+            data.counts[index] += 1
+            data.sum += value
+            data.count += 1
+
+    def _merged(self, labels: Optional[Dict] = None) -> _HistogramValue:
+        """合并符合条件的所有标签组（labels 为 None 时合并全部）"""
+        key = self._key(labels) if labels else None
+        merged = _HistogramValue(len(self.buckets) + 1)
+        with self._lock:
+            for data_key, data in self._values.items():
+                if key is not None and data_key != key:
+                    continue
+                merged.counts = [a + b for a, b in zip(merged.counts, data.counts)]
+                merged.sum += data.sum
+                merged.count += data.count
+        return merged
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """
+        按分桶线性插值估算分位数
+
+        Args:
+            q: 分位点，如 0.95
+            **labels: 标签值，不传时合并所有标签组
+
+        Returns:
+            估算值（秒），没有观测值时返回None；落在最后一个分桶之外时返回最大分桶上限
+        """
+        data = self._merged(labels or None)
+        if not data.count:
+            return None
+        rank = q * data.count
+        cumulative = 0
+        for index, count in enumerate(data.counts):
+            if cumulative + count >= rank and count:
+                if index >= len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def count(self, **labels) -> int:
+        return self._merged(labels or None).count
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            items = sorted((key, list(data.counts), data.sum, data.count) for key, data in self._values.items())
+        result = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                result.append(('_bucket', _label_text(self.labelnames, key, f'le="{_format_value(bound)}"'),
+                               cumulative))
+            result.append(('_sum', _label_text(self.labelnames, key), total))
+            result.append(('_count', _label_text(self.labelnames, key), count))
+        return result
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        """获取或创建计数器"""
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        """获取或创建仪表"""
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        """获取或创建直方图"""
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self) -> str:
+        """生成 Prometheus 文本格式（text/plain; version=0.0.4）"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = None
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics %s - %s", self.address_string(), format % args)
+
+
+class MetricsServer:
+    """本地指标HTTP服务（后台线程）"""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        self._server = None
+        self._thread = None
+        self.address = None
+
+    def start(self, port: int = 9108, host: str = "127.0.0.1") -> bool:
+        """
+        启动HTTP服务，已在同一地址运行时不做处理
+
+        Returns:
+            是否正在运行
+        """
+        if self._server is not None:
+            if self.address == (host, port):
+                return True
+            self.stop()
+        handler = type('MetricsRequestHandler', (_MetricsRequestHandler,), {'registry': self.registry})
+        try:
+            self._server = ThreadingHTTPServer((host, port), handler)
+        except OSError as e:
+            logger.warning(f"指标服务启动失败（{host}:{port}）: {e}")
+            return False
+        self._server.daemon_threads = True
+        self.address = (host, port)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics_server", daemon=True)
+        self._thread.start()
+        logger.info(f"指标服务已启动: http://{host}:{port}/metrics")
+        return True
+
+    def stop(self):
+        """停止HTTP服务"""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._thread = None
+        self.address = None
+
+
+# 全局指标注册表与HTTP服务
+metrics = MetricsRegistry()
+metrics_server = MetricsServer(metrics)
+
+# 消息链路指标
+API_LATENCY = metrics.histogram('wxbot_api_latency_seconds', 'AI接口调用耗时', ('platform', 'status'))
+QUEUE_WAIT = metrics.histogram('wxbot_queue_wait_seconds', '消息在处理队列中的等待时间')
+SEND_LATENCY = metrics.histogram('wxbot_send_latency_seconds', '单条微信消息 SendMsg 耗时',
+                                 buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30))
+REPLY_LATENCY = metrics.histogram('wxbot_reply_latency_seconds', '从收到消息到回复全部发送完成的耗时', ('route',))
+MESSAGES = metrics.counter('wxbot_messages_total', '处理的消息数', ('type', 'status'))
+ERRORS = metrics.counter('wxbot_errors_total', '错误数', ('stage', 'error'))
+SHED = metrics.counter('wxbot_shed_total', '被丢弃/放弃处理的任务数', ('reason',))
+CACHE = metrics.counter('wxbot_cache_lookups_total', '提取结果缓存查询数', ('result',))
+QUEUE_SIZE = metrics.gauge('wxbot_queue_size', '队列中的消息数', ('queue',))
+PROCESSING = metrics.gauge('wxbot_processing', '正在处理的消息数')
+STARTUP_PHASE = metrics.gauge('wxbot_startup_phase_seconds', '最近一次启动各阶段的耗时', ('phase',))
+
+
+def summary() -> Dict:
+    """图形界面使用的精简摘要（耗时单位为秒，无数据时为None）"""
+    return {
+        'api_p50': API_LATENCY.quantile(0.5),
+        'api_p95': API_LATENCY.quantile(0.95),
+        'send_p95': SEND_LATENCY.quantile(0.95),
+        'reply_p95': REPLY_LATENCY.quantile(0.95),
+        'messages': int(MESSAGES.total()),
+        'errors': int(ERRORS.total()),
+        'shed': int(SHED.total()),
+    }
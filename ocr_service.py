@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR服务模块
+使用进程池执行图片文字识别：每个工作进程只加载一次OCR模型，
+图片路径通过进程池的任务队列提交，识别结果以 Future 形式返回
+作者：dolphi
+"""
+
+import importlib.util
+import logging
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Union
+
+logger = logging.getLogger(__name__)
+
+# 工作进程内的OCR引擎（每个进程初始化一次）
+_worker_engine = None
+
+
+def _init_worker(lang: str):
+    """进程池初始化函数：在工作进程中加载一次OCR模型"""
+    global _worker_engine
+    from paddleocr import PaddleOCR
+    _worker_engine = PaddleOCR(use_angle_cls=True, lang=lang)
+
+
+def _run_ocr(image_path: str) -> str:
+    """在工作进程中识别单张图片"""
+    result = _worker_engine.ocr(image_path, cls=True)
+    if result and result[0]:
+        text_lines = []
+        for line in result[0]:
+            if len(line) > 1 and line[1]:
+                text_lines.append(line[1][0])
+        return '\n'.join(text_lines)
+    return ""
+
+
+class OCRService:
+    """共享的OCR识别服务"""
+
+    def __init__(self, max_workers: int = 1, lang: str = 'ch'):
+        """
+        初始化OCR服务（进程池在首次提交任务时创建）
+
+        Args:
+            max_workers: 工作进程数，每个进程各加载一份OCR模型，默认为1以限制内存占用
+            lang: 识别语言
+        """
+        self.max_workers = max(1, max_workers)
+        self.lang = lang
+        self.available = importlib.util.find_spec('paddleocr') is not None
+        self._executor = None
+        self._lock = threading.Lock()
+
+        if not self.available:
+            logger.warning("PaddleOCR未安装，OCR识别将被跳过")
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """获取（必要时创建）进程池"""
+        with self._lock:
+            if self._executor is None:
+                logger.info(f"启动OCR进程池，工作进程数: {self.max_workers}")
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_init_worker,
+                    initargs=(self.lang,)
+                )
+            return self._executor
+
+    def submit(self, image_path: Union[str, Path]) -> Future:
+        """
+        提交图片识别任务
+
+        Args:
+            image_path: 图片路径
+
+        Returns:
+            识别结果的 Future，结果为识别出的文字（未安装OCR时为空字符串）
+        """
+        if not self.available:
+            future = Future()
+            future.set_result("")
+            return future
+        return self._get_executor().submit(_run_ocr, str(image_path))
+
+    def shutdown(self, wait: bool = False):
+        """关闭进程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
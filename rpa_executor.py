@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RPA任务执行器模块
+微信的UI自动化操作（发送消息、右键复制链接、群欢迎语等）不能并发执行，
+本模块用单个工作线程串行执行所有UI任务：任务排队提交并以 Future 返回结果，
+支持延迟执行、排队超时与取消，调用方（如wxauto监听回调）无需等待UI操作完成
+作者：dolphi
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Job:
+    """排队中的任务"""
+
+    __slots__ = ('name', 'func', 'args', 'kwargs', 'future', 'run_at', 'deadline', 'timeout')
+
+    def __init__(self, name, func, args, kwargs, run_at, timeout):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.run_at = run_at
+        self.timeout = timeout
+        self.deadline = run_at + timeout if timeout else None
+
+
+class SerialTaskExecutor:
+    """单线程串行任务执行器（工作线程在首次提交任务时启动）"""
+
+    def __init__(self, name: str = "rpa", default_timeout: Optional[float] = 60):
+        """
+        初始化执行器
+
+        Args:
+            name: 工作线程名称
+            default_timeout: 默认超时（秒）：任务到达执行时间后超过该时长仍未开始则放弃执行，
+                             执行耗时超过该时长时记录警告；None表示不限制
+        """
+        self.name = name
+        self.default_timeout = default_timeout
+        self._heap = []  # (run_at, seq, job)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = True
+        self.current = None  # 正在执行的任务名称
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'expired': 0, 'cancelled': 0}
+
+    def submit(self, func: Callable, *args, name: str = None, delay: float = 0,
+               timeout: Optional[float] = -1, **kwargs) -> Future:
+        """
+        提交任务
+
+        Args:
+            func: 要执行的函数
+            *args, **kwargs: 函数参数
+            name: 任务名称（用于日志）
+            delay: 延迟执行的秒数（延迟期间不占用工作线程）
+            timeout: 超时（秒），-1表示使用默认超时，None表示不限制
+
+        Returns:
+            任务结果的 Future，可调用 cancel() 取消尚未开始的任务
+        """
+        if timeout == -1:
+            timeout = self.default_timeout
+        job = _Job(name or getattr(func, '__name__', 'task'), func, args, kwargs,
+                   time.monotonic() + max(0.0, delay), timeout)
+        with self._cond:
+            if not self._running:
+                job.future.set_exception(RuntimeError(f"{self.name} 执行器已停止"))
+                return job.future
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name=self.name, daemon=True)
+                self._thread.start()
+            heapq.heappush(self._heap, (job.run_at, next(self._seq), job))
+            self.stats['submitted'] += 1
+            self._cond.notify()
+        return job.future
+
+    def call(self, func: Callable, *args, name: str = None, timeout: Optional[float] = -1, **kwargs):
+        """
+        在工作线程中执行任务并等待结果（同步调用）；已在工作线程中时直接执行，避免自身等待自身
+
+        Args:
+            func: 要执行的函数
+            *args, **kwargs: 函数参数
+            name: 任务名称（用于日志）
+            timeout: 同 submit
+
+        Returns:
+            函数返回值（函数抛出的异常原样抛出）
+        """
+        if threading.current_thread() is self._thread:
+            return func(*args, **kwargs)
+        return self.submit(func, *args, name=name, timeout=timeout, **kwargs).result()
+
+    def _next_job(self) -> Optional[_Job]:
+        """取出下一个到期的任务，执行器停止时返回None"""
+        with self._cond:
+            while self._running:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                wait = self._heap[0][0] - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                return heapq.heappop(self._heap)[2]
+            return None
+
+    def _worker(self):
+        """工作线程：按执行时间顺序串行执行任务"""
+        while True:
+            job = self._next_job()
+            if job is None:
+                break
+            if not job.future.set_running_or_notify_cancel():
+                self.stats['cancelled'] += 1
+                continue
+            if job.deadline is not None and time.monotonic() > job.deadline:
+                self.stats['expired'] += 1
+                logger.warning(f"[{self.name}] 任务 {job.name} 排队超时，已放弃执行")
+                job.future.set_exception(TimeoutError(f"任务 {job.name} 排队超过 {job.timeout} 秒"))
+                continue
+
+            self.current = job.name
+            start = time.monotonic()
+            try:
+                result = job.func(*job.args, **job.kwargs)
+            except BaseException as e:
+                self.stats['failed'] += 1
+                logger.error(f"[{self.name}] 任务 {job.name} 执行失败: {e}")
+                job.future.set_exception(e)
+            else:
+                self.stats['completed'] += 1
+                job.future.set_result(result)
+            finally:
+                self.current = None
+            elapsed = time.monotonic() - start
+            if job.timeout and elapsed > job.timeout:
+                logger.warning(f"[{self.name}] 任务 {job.name} 执行耗时 {elapsed:.1f} 秒，超过 {job.timeout} 秒")
+
+    def cancel_pending(self) -> int:
+        """取消所有尚未开始的任务，返回取消的数量"""
+        with self._cond:
+            jobs = [job for _, _, job in self._heap]
+            self._heap.clear()
+        cancelled = sum(1 for job in jobs if job.future.cancel())
+        self.stats['cancelled'] += cancelled
+        return cancelled
+
+    def pending(self) -> int:
+        """排队中的任务数"""
+        with self._cond:
+            return len(self._heap)
+
+    def get_status(self) -> dict:
+        """获取执行器状态"""
+        return {'pending': self.pending(), 'current': self.current, **self.stats}
+
+    def shutdown(self, wait: bool = False, timeout: Optional[float] = None):
+        """
+        停止执行器，取消尚未开始的任务
+
+        Args:
+            wait: 是否等待正在执行的任务结束
+            timeout: 等待的最长时间（秒）
+        """
+        self.cancel_pending()
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+            thread = self._thread
+        if wait and thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+
+class RPAChat:
+    """
+    聊天窗口代理：SendMsg 提交到RPA执行器排队执行并立即返回 Future，
+    其他属性和方法直接转发给原聊天窗口对象
+    """
+
+    __slots__ = ('target', 'executor')
+
+    def __init__(self, target, executor: SerialTaskExecutor = None):
+        self.target = target
+        self.executor = executor or rpa
+
+    def SendMsg(self, *args, **kwargs) -> Future:
+        return self.executor.submit(self.target.SendMsg, *args, name=f"SendMsg:{getattr(self.target, 'who', '')}",
+                                    **kwargs)
+
+    def __getattr__(self, item):
+        return getattr(self.target, item)
+
+    def __repr__(self):
+        return f"RPAChat({self.target!r})"
+
+
+def unwrap_chat(chat):
+    """获取代理背后的原聊天窗口对象"""
+    return chat.target if isinstance(chat, RPAChat) else chat
+
+
+# 全局RPA执行器：所有微信UI操作都通过它串行执行
+rpa = SerialTaskExecutor("wx_rpa", default_timeout=None)
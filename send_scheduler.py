@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+微信发送调度模块
+根据实际 SendMsg 耗时与失败率自适应调整发送间隔（成功时逐步缩短，失败时加倍），
+在公平窗口内按聊天窗口重排待发送消息，将同一窗口的消息合并为一批发送（窗口只需激活一次），
+可选将同一窗口、同一@对象的多条短回复合并为一条消息发送，
+并用令牌桶限制每个聊天窗口的发送频率，避免触发微信风控；
+令牌用尽的窗口在取批次时被跳过，其他窗口的消息照常发送
+作者：dolphi
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+
+class AdaptivePacer:
+    """发送间隔控制器（加性减小、乘性增大）"""
+
+    def __init__(self, min_gap: float = 0.2, max_gap: float = 5.0, initial_gap: float = 0.5,
+                 decrease_step: float = 0.05, alpha: float = 0.2):
+        """
+        Args:
+            min_gap: 最小发送间隔（秒）
+            max_gap: 最大发送间隔（秒）
+            initial_gap: 初始发送间隔（秒）
+            decrease_step: 每次成功发送后间隔缩短的步长（秒）
+            alpha: 耗时与失败率滑动平均（EWMA）的平滑系数
+        """
+        self.min_gap = min_gap
+        self.max_gap = max_gap
+        self.decrease_step = decrease_step
+        self.alpha = alpha
+        self.gap = min(max(initial_gap, min_gap), max_gap)
+        self.avg_duration = 0.0
+        self.failure_rate = 0.0
+        self.sent = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def record(self, duration: float, ok: bool):
+        """
+        记录一次发送结果并调整间隔
+
+        Args:
+            duration: SendMsg 耗时（秒）
+            ok: 是否发送成功
+        """
+        with self._lock:
+            if self.sent + self.failed == 0:
+                self.avg_duration = duration
+            else:
+                self.avg_duration += self.alpha * (duration - self.avg_duration)
+            self.failure_rate += self.alpha * ((0.0 if ok else 1.0) - self.failure_rate)
+            if ok:
+                self.sent += 1
+                if self.failure_rate < 0.1:
+                    self.gap -= self.decrease_step
+            else:
+                self.failed += 1
+                self.gap *= 2
+            # 界面响应变慢（SendMsg 耗时增大）时，间隔至少为平均耗时的一半
+            self.gap = min(self.max_gap, max(self.min_gap, self.avg_duration * 0.5, self.gap))
+
+    def intra_batch_gap(self) -> float:
+        """同一窗口连续发送时的间隔（窗口已激活，只需等待输入框刷新）"""
+        return self.min_gap
+
+    def get_stats(self) -> dict:
+        """获取统计信息"""
+        with self._lock:
+            return {
+                'gap': round(self.gap, 3),
+                'avg_duration': round(self.avg_duration, 3),
+                'failure_rate': round(self.failure_rate, 3),
+                'sent': self.sent,
+                'failed': self.failed,
+            }
+
+
+class TokenBucket:
+    """令牌桶限速器"""
+
+    def __init__(self, rate: float, burst: int):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            burst: 桶容量（允许的突发数量）
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def available(self, now: Optional[float] = None) -> float:
+        """补充令牌后返回当前可用的令牌数"""
+        now = time.monotonic() if now is None else now
+        # 调用方可能传入早于桶创建时间的 now（先取时间再创建桶），时间倒退时不扣减令牌
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        return self.tokens
+
+    def wait_time(self, count: int = 1, now: Optional[float] = None) -> float:
+        """距离有 count 个可用令牌还需等待的秒数（不消耗令牌）"""
+        missing = count - self.available(now)
+        return 0.0 if missing <= 0 else missing / self.rate
+
+    def take(self, count: int = 1, now: Optional[float] = None):
+        """消耗令牌（调用方应先确认令牌足够）"""
+        self.available(now)
+        self.tokens -= count
+
+
+class SendScheduler:
+    """发送调度器：分批、限速与自适应间隔"""
+
+    def __init__(self, min_gap: float = 0.2, max_gap: float = 5.0, initial_gap: float = 0.5,
+                 per_chat_per_minute: float = 20, per_chat_burst: int = 5, reorder_window: int = 8,
+                 merge_replies: bool = False, merge_max_chars: int = 2000, merge_separator: str = "\n\n"):
+        """
+        Args:
+            min_gap: 最小发送间隔（秒）
+            max_gap: 最大发送间隔（秒）
+            initial_gap: 初始发送间隔（秒）
+            per_chat_per_minute: 每个聊天窗口每分钟最多发送的消息数，0表示不限制
+            per_chat_burst: 每个聊天窗口允许连续发送的消息数，也是单批最多的消息数
+            reorder_window: 公平窗口：只在队列头部的这么多条消息内按聊天窗口重排，
+                            其他窗口的消息最多被推迟这么多条
+            merge_replies: 是否合并同一窗口、同一@对象的连续短回复
+            merge_max_chars: 合并后单条消息的最大长度（与长消息分段长度一致）
+            merge_separator: 合并时各条回复之间的分隔符
+        """
+        self.pacer = AdaptivePacer(min_gap=min_gap, max_gap=max_gap, initial_gap=initial_gap)
+        self.per_chat_rate = per_chat_per_minute / 60.0
+        self.per_chat_burst = max(1, int(per_chat_burst))
+        self.reorder_window = max(1, int(reorder_window))
+        self.merge_replies = merge_replies
+        self.merge_max_chars = merge_max_chars
+        self.merge_separator = merge_separator
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.last_send = 0.0
+        self.batches = 0
+        self.reordered = 0  # 因重排而提前发送的消息数
+        self.merged = 0  # 因合并而省去的发送次数
+        self.throttled_skips = 0  # 因队首窗口令牌用尽而先发送其他窗口的次数
+
+    def _bucket(self, chat_key: str) -> Optional[TokenBucket]:
+        """聊天窗口的令牌桶（未限速时为None）"""
+        if self.per_chat_rate <= 0:
+            return None
+        bucket = self.buckets.get(chat_key)
+        if bucket is None:
+            bucket = self.buckets[chat_key] = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+        return bucket
+
+    def _allowance(self, chat_key: str, now: float) -> int:
+        """该窗口当前最多可发送的消息数"""
+        bucket = self._bucket(chat_key)
+        if bucket is None:
+            return self.per_chat_burst
+        return min(self.per_chat_burst, int(bucket.available(now)))
+
+    def take_batch(self, pending: deque, key: Callable[[dict], str]) -> List[dict]:
+        """
+        取出第一条所属窗口有令牌的消息，以及该窗口在公平窗口内的后续消息，减少窗口切换
+
+        令牌用尽的窗口被跳过（其消息留在原位），不阻塞其他窗口；
+        其他窗口的消息保持原有相对顺序，同一窗口内的消息不会乱序
+
+        Args:
+            pending: 待发送消息队列
+            key: 获取消息所属聊天窗口标识的函数
+
+        Returns:
+            一批待发送消息；所有窗口的令牌都已用尽时返回空列表（等待时间见 next_ready_delay）
+        """
+        now = time.monotonic()
+        allowances = {}
+        start = None
+        for index, send_data in enumerate(pending):
+            chat_key = key(send_data)
+            if chat_key not in allowances:
+                allowances[chat_key] = self._allowance(chat_key, now)
+            if allowances[chat_key] > 0:
+                start = index
+                break
+        if start is None:
+            return []
+        if start:
+            self.throttled_skips += 1
+
+        items = list(pending)
+        chat_key = key(items[start])
+        limit = allowances[chat_key]
+        batch = [items[start]]
+        rest = items[:start]
+        skipped = False
+        scanned = 1
+        for index in range(start + 1, len(items)):
+            send_data = items[index]
+            if scanned >= self.reorder_window or len(batch) >= limit:
+                rest.extend(items[index:])
+                break
+            scanned += 1
+            if key(send_data) == chat_key:
+                if skipped:
+                    self.reordered += 1
+                batch.append(send_data)
+            else:
+                skipped = True
+                rest.append(send_data)
+        pending.clear()
+        pending.extend(rest)
+        return batch
+
+    def next_ready_delay(self, pending: deque, key: Callable[[dict], str]) -> float:
+        """所有待发送窗口的令牌都已用尽时，距离最早有令牌的窗口还需等待的秒数"""
+        now = time.monotonic()
+        delays = []
+        for chat_key in {key(send_data) for send_data in pending}:
+            bucket = self._bucket(chat_key)
+            delays.append(bucket.wait_time(1, now) if bucket else 0.0)
+        return min(delays, default=0.0)
+
+    def merge(self, batch: List[dict]) -> List[dict]:
+        """
+        合并一批消息中@对象相同的相邻回复，合并后长度不超过 merge_max_chars
+
+        合并后的消息在 'merged' 字段中保留原始消息列表；未启用合并时原样返回
+
+        Args:
+            batch: 同一聊天窗口的一批待发送消息
+        """
+        if not self.merge_replies or len(batch) < 2:
+            return batch
+        result = []
+        for send_data in batch:
+            last = result[-1] if result else None
+            if (last is not None and last['at_user'] == send_data['at_user']
+                    and len(last['message']) + len(self.merge_separator) + len(send_data['message'])
+                    <= self.merge_max_chars):
+                if 'merged' not in last:
+                    last = result[-1] = {**last, 'merged': [last]}
+                last['message'] = last['message'] + self.merge_separator + send_data['message']
+                last['merged'].append(send_data)
+                self.merged += 1
+            else:
+                result.append(send_data)
+        return result
+
+    def delay_before(self, chat_key: str, count: int) -> float:
+        """
+        消耗该窗口本批消息的令牌，返回发送前需要等待的秒数（全局发送间隔）
+
+        take_batch 只在窗口有足够令牌时才取出消息，这里不会透支
+
+        Args:
+            chat_key: 聊天窗口标识
+            count: 本批实际发送的消息数（合并之后）
+        """
+        now = time.monotonic()
+        bucket = self._bucket(chat_key)
+        if bucket is not None:
+            bucket.take(count, now)
+        return max(0.0, self.last_send + self.pacer.gap - now)
+
+    def record(self, duration: float, ok: bool):
+        """记录一条消息的发送结果"""
+        self.pacer.record(duration, ok)
+        self.last_send = time.monotonic()
+
+    def finish_batch(self):
+        """一批消息发送结束"""
+        self.batches += 1
+        self.last_send = time.monotonic()
+
+    def get_stats(self) -> dict:
+        """获取调度统计信息"""
+        return {'batches': self.batches, 'reordered': self.reordered, 'merged': self.merged,
+                'throttled_skips': self.throttled_skips,
+                'chats': len(self.buckets),
+                **self.pacer.get_stats()}
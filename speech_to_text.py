@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线语音转文字模块
+语音文件在工作进程中解码并重采样为16kHz单声道PCM，再交给本地CPU模型识别；
+识别引擎可插拔（vosk / faster-whisper），模型在每个工作进程中只加载一次
+可选依赖：vosk 或 faster-whisper；SILK格式语音需要 pilk，其他格式需要 ffmpeg
+作者：dolphi
+"""
+
+import importlib.util
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000  # 识别模型统一使用的采样率
+
+# 引擎名称 -> (依赖模块名, 加载函数)，加载函数返回 transcribe(pcm_bytes) -> str
+_ENGINES: Dict[str, tuple] = {}
+
+# 工作进程内的识别函数（每个进程初始化一次）
+_worker_transcribe: Optional[Callable[[bytes], str]] = None
+
+
+def register_engine(name: str, module: str):
+    """装饰器：注册识别引擎"""
+    def decorator(loader):
+        _ENGINES[name] = (module, loader)
+        return loader
+    return decorator
+
+
+@register_engine('vosk', 'vosk')
+def _load_vosk(model_path: str) -> Callable[[bytes], str]:
+    """加载 vosk 模型"""
+    from vosk import KaldiRecognizer, Model, SetLogLevel
+    SetLogLevel(-1)
+    model = Model(model_path) if model_path else Model(lang="cn")
+
+    def transcribe(pcm: bytes) -> str:
+        recognizer = KaldiRecognizer(model, SAMPLE_RATE)
+        recognizer.AcceptWaveform(pcm)
+        return json.loads(recognizer.FinalResult()).get('text', '').replace(' ', '')
+    return transcribe
+
+
+@register_engine('faster_whisper', 'faster_whisper')
+def _load_faster_whisper(model_path: str) -> Callable[[bytes], str]:
+    """加载 faster-whisper 模型（CPU int8 推理）"""
+    import numpy as np
+    from faster_whisper import WhisperModel
+    model = WhisperModel(model_path or "small", device="cpu", compute_type="int8")
+
+    def transcribe(pcm: bytes) -> str:
+        audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        segments, _ = model.transcribe(audio, language="zh", beam_size=1)
+        return "".join(segment.text for segment in segments).strip()
+    return transcribe
+
+
+def decode_audio(path: str) -> bytes:
+    """
+    解码语音文件为16kHz单声道16位PCM
+
+    微信语音为SILK格式，使用 pilk 解码；其他格式使用 ffmpeg 解码并重采样
+    """
+    with open(path, 'rb') as f:
+        header = f.read(10)
+    if b'#!SILK' in header:
+        import pilk
+        fd, pcm_path = tempfile.mkstemp(suffix='.pcm')
+        os.close(fd)
+        try:
+            pilk.decode(path, pcm_path, pcm_rate=SAMPLE_RATE)
+            with open(pcm_path, 'rb') as f:
+                return f.read()
+        finally:
+            os.remove(pcm_path)
+
+    result = subprocess.run(
+        ['ffmpeg', '-v', 'error', '-i', path, '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 's16le', '-'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60, check=True
+    )
+    return result.stdout
+
+
+def _init_worker(engine: str, model_path: str):
+    """进程池初始化函数：在工作进程中加载一次识别模型"""
+    global _worker_transcribe
+    _, loader = _ENGINES[engine]
+    _worker_transcribe = loader(model_path)
+
+
+def _run_transcribe(path: str) -> str:
+    """在工作进程中解码并识别单个语音文件"""
+    return _worker_transcribe(decode_audio(path))
+
+
+class SpeechToTextService:
+    """离线语音转文字服务"""
+
+    def __init__(self, engine: str = 'vosk', model_path: str = "", max_workers: int = 1):
+        """
+        初始化语音识别服务（进程池在首次提交任务时创建）
+
+        Args:
+            engine: 识别引擎名称（vosk / faster_whisper）
+            model_path: 模型路径，为空时使用引擎默认模型
+            max_workers: 工作进程数，限制语音识别占用的CPU
+        """
+        self.engine = engine
+        self.model_path = model_path or ""
+        self.max_workers = max(1, max_workers)
+        self._executor = None
+        self._lock = threading.Lock()
+
+        module = _ENGINES.get(engine, (None, None))[0]
+        self.available = module is not None and importlib.util.find_spec(module) is not None
+        if not self.available:
+            logger.warning(f"语音识别引擎 {engine} 不可用，语音消息将使用微信自带转文字")
+
+    def submit(self, audio_path: Union[str, Path]) -> Future:
+        """
+        提交语音识别任务
+
+        Returns:
+            识别文本的 Future
+        """
+        if not self.available:
+            future = Future()
+            future.set_exception(RuntimeError(f"语音识别引擎 {self.engine} 不可用"))
+            return future
+        with self._lock:
+            if self._executor is None:
+                logger.info(f"启动语音识别进程池，引擎: {self.engine}，工作进程数: {self.max_workers}")
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_init_worker,
+                    initargs=(self.engine, self.model_path)
+                )
+            executor = self._executor
+        return executor.submit(_run_transcribe, str(audio_path))
+
+    def shutdown(self, wait: bool = False):
+        """关闭进程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
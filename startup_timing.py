@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动耗时统计模块
+记录启动过程中各阶段（导入模块、加载配置、启动异步处理器、连接器预热、初始化监听器等）的耗时，
+阶段之间可以并行（如连接器预热与监听器初始化同时进行），启动完成后输出分阶段耗时明细，
+并写入 wxbot_startup_phase_seconds 指标
+作者：dolphi
+"""
+
+import contextlib
+import threading
+import time
+from typing import Dict, List, Optional
+
+from metrics import STARTUP_PHASE
+
+
+class StartupTimer:
+    """启动阶段计时器（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at: Optional[float] = None
+        self._phases: Dict[str, List[Optional[float]]] = {}  # 阶段名 -> [开始, 结束]
+
+    def reset(self):
+        """开始新一轮启动计时（每次启动机器人时调用）"""
+        with self._lock:
+            self.started_at = time.monotonic()
+            self._phases = {}
+
+    def begin(self, name: str):
+        with self._lock:
+            if self.started_at is None:
+                self.started_at = time.monotonic()
+            self._phases[name] = [time.monotonic(), None]
+
+    def end(self, name: str):
+        with self._lock:
+            span = self._phases.get(name)
+            if span is None or span[1] is not None:
+                return
+            span[1] = time.monotonic()
+            duration = span[1] - span[0]
+        STARTUP_PHASE.set(duration, phase=name)
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """计时一个启动阶段：with startup.phase('config'): ..."""
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    def durations(self) -> Dict[str, float]:
+        """已完成阶段的耗时（秒），按开始时间排序"""
+        with self._lock:
+            spans = sorted(self._phases.items(), key=lambda item: item[1][0])
+        return {name: end - start for name, (start, end) in spans if end is not None}
+
+    def total(self) -> float:
+        """从开始计时到现在的总耗时（秒）"""
+        with self._lock:
+            return time.monotonic() - self.started_at if self.started_at is not None else 0.0
+
+    def report(self) -> str:
+        """
+        分阶段耗时明细，例如：
+            启动耗时 3.42s: import 0.21s | config 0.05s | listeners 2.90s | connectors 0.95s(并行)
+        与其他阶段重叠的阶段标注“并行”
+        """
+        with self._lock:
+            spans = sorted(((name, start, end) for name, (start, end) in self._phases.items() if end is not None),
+                           key=lambda item: item[1])
+        parts = []
+        for name, start, end in spans:
+            overlapped = any(other != name and other_start < end and start < other_end
+                             for other, other_start, other_end in spans)
+            parts.append(f"{name} {end - start:.2f}s" + ("(并行)" if overlapped else ""))
+        return f"启动耗时 {self.total():.2f}s: " + " | ".join(parts)
+
+
+# 全局启动计时器
+startup = StartupTimer()
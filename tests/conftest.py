@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共配置
+各模块位于仓库根目录（未打包），测试时将根目录加入导入路径
+作者：dolphi
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_FAKE_MODULES = ('wxauto', 'wxauto.msgs', 'win32clipboard', 'win32con', 'email_send', 'wxbot_preview')
+
+
+@pytest.fixture(scope='session')
+def bot():
+    """在假微信环境中导入的 wxbot_preview 模块（结束后恢复被替换的模块）"""
+    from benchmarks.fake_wechat import install_fake_modules
+
+    saved = {name: sys.modules.get(name) for name in _FAKE_MODULES}
+    install_fake_modules()
+    import wxbot_preview
+    yield wxbot_preview
+    for name, module in saved.items():
+        if module is None:
+            sys.modules.pop(name, None)
+        else:
+            sys.modules[name] = module
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""管理员指令注册表测试：精确匹配、前缀树最长匹配与分发"""
+
+import threading
+
+import pytest
+
+from admin_commands import CommandRegistry
+
+
+class FakeChat:
+    def __init__(self):
+        self.sent = []
+        self.event = threading.Event()
+
+    def SendMsg(self, text):
+        self.sent.append(text)
+        self.event.set()
+
+
+@pytest.fixture
+def registry():
+    registry = CommandRegistry()
+    yield registry
+    registry.shutdown()
+
+
+def _noop(chat, content, arg):
+    pass
+
+
+def test_exact_match(registry):
+    command = registry.register("/当前用户", _noop)
+    assert registry.match("/当前用户") == (command, "")
+    assert registry.match("/当前用户 多余") == (None, "")
+    assert registry.match("/当前") == (None, "")
+
+
+def test_prefix_match_returns_argument(registry):
+    command = registry.register("/添加用户", _noop, exact=False)
+    assert registry.match("/添加用户张三") == (command, "张三")
+    assert registry.match("/添加用户  张三 ") == (command, "张三")
+    assert registry.match("/添加") == (None, "")
+
+
+def test_longest_prefix_wins(registry):
+    short = registry.register("/更改", _noop, exact=False)
+    long = registry.register("/更改AI设定为", _noop, exact=False)
+    assert registry.match("/更改AI设定为 你是助手") == (long, "你是助手")
+    assert registry.match("/更改AI模型") == (short, "AI模型")
+
+
+def test_argument_inner_whitespace_preserved(registry):
+    command = registry.register("/更改AI设定为", _noop, exact=False)
+    assert registry.match("/更改AI设定为 你是  一个\t助手") == (command, "你是  一个\t助手")
+
+
+def test_exact_takes_precedence_over_prefix(registry):
+    prefix = registry.register("/群机器人", _noop, exact=False)
+    exact = registry.register("/群机器人状态", _noop)
+    assert registry.match("/群机器人状态") == (exact, "")
+    assert registry.match("/群机器人状态 x") == (prefix, "状态 x")
+
+
+def test_help_text_lists_commands_without_aliases(registry):
+    registry.command("/当前版本", help="查看版本", aliases=("/版本",))(_noop)
+    registry.register("/添加用户", _noop, help="添加监听用户", exact=False)
+    assert registry.match("/版本")[0] is not None
+    assert registry.help_text("指令列表", "结束") == "指令列表\n[/当前版本] 查看版本\n[/添加用户***] 添加监听用户\n结束"
+
+
+def test_dispatch_runs_handler_in_worker_thread(registry):
+    chat = FakeChat()
+    calls = []
+
+    def handler(chat, content, arg):
+        calls.append((threading.current_thread().name, content, arg))
+        chat.SendMsg("完成")
+
+    registry.register("/添加群", handler, exact=False)
+    assert registry.dispatch(chat, "/添加群 测试群")
+    assert chat.event.wait(2)
+    assert calls[0][0].startswith("admin_cmd")
+    assert calls[0][1:] == ("/添加群 测试群", "测试群")
+    assert not registry.dispatch(chat, "普通消息")
+
+
+def test_dispatch_reports_handler_failure(registry):
+    chat = FakeChat()
+
+    def handler(chat, content, arg):
+        raise ValueError("参数错误")
+
+    registry.register("/删除用户", handler, exact=False)
+    registry.dispatch(chat, "/删除用户 张三")
+    assert chat.event.wait(2)
+    assert chat.sent == ["/删除用户 张三 执行失败: 参数错误"]
+
+
+def test_dispatch_on_given_executor():
+    from rpa_executor import SerialTaskExecutor
+
+    executor = SerialTaskExecutor("msg_dispatch_test", default_timeout=None)
+    registry = CommandRegistry(executor=executor)
+    chat = FakeChat()
+    threads = []
+
+    def handler(chat, content, arg):
+        threads.append(threading.current_thread())
+        chat.SendMsg("完成")
+
+    registry.register("/当前用户", handler)
+    try:
+        assert registry.dispatch(chat, "/当前用户")
+        assert chat.event.wait(2)
+        assert threads == [executor._thread]
+        registry.shutdown()  # 外部执行器不受影响
+        assert executor.submit(lambda: 1).result(timeout=2) == 1
+    finally:
+        executor.shutdown()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""配置存储测试：合并写入、未写盘时读取最新内容、原子替换、写盘失败保留配置并重试"""
+
+import json
+import os
+import time
+
+import pytest
+
+import config_store
+from config_store import ConfigStore, atomic_write_text
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ConfigStore(str(tmp_path / "config.json"), delay=0.05)
+    yield store
+    store.flush(timeout=2)
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_saves_coalesced_into_one_write(store):
+    for i in range(5):
+        store.save({'version': i})
+    assert store.load() == {'version': 4}
+    assert store.exists()
+    assert store.flush(timeout=2)
+    assert _read(store.path) == {'version': 4}
+    assert (store.saves, store.writes) == (5, 1)
+    assert store.get_stats()['pending'] is False
+
+
+def test_saved_content_fixed_at_save_time(store):
+    config = {'name': '张三'}
+    store.save(config)
+    config['name'] = '李四'
+    store.flush(timeout=2)
+    assert _read(store.path) == {'name': '张三'}
+
+
+def test_atomic_write_keeps_mode_and_leaves_no_temp(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text("{}", encoding='utf-8')
+    os.chmod(path, 0o640)
+    atomic_write_text(str(path), '{"a": 1}')
+    assert _read(path) == {'a': 1}
+    assert os.stat(path).st_mode & 0o777 == 0o640
+    assert os.listdir(tmp_path) == ["config.json"]
+
+
+def test_failed_write_keeps_pending_and_retries(store, monkeypatch):
+    calls = []
+
+    def flaky_write(path, text):
+        calls.append(text)
+        if len(calls) == 1:
+            raise OSError("磁盘已满")
+        atomic_write_text(path, text)
+
+    monkeypatch.setattr(config_store, 'atomic_write_text', flaky_write)
+    store.save({'version': 1})
+    for _ in range(200):
+        if store.failures:
+            break
+        time.sleep(0.01)
+    assert store.failures == 1
+    assert '磁盘已满' in store.get_stats()['last_error']
+    # 写盘失败后配置仍在内存中，读取得到的是最新保存的内容
+    assert store.get_stats()['pending'] is True
+    assert store.load() == {'version': 1}
+
+    store.save({'version': 2})
+    # flush 不等待退避间隔，立即重试并写入最新内容
+    assert store.flush(timeout=2)
+    assert _read(store.path) == {'version': 2}
+    assert store.failures == 0 and store.last_error is None
+    assert json.loads(calls[-1]) == {'version': 2}
+
+
+def test_flush_without_writer_thread(tmp_path):
+    store = ConfigStore(str(tmp_path / "config.json"))
+    assert store.flush()
+    assert not store.exists()
+    with store._cond:
+        store._pending = json.dumps({'a': 1})
+    assert store.flush()
+    assert _read(store.path) == {'a': 1}
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""内容寻址存储测试：重复文件硬链接去重、提取结果缓存、LRU/过期淘汰、淘汰前重新检查"""
+
+import os
+import time
+
+import pytest
+
+from content_store import ContentStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ContentStore(tmp_path, max_bytes=0, max_age=0)
+    yield store
+    store.close()
+
+
+def _write(store, name, data):
+    path = store.root / name
+    path.write_bytes(data)
+    return path
+
+
+def test_duplicate_content_hardlinked(store):
+    digest1, first = store.ingest(_write(store, "a.png", b"same-bytes"))
+    digest2, second = store.ingest(_write(store, "b.png", b"same-bytes"))
+    assert digest1 == digest2
+    assert os.path.samefile(first, second)
+    assert os.path.samefile(first, store.blob_path(digest1, ".png"))
+    assert store.total_bytes == len(b"same-bytes")
+    assert store.get_stats()['files'] == 1
+
+
+def test_result_cache(store):
+    digest, _ = store.ingest(_write(store, "a.png", b"image"))
+    assert store.get_result(digest, "ocr") is None
+    store.put_result(digest, "ocr", "识别文字")
+    assert store.get_result(digest, "ocr") == "识别文字"
+    assert store.get_result(digest, "document") is None
+    assert (store.stats['hits'], store.stats['misses']) == (1, 2)
+
+
+def test_lru_eviction_keeps_recently_used(store):
+    paths = {}
+    for name in ("old", "used", "new"):
+        paths[name] = store.ingest(_write(store, f"{name}.bin", name.encode() * 100))
+        time.sleep(0.01)
+    store.put_result(paths["used"][0], "ocr", "文字")
+    store.get_result(paths["used"][0], "ocr")
+    store.max_bytes = 500
+
+    assert store.evict() == 2
+    assert not paths["old"][1].exists()
+    assert not paths["new"][1].exists()
+    assert paths["used"][1].exists()
+    assert store.total_bytes == 400
+    assert store.stats['evicted_files'] == 2
+
+
+def test_expired_content_evicted(store):
+    digest, path = store.ingest(_write(store, "a.bin", b"expired"))
+    store.max_age = 60
+    assert store.evict() == 0
+    with store._db:
+        store._db.execute("UPDATE blobs SET last_access = ?", (time.time() - 120,))
+    assert store.evict() == 1
+    assert not path.exists()
+    assert not store.blob_path(digest, ".bin").exists()
+    assert store.total_bytes == 0
+
+
+def test_blob_used_after_selection_not_evicted(store, monkeypatch):
+    digest, path = store.ingest(_write(store, "a.bin", b"in-use"))
+    store.max_age = 60
+    with store._db:
+        store._db.execute("UPDATE blobs SET last_access = ?", (time.time() - 120,))
+
+    remove_blob = store._remove_blob
+
+    def touched_before_remove(*row):
+        # 选出候选项之后、删除之前又收到同样的文件
+        store.ingest(_write(store, "b.bin", b"in-use"))
+        return remove_blob(*row)
+
+    monkeypatch.setattr(store, '_remove_blob', touched_before_remove)
+    assert store.evict() == 0
+    assert path.exists()
+    assert (store.root / "b.bin").exists()
+    assert store.total_bytes == len(b"in-use")
+    assert store.stats['evicted_files'] == 0
+
+
+def test_candidate_with_new_link_skipped(store):
+    digest, path = store.ingest(_write(store, "b.bin", b"other"))
+    row = store._db.execute(store._CANDIDATE_QUERY).fetchone()
+    store.ingest(_write(store, "c.bin", b"other"))
+    with store._db:
+        # 最后访问时间相同但新增了链接，同样保留
+        store._db.execute("UPDATE blobs SET last_access = ? WHERE digest = ?", (row[3], digest))
+    assert not store._remove_blob(*row)
+    assert path.exists()
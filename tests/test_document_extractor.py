@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""文档文本提取测试：DOCX流式解析、表格行数上限、字数截断与纯文本编码识别"""
+
+import zipfile
+
+from document_extractor import extract_document, is_supported
+
+_NS = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+
+def _paragraph(text, tab_stop=False):
+    properties = '<w:pPr><w:tabs><w:tab w:val="left" w:pos="720"/></w:tabs></w:pPr>' if tab_stop else ''
+    return f'<w:p>{properties}<w:r><w:t>{text}</w:t></w:r></w:p>'
+
+
+def _table(rows):
+    body = "".join(
+        "<w:tr>" + "".join(f"<w:tc>{_paragraph(cell)}</w:tc>" for cell in row) + "</w:tr>" for row in rows)
+    return f"<w:tbl>{body}</w:tbl>"
+
+
+def _write_docx(path, body):
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('word/document.xml', f'<?xml version="1.0"?><w:document {_NS}><w:body>{body}</w:body></w:document>')
+    return str(path)
+
+
+def test_docx_paragraphs_and_tables_in_document_order(tmp_path):
+    body = (_paragraph("第一段") + _table([["名称", "数值"], ["项目", "1"]])
+            + '<w:p><w:r><w:t>前</w:t><w:tab/><w:t>后</w:t><w:br/><w:t>换行</w:t></w:r></w:p>')
+    path = _write_docx(tmp_path / "a.docx", body)
+    assert extract_document(path) == "第一段\n名称 | 数值\n项目 | 1\n前\t后\n换行"
+
+
+def test_docx_tab_stops_are_not_text(tmp_path):
+    path = _write_docx(tmp_path / "a.docx", _paragraph("正文", tab_stop=True))
+    assert extract_document(path) == "正文"
+
+
+def test_docx_table_rows_limited(tmp_path):
+    path = _write_docx(tmp_path / "a.docx", _table([[f"行{i}"] for i in range(10)]) + _paragraph("表后"))
+    text = extract_document(path, max_rows=3)
+    assert text == "行0\n行1\n行2\n...（仅提取前3行）\n表后"
+
+
+def test_docx_nested_table_kept_in_cell(tmp_path):
+    inner = _table([["内层"]])
+    body = f"<w:tbl><w:tr><w:tc>{_paragraph('外层')}{inner}</w:tc><w:tc>{_paragraph('右侧')}</w:tc></w:tr></w:tbl>"
+    path = _write_docx(tmp_path / "a.docx", body)
+    assert extract_document(path) == "内层\n外层 | 右侧"
+
+
+def test_docx_stops_at_char_limit(tmp_path):
+    path = _write_docx(tmp_path / "a.docx", "".join(_paragraph(f"第{i}段内容") for i in range(5000)))
+    text = extract_document(path, max_chars=50)
+    assert text.endswith("...（内容过长，已截取前50字）")
+    assert len(text) < 50 + 20
+
+
+def test_plain_text_gbk_detected(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_bytes("中文内容，GBK编码。".encode('gbk'))
+    assert extract_document(str(path)) == "中文内容，GBK编码。"
+
+
+def test_unsupported_extension(tmp_path):
+    assert not is_supported("a.exe")
+    assert is_supported("A.DOCX")
+    assert extract_document(str(tmp_path / "a.exe")) == ""
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""链接抓取测试：目标地址检查、重定向与DNS重绑定防护、会话隔离、正文提取"""
+
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import link_fetcher
+from link_fetcher import LinkFetcher, UnsafeURLError, check_url, extract_readable, extract_url
+
+PUBLIC_IP = "93.184.216.34"
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """返回带Cookie的简单网页，记录收到的请求"""
+
+    requests = []
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get('Cookie')))
+        body = "<html><head><title>标题</title></head><body><p>这是网页的正文内容。</p></body></html>".encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Set-Cookie', 'sid=secret; Path=/')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    PageHandler.requests = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fetcher():
+    fetcher = LinkFetcher(timeout=3)
+    yield fetcher
+    fetcher.close()
+
+
+def _resolve_to(monkeypatch, address):
+    def getaddrinfo(host, port, *args, **kwargs):
+        return [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, '', (address, port))]
+    monkeypatch.setattr(link_fetcher.socket, 'getaddrinfo', getaddrinfo)
+
+
+# ---------------- 目标地址检查 ----------------
+
+@pytest.mark.parametrize('url', [
+    "http://127.0.0.1/", "http://localhost:8080/", "http://10.0.0.1/", "http://192.168.1.1/admin",
+    "http://169.254.169.254/latest/meta-data/", "http://[::1]/", "http://[::ffff:127.0.0.1]/", "http://0.0.0.0/",
+])
+def test_check_url_rejects_non_public(url):
+    with pytest.raises(UnsafeURLError):
+        check_url(url)
+
+
+@pytest.mark.parametrize('url', ["ftp://example.com/a", "file:///etc/passwd", "http:///path", "http://a:99999/"])
+def test_check_url_rejects_bad_scheme_host_or_port(url):
+    with pytest.raises(UnsafeURLError):
+        check_url(url)
+
+
+def test_check_url_rejects_hostname_resolving_to_private(monkeypatch):
+    _resolve_to(monkeypatch, "10.1.2.3")
+    with pytest.raises(UnsafeURLError, match="10.1.2.3"):
+        check_url("https://intranet.example.com/")
+
+
+def test_check_url_accepts_public():
+    assert check_url(f"https://{PUBLIC_IP}/page") == [PUBLIC_IP]
+
+
+# ---------------- 重定向与DNS重绑定 ----------------
+
+class RedirectResponse:
+    is_redirect = True
+
+    def __init__(self, location):
+        self.headers = {'Location': location}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class RecordingSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        return self.responses.pop(0)
+
+    def close(self):
+        pass
+
+
+def test_redirect_to_private_rejected(fetcher):
+    redirect = RedirectResponse("http://127.0.0.1:8080/admin")
+    fetcher._session = RecordingSession([redirect])
+    with pytest.raises(UnsafeURLError):
+        fetcher.fetch(f"http://{PUBLIC_IP}/")
+    assert fetcher._session.urls == [f"http://{PUBLIC_IP}/"]
+    assert redirect.closed
+
+
+def test_redirect_limit(fetcher):
+    fetcher.max_redirects = 2
+    fetcher._session = RecordingSession([RedirectResponse(f"/r{i}") for i in range(3)])
+    with pytest.raises(ValueError, match="重定向次数超过"):
+        fetcher.fetch(f"http://{PUBLIC_IP}/")
+    assert len(fetcher._session.urls) == 3
+
+
+def test_peer_address_checked_after_connect(monkeypatch, fetcher, local_server):
+    # 检查时解析为公网地址，连接时却指向本机（DNS重绑定）
+    monkeypatch.setattr(link_fetcher, 'check_url', lambda url: [PUBLIC_IP])
+    with pytest.raises(UnsafeURLError, match="127.0.0.1"):
+        fetcher.fetch(local_server + "/page")
+    assert PageHandler.requests == []
+
+
+# ---------------- 会话隔离 ----------------
+
+def test_fetch_session_keeps_no_cookies(monkeypatch, fetcher, local_server):
+    monkeypatch.setattr(link_fetcher, 'check_url', lambda url: [PUBLIC_IP])
+    monkeypatch.setattr(link_fetcher, '_is_public_address', lambda address: True)
+    result = fetcher.fetch(local_server + "/a")
+    assert result['title'] == "标题"
+    assert "正文内容" in result['text']
+    fetcher.fetch(local_server + "/b")
+    assert PageHandler.requests == [("/a", None), ("/b", None)]
+    assert len(fetcher._get_session().cookies) == 0
+
+    from API.session import get_session
+    assert fetcher._get_session() is not get_session()
+
+
+def test_fetch_uses_cache(monkeypatch, fetcher, local_server):
+    monkeypatch.setattr(link_fetcher, 'check_url', lambda url: [PUBLIC_IP])
+    monkeypatch.setattr(link_fetcher, '_is_public_address', lambda address: True)
+    first = fetcher.fetch(local_server + "/a")
+    assert fetcher.fetch(local_server + "/a") is first
+    assert len(PageHandler.requests) == 1
+
+
+# ---------------- 链接与正文提取 ----------------
+
+class LinkMessage:
+    def __init__(self, info=None, url=None):
+        self.info = info
+        self._url = url
+
+    def get_url(self):
+        return self._url
+
+
+def test_extract_url_sources():
+    assert extract_url(LinkMessage(url=" https://a.com/x ")) == "https://a.com/x"
+    assert extract_url(LinkMessage(info="<msg><url>https://b.com/?a=1&amp;b=2</url></msg>")) == "https://b.com/?a=1&b=2"
+    assert extract_url(LinkMessage(info={'url': 'https://c.com/'})) == "https://c.com/"
+    assert extract_url(LinkMessage()) is None
+
+
+def test_extract_readable_skips_boilerplate_and_truncates():
+    html = ("<html><head><meta name='description' content='摘要'><title>标题</title>"
+            "<script>var a = 1;</script></head><body><nav>首页 关于我们</nav>"
+            "<p>" + "正文内容" * 20 + "</p><footer>版权所有信息</footer></body></html>")
+    result = extract_readable(html, max_chars=10)
+    assert result['title'] == "标题" and result['description'] == "摘要"
+    assert result['text'].startswith("正文内容正文内容正文")
+    assert "已截取前10字" in result['text']
+    assert "var a" not in result['text'] and "版权" not in result['text']
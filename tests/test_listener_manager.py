@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""监听器增量同步测试：差异计算、后台重试与重试失效、就绪状态与进度"""
+
+import json
+import threading
+import time
+
+import pytest
+
+from listener_manager import FAILED, PENDING, READY, RETRYING, ListenerReconciler
+
+
+class FakeWeChat:
+    """记录添加/移除调用，可指定添加失败的窗口"""
+
+    def __init__(self):
+        self.listening = set()
+        self.failing = set()
+        self.add_calls = []
+        self.remove_calls = []
+
+    def add(self, name):
+        self.add_calls.append(name)
+        if name in self.failing:
+            return False
+        self.listening.add(name)
+        return True
+
+    def remove(self, name):
+        self.remove_calls.append(name)
+        self.listening.discard(name)
+
+
+class ManualScheduler:
+    """手动触发的重试调度：记录安排的重试，由测试决定何时执行"""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def __call__(self, func, delay):
+        self.scheduled.append((func, delay))
+
+    def run_all(self):
+        scheduled, self.scheduled = self.scheduled, []
+        for func, _ in scheduled:
+            func()
+        return len(scheduled)
+
+
+@pytest.fixture
+def wechat():
+    return FakeWeChat()
+
+
+@pytest.fixture
+def scheduler():
+    return ManualScheduler()
+
+
+@pytest.fixture
+def reconciler(wechat, scheduler):
+    return ListenerReconciler(wechat.add, wechat.remove, log_func=lambda *args: None,
+                              retry_scheduler=scheduler, retry_base=1.0, max_retries=2)
+
+
+def _state(reconciler, name):
+    return reconciler.get_readiness()[name]['state']
+
+
+# ---------------- 差异计算 ----------------
+
+def test_diff_dedupes_and_orders_known_good_first(reconciler):
+    reconciler.known_good = {'c'}
+    reconciler.reset(['x'])
+    to_add, to_remove = reconciler.diff(['a', 'c', '', 'a', 'b', 'x'])
+    assert to_add == ['c', 'a', 'b']
+    assert to_remove == []
+    assert reconciler.diff(['a'])[1] == ['x']
+
+
+def test_reconcile_adds_and_removes_only_differences(reconciler, wechat):
+    assert reconciler.reconcile(['a', 'b'])['added'] == ['a', 'b']
+    result = reconciler.reconcile(['b', 'c'])
+    assert result == {'added': ['c'], 'removed': ['a'], 'failed': []}
+    assert wechat.add_calls == ['a', 'b', 'c']
+    assert wechat.remove_calls == ['a']
+    assert reconciler.registered == {'b', 'c'}
+    assert reconciler.summary() == {READY: 2, PENDING: 0, RETRYING: 0, FAILED: 0, 'total': 2}
+    assert reconciler.reconcile(['b', 'c']) == {'added': [], 'removed': [], 'failed': []}
+
+
+# ---------------- 后台重试 ----------------
+
+def test_failed_add_retries_in_background(reconciler, wechat, scheduler):
+    wechat.failing = {'a'}
+    result = reconciler.reconcile(['a', 'b'])
+    assert result['failed'] == ['a'] and result['added'] == ['b']
+    assert _state(reconciler, 'a') == RETRYING
+    assert [delay for _, delay in scheduler.scheduled] == [1.0]
+
+    wechat.failing.clear()
+    assert scheduler.run_all() == 1
+    assert _state(reconciler, 'a') == READY
+    assert 'a' in reconciler.registered
+    assert scheduler.scheduled == []
+
+
+def test_retry_backoff_then_failed(reconciler, wechat, scheduler):
+    wechat.failing = {'a'}
+    reconciler.reconcile(['a'])
+    delays = []
+    while scheduler.scheduled:
+        delays.extend(delay for _, delay in scheduler.scheduled)
+        scheduler.run_all()
+    assert delays == [1.0, 2.0]  # 指数退避，max_retries=2
+    status = reconciler.get_readiness()['a']
+    assert status['state'] == FAILED and status['attempts'] == 2
+    assert wechat.add_calls == ['a', 'a', 'a']
+
+
+# ---------------- 重试失效 ----------------
+
+def test_reset_invalidates_pending_retries(reconciler, wechat, scheduler):
+    wechat.failing = {'a'}
+    reconciler.reconcile(['a'])
+    reconciler.reset()
+    wechat.failing.clear()
+    scheduler.run_all()
+    assert wechat.add_calls == ['a']
+    assert 'a' not in reconciler.get_readiness()
+
+
+def test_forget_invalidates_pending_retry(reconciler, wechat, scheduler):
+    wechat.failing = {'a', 'b'}
+    reconciler.reconcile(['a', 'b'])
+    reconciler.forget('a')
+    wechat.failing.clear()
+    scheduler.run_all()
+    assert wechat.add_calls == ['a', 'b', 'b']
+    assert 'a' not in reconciler.get_readiness()
+    assert _state(reconciler, 'b') == READY
+
+
+def test_forget_keeps_registered_chat_status(reconciler):
+    reconciler.reconcile(['a'])
+    reconciler.forget('a')
+    assert _state(reconciler, 'a') == READY
+
+
+def test_removed_from_desired_invalidates_retry(reconciler, wechat, scheduler):
+    wechat.failing = {'a'}
+    reconciler.reconcile(['a'])
+    reconciler.reconcile([])
+    wechat.failing.clear()
+    scheduler.run_all()
+    assert wechat.add_calls == ['a']
+    assert reconciler.get_readiness() == {}
+
+
+def test_new_reconcile_supersedes_old_retry(reconciler, wechat, scheduler):
+    wechat.failing = {'a'}
+    reconciler.reconcile(['a'])
+    stale = scheduler.scheduled.pop()
+    reconciler.reconcile(['a'])  # 重新尝试并安排新的重试
+    stale[0]()
+    assert wechat.add_calls == ['a', 'a']
+    scheduler.run_all()
+    assert wechat.add_calls == ['a', 'a', 'a']
+
+
+def test_add_exception_counts_as_failure(wechat, scheduler):
+    def add(name):
+        raise RuntimeError("窗口未找到")
+
+    reconciler = ListenerReconciler(add, wechat.remove, log_func=lambda *args: None, retry_scheduler=scheduler)
+    assert reconciler.reconcile(['a'])['failed'] == ['a']
+    assert reconciler.get_readiness()['a']['error'] == "窗口未找到"
+
+
+# ---------------- 已知可用窗口 ----------------
+
+def test_known_good_persisted(tmp_path, wechat, scheduler):
+    state_file = str(tmp_path / "listener_state.json")
+    first = ListenerReconciler(wechat.add, wechat.remove, log_func=lambda *args: None,
+                               retry_scheduler=scheduler, state_file=state_file)
+    first.reconcile(['b', 'a'])
+    with open(state_file, encoding='utf-8') as f:
+        assert json.load(f) == {'known_good': ['a', 'b']}
+
+    second = ListenerReconciler(wechat.add, wechat.remove, log_func=lambda *args: None,
+                                retry_scheduler=scheduler, state_file=state_file)
+    assert second.diff(['c', 'a'])[0] == ['a', 'c']
+
+
+def test_reconcile_async_merges_requests(wechat, scheduler):
+    started = threading.Event()
+    gate = threading.Event()
+
+    def slow_add(name):
+        started.set()
+        gate.wait(2)
+        return wechat.add(name)
+
+    reconciler = ListenerReconciler(slow_add, wechat.remove, log_func=lambda *args: None, retry_scheduler=scheduler)
+    results = []
+    done = threading.Event()
+    reconciler.reconcile_async(['a'], on_done=results.append)
+    assert started.wait(2)
+    reconciler.reconcile_async(['b'], on_done=results.append)
+    reconciler.reconcile_async(['c'], on_done=lambda result: (results.append(result), done.set()))
+    gate.set()
+    assert done.wait(2)
+    # 进行中的同步之后只执行最新一次请求，被覆盖请求的回调同样收到最终结果
+    assert wechat.add_calls == ['a', 'c']
+    assert results[-2:] == [{'added': ['c'], 'removed': ['a'], 'failed': []}] * 2
+
+
+# ---------------- 就绪状态与进度 ----------------
+
+def test_status_callbacks_and_summary(wechat, scheduler):
+    events = []
+    reconciler = ListenerReconciler(wechat.add, wechat.remove, log_func=lambda *args: None,
+                                    retry_scheduler=scheduler, retry_base=1.0, max_retries=1,
+                                    on_status=lambda name, status: events.append((name, status['state'])))
+    wechat.failing = {'a'}
+    progress = []
+    reconciler.reconcile(['a', 'b'], on_progress=lambda done, total, name, ok: progress.append((done, total, ok)))
+    assert progress == [(1, 2, False), (2, 2, True)]
+    assert reconciler.summary() == {READY: 1, PENDING: 0, RETRYING: 1, FAILED: 0, 'total': 2}
+
+    scheduler.run_all()
+    assert reconciler.summary()[FAILED] == 1
+    assert events == [('a', PENDING), ('b', PENDING), ('a', RETRYING), ('b', READY), ('a', FAILED)]
+
+
+def test_retry_delay_capped(wechat, scheduler):
+    reconciler = ListenerReconciler(wechat.add, wechat.remove, log_func=lambda *args: None,
+                                    retry_scheduler=scheduler, retry_base=10.0, retry_max_delay=15.0, max_retries=3)
+    wechat.failing = {'a'}
+    reconciler.reconcile(['a'])
+    delays = []
+    while scheduler.scheduled:
+        delays.extend(delay for _, delay in scheduler.scheduled)
+        scheduler.run_all()
+    assert delays == [10.0, 15.0, 15.0]
+
+
+def test_no_retry_when_disabled(wechat, scheduler):
+    reconciler = ListenerReconciler(wechat.add, wechat.remove, log_func=lambda *args: None,
+                                    retry_scheduler=scheduler, max_retries=0)
+    wechat.failing = {'a'}
+    reconciler.reconcile(['a'])
+    assert scheduler.scheduled == []
+    assert _state(reconciler, 'a') == FAILED
+
+
+def test_default_timer_retry(wechat):
+    reconciler = ListenerReconciler(wechat.add, wechat.remove, log_func=lambda *args: None,
+                                    retry_base=0.01, max_retries=1)
+    wechat.failing = {'a'}
+    reconciler.reconcile(['a'])
+    wechat.failing.clear()
+    for _ in range(200):
+        if _state(reconciler, 'a') == READY:
+            break
+        time.sleep(0.01)
+    assert _state(reconciler, 'a') == READY
+
+
+def test_corrupt_state_file_ignored(tmp_path, wechat, scheduler):
+    state_file = tmp_path / "listener_state.json"
+    state_file.write_text("{坏数据", encoding='utf-8')
+    reconciler = ListenerReconciler(wechat.add, wechat.remove, log_func=lambda *args: None,
+                                    retry_scheduler=scheduler, state_file=str(state_file))
+    assert reconciler.known_good == set()
+    reconciler.reconcile(['a'])
+    assert json.loads(state_file.read_text(encoding='utf-8')) == {'known_good': ['a']}
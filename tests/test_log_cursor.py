@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""处理日志游标测试：增量读取只返回新日志，缓冲区溢出后只返回仍保留的部分"""
+
+import logging
+
+import pytest
+
+from async_message_handler import AsyncMessageHandler
+
+
+@pytest.fixture
+def handler(tmp_path, caplog):
+    caplog.set_level(logging.DEBUG, logger='async_message_handler')
+    handler = AsyncMessageHandler({'download_path': str(tmp_path), 'enable_link_fetch': False}, max_log_lines=5)
+    yield handler
+    handler.message_processor.close()
+
+
+def _messages(logs):
+    return [line.split('] ', 1)[1] for line in logs]
+
+
+def test_incremental_reads(handler):
+    logs, cursor = handler.get_logs_since(0)
+    assert logs == []
+    handler.log_process("INFO", "一")
+    handler.log_process("WARNING", "二", message_id="m1")
+    logs, cursor = handler.get_logs_since(cursor)
+    assert _messages(logs) == ["一", "二"]
+    assert "[WARNING][m1]" in logs[1]
+    assert handler.get_logs_since(cursor) == ([], cursor)
+    handler.log_process("INFO", "三")
+    logs, cursor = handler.get_logs_since(cursor)
+    assert _messages(logs) == ["三"]
+
+
+def test_overflow_returns_retained_logs(handler):
+    _, cursor = handler.get_logs_since(0)
+    for i in range(8):
+        handler.log_process("INFO", str(i))
+    logs, new_cursor = handler.get_logs_since(cursor)
+    assert _messages(logs) == ["3", "4", "5", "6", "7"]
+    assert new_cursor == cursor + 8
+
+
+def test_disabled_level_not_buffered(handler, caplog):
+    caplog.set_level(logging.INFO, logger='async_message_handler')
+    _, cursor = handler.get_logs_since(0)
+    handler.log_process("DEBUG", "调试")
+    assert handler.get_logs_since(cursor) == ([], cursor)
+
+
+def test_cursor_after_clear(handler):
+    handler.log_process("INFO", "旧")
+    _, cursor = handler.get_logs_since(0)
+    handler.clear_logs()
+    handler.log_process("INFO", "新")
+    logs, _ = handler.get_logs_since(cursor)
+    assert _messages(logs) == ["新"]
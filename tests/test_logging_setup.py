@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""日志配置测试：后台线程批量写文件、按大小轮转、控制台级别与界面已显示记录的过滤"""
+
+import logging
+
+import pytest
+
+from logging_setup import BackgroundBatchHandler
+
+
+@pytest.fixture
+def make_logger(request):
+    handlers = []
+
+    def make(**kwargs):
+        handler = BackgroundBatchHandler(**kwargs)
+        handlers.append(handler)
+        log = logging.getLogger(f"test_logging_setup.{request.node.name}.{len(handlers)}")
+        log.propagate = False
+        log.setLevel(logging.DEBUG)
+        log.addHandler(handler)
+        return log, handler
+
+    yield make
+    for handler in handlers:
+        handler.close()
+
+
+def test_records_written_with_message_id(make_logger, tmp_path, capsys):
+    log_file = tmp_path / "logs" / "wxbot.log"
+    log, handler = make_logger(log_file=str(log_file), console_level=logging.WARNING)
+    log.info("收到 %s 条消息", 3, extra={'message_id': 'm1'})
+    log.warning("发送失败")
+    handler.close()
+    lines = log_file.read_text(encoding='utf-8').splitlines()
+    assert len(lines) == 2
+    assert lines[0].endswith("[m1] 收到 3 条消息")
+    assert capsys.readouterr().out.strip().endswith("发送失败")
+
+
+def test_exception_text_captured_in_caller(make_logger, tmp_path):
+    log_file = tmp_path / "wxbot.log"
+    log, handler = make_logger(log_file=str(log_file))
+    try:
+        raise ValueError("坏数据")
+    except ValueError:
+        log.exception("处理失败")
+    handler.close()
+    text = log_file.read_text(encoding='utf-8')
+    assert "处理失败" in text
+    assert "ValueError: 坏数据" in text
+
+
+def test_tailed_records_skipped_on_console(make_logger, capsys):
+    log, handler = make_logger(console_skip_tailed=True)
+    log.info("界面已显示", extra={'tailed': True})
+    log.info("仅控制台")
+    handler.close()
+    out = capsys.readouterr().out
+    assert "界面已显示" not in out
+    assert "仅控制台" in out
+
+
+def test_rotation_by_size(make_logger, tmp_path):
+    log_file = tmp_path / "wxbot.log"
+    log, handler = make_logger(log_file=str(log_file), max_bytes=200, backup_count=2,
+                               console_level=logging.CRITICAL, batch_size=1)
+    for i in range(30):
+        log.info("第%d条日志 %s", i, "x" * 40)
+    handler.close()
+    assert (tmp_path / "wxbot.log.1").exists()
+    assert (tmp_path / "wxbot.log.2").exists()
+    assert not (tmp_path / "wxbot.log.3").exists()
+    # 最后一条写入后可能刚好触发轮转
+    latest = log_file.read_text(encoding='utf-8') + (tmp_path / "wxbot.log.1").read_text(encoding='utf-8')
+    assert "第29条日志" in latest
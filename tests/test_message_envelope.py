@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""消息信封测试：固定字段、从wxauto消息创建、序号递增与阶段时间戳"""
+
+import time
+
+import pytest
+
+from message_envelope import MessageEnvelope
+
+
+class Chat:
+    who = '工作群'
+
+
+class Message:
+    content = '原始内容'
+    sender = '张三'
+    attr = 'friend'
+    type = 'image'
+    info = {'id': 1}
+
+
+def test_from_message_copies_fields():
+    message = Message()
+    envelope = MessageEnvelope.from_message(message, chat=Chat(), content='处理后', route='group')
+    assert envelope.content == '处理后'
+    assert (envelope.sender, envelope.attr, envelope.type) == ('张三', 'friend', 'image')
+    assert envelope.info == {'id': 1}
+    assert envelope.raw is message
+    assert envelope.chat_key == '工作群'
+    assert envelope.route == 'group'
+    assert envelope.transcript is None
+    assert envelope.message_id.startswith('工作群_')
+
+
+def test_from_message_keeps_existing_envelope():
+    envelope = MessageEnvelope('你好')
+    assert MessageEnvelope.from_message(envelope) is envelope
+
+
+def test_slots_reject_unknown_attributes():
+    envelope = MessageEnvelope('你好')
+    assert not hasattr(envelope, '__dict__')
+    with pytest.raises(AttributeError):
+        envelope.extra = 1
+
+
+def test_sequence_increases():
+    first, second = MessageEnvelope('a'), MessageEnvelope('b')
+    assert second.seq > first.seq
+
+
+def test_received_time_and_marks():
+    received = time.monotonic() - 1
+    envelope = MessageEnvelope('你好', received_at=received)
+    assert envelope.timestamps['received'] == received
+    assert envelope.timestamps['dispatched'] >= received
+    envelope.mark('queued')
+    assert envelope.timestamps['queued'] >= envelope.timestamps['dispatched']
+    assert set(MessageEnvelope('你好').timestamps) == {'received'}
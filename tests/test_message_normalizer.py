@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""消息规范化测试：@机器人识别、首尾空白与表情标签处理、内部空白保留"""
+
+from message_normalizer import MessageNormalizer
+
+
+def test_mention_removed_with_following_space():
+    normalized = MessageNormalizer('dolphin').normalize("@dolphin 你好")
+    assert normalized.mentioned
+    assert normalized.text == "你好"
+    assert normalized.raw == "@dolphin 你好"
+
+
+def test_nickname_with_regex_metacharacters():
+    normalizer = MessageNormalizer('a.b(c)')
+    assert normalizer.normalize("@a.b(c) 在吗").text == "在吗"
+    assert not normalizer.normalize("@aXb(c) 在吗").mentioned
+
+
+def test_no_nickname_never_mentioned():
+    normalized = MessageNormalizer('').normalize("@dolphin 你好")
+    assert not normalized.mentioned
+    assert normalized.text == "@dolphin 你好"
+
+
+def test_emoji_tags_only_removed_from_plain():
+    normalized = MessageNormalizer('dolphin').normalize("  [微笑]你是谁[捂脸]　")
+    assert normalized.text == "[微笑]你是谁[捂脸]"
+    assert normalized.plain == "你是谁"
+
+
+def test_inner_whitespace_preserved():
+    normalized = MessageNormalizer('dolphin').normalize("设置 AI设定\n  第一行\n  第二行 ")
+    assert normalized.text == "设置 AI设定\n  第一行\n  第二行"
+
+
+def test_non_string_content():
+    normalizer = MessageNormalizer('dolphin')
+    assert normalizer.normalize(None).text == ""
+    assert normalizer.normalize(123).text == "123"
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""语音消息处理测试：路由前转写结果复用、本地识别并发上限、回退到微信转文字、信号量按事件循环创建"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+
+import pytest
+
+from message_envelope import MessageEnvelope
+from message_processor import MessageProcessor
+from rpa_executor import SerialTaskExecutor
+
+
+class VoiceMessage:
+    """假语音消息：下载写出音频文件，to_text 返回微信自带的转写"""
+
+    type = 'voice'
+    content = '[语音]'
+    attr = 'friend'
+    sender = '张三'
+
+    def __init__(self, audio=b'RIFF-voice', text="微信转写"):
+        self.audio = audio
+        self.text = text
+        self.to_text_calls = 0
+
+    def download(self, dir_path):
+        path = Path(dir_path) / f"voice_{id(self)}.wav"
+        path.write_bytes(self.audio)
+        return path
+
+    def to_text(self):
+        self.to_text_calls += 1
+        return self.text
+
+
+class FakeSpeechToText:
+    """记录并发数的假语音识别服务，结果由测试释放"""
+
+    available = True
+
+    def __init__(self, result="本地转写"):
+        self.result = result
+        self.active = 0
+        self.max_active = 0
+        self.futures = []
+        self.lock = threading.Lock()
+
+    def submit(self, path):
+        future = Future()
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.futures.append(future)
+        return future
+
+    def release_all(self):
+        with self.lock:
+            futures, self.futures = self.futures, []
+            self.active -= len(futures)
+        for future in futures:
+            future.set_result(self.result)
+
+    def shutdown(self):
+        pass
+
+
+@pytest.fixture
+def ui_executor():
+    executor = SerialTaskExecutor("test_ui", default_timeout=None)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.fixture
+def processor(tmp_path, ui_executor):
+    processor = MessageProcessor(download_path=str(tmp_path), enable_document=False, enable_link_fetch=False,
+                                 stt_max_pending=2, ui_executor=ui_executor)
+    yield processor
+    processor.close()
+
+
+def test_transcript_on_envelope_skips_transcription(processor):
+    message = VoiceMessage()
+    envelope = MessageEnvelope.from_message(message, content="[语音转文字] 你好", transcript="你好")
+    assert asyncio.run(processor.extract_content_async(envelope)) == "[语音转文字] 你好"
+    assert message.to_text_calls == 0
+
+
+def test_failed_transcript_not_retried(processor):
+    message = VoiceMessage()
+    envelope = MessageEnvelope.from_message(message, transcript="")
+    assert "转换失败" in asyncio.run(processor.extract_content_async(envelope))
+    assert message.to_text_calls == 0
+
+
+def test_fallback_to_wechat_to_text_on_ui_executor(processor, ui_executor):
+    threads = []
+
+    class Message(VoiceMessage):
+        def to_text(self):
+            threads.append(threading.current_thread())
+            return super().to_text()
+
+    assert asyncio.run(processor.transcribe_voice_async(Message())) == "微信转写"
+    assert threads == [ui_executor._thread]
+    assert asyncio.run(processor.extract_content_async(Message())) == "[语音转文字] 微信转写"
+
+
+def test_local_stt_concurrency_limited_and_cached(processor):
+    stt = processor.speech_to_text = FakeSpeechToText()
+    messages = [VoiceMessage(audio=f"audio{i}".encode()) for i in range(5)]
+
+    async def run():
+        tasks = [asyncio.create_task(processor.transcribe_voice_async(m)) for m in messages]
+        while not all(t.done() for t in tasks):
+            await asyncio.sleep(0.01)
+            if stt.futures:
+                assert stt.active <= 2
+                stt.release_all()
+        return [t.result() for t in tasks]
+
+    assert asyncio.run(run()) == ["本地转写"] * 5
+    assert stt.max_active == 2
+    assert all(m.to_text_calls == 0 for m in messages)
+
+    # 相同音频直接使用缓存的识别结果
+    assert asyncio.run(processor.transcribe_voice_async(VoiceMessage(audio=b"audio0"))) == "本地转写"
+    assert stt.futures == []
+
+
+def test_empty_local_result_falls_back(processor):
+    stt = processor.speech_to_text = FakeSpeechToText(result="  ")
+
+    async def run():
+        task = asyncio.create_task(processor.transcribe_voice_async(message))
+        while not stt.futures:
+            await asyncio.sleep(0.01)
+        stt.release_all()
+        return await task
+
+    message = VoiceMessage()
+    assert asyncio.run(run()) == "微信转写"
+    assert message.to_text_calls == 1
+
+
+def test_semaphore_created_per_event_loop(processor):
+    async def get():
+        return processor._get_voice_semaphore()
+
+    first = asyncio.run(get())
+    second = asyncio.run(get())
+    assert first is not second
+    assert second._value == 2
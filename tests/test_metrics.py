@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""指标测试：Prometheus 文本格式、直方图分位数、HTTP服务默认不启动"""
+
+import urllib.request
+
+import pytest
+
+from async_message_handler import AsyncMessageHandler
+from metrics import MetricsRegistry, MetricsServer
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def test_counter_and_gauge_render(registry):
+    counter = registry.counter('test_total', '测试计数', ('type',))
+    counter.inc(type='text')
+    counter.inc(2, type='image')
+    gauge = registry.gauge('test_size', '测试仪表')
+    gauge.set_function(lambda: 7)
+    assert registry.counter('test_total', '测试计数', ('type',)) is counter
+    assert counter.total() == 3
+    text = registry.render()
+    assert '# TYPE test_total counter' in text
+    assert 'test_total{type="image"} 2' in text
+    assert 'test_size 7' in text
+
+
+def test_histogram_quantile(registry):
+    histogram = registry.histogram('test_seconds', '测试耗时', buckets=(0.1, 1, 10))
+    assert histogram.quantile(0.5) is None
+    for value in (0.05, 0.5, 0.5, 5):
+        histogram.observe(value)
+    assert histogram.count() == 4
+    assert 0.1 <= histogram.quantile(0.5) <= 1
+    assert 'test_seconds_bucket{le="+Inf"} 4' in registry.render()
+
+
+def test_server_not_started_by_default(monkeypatch):
+    started = []
+    from async_message_handler import metrics_server
+    monkeypatch.setattr(metrics_server, 'start', lambda port: started.append(port))
+    monkeypatch.setattr(metrics_server, 'stop', lambda: None)
+    handler = AsyncMessageHandler.__new__(AsyncMessageHandler)
+    handler.config = {}
+    handler._apply_metrics_config()
+    assert started == []
+    handler.config = {'enable_metrics': True, 'metrics_port': 9200}
+    handler._apply_metrics_config()
+    assert started == [9200]
+
+
+def test_server_serves_metrics(registry):
+    registry.counter('served_total', '测试').inc()
+    server = MetricsServer(registry)
+    assert server.start(port=0)
+    try:
+        # 端口0由系统分配，从实际监听地址读取
+        port = server._server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert 'served_total 1' in response.read().decode('utf-8')
+    finally:
+        server.stop()
+    assert server.address is None
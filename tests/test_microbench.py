@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""微基准工具测试：样本采集、Mann-Whitney U 检验与基线比较的判定"""
+
+import pytest
+
+from benchmarks.microbench import Benchmark, compare, mann_whitney_greater, run_benchmark
+
+
+def _result(samples, reference=1.0):
+    samples = list(samples)
+    median = sorted(samples)[len(samples) // 2]
+    return {'samples': samples, 'median': median,
+            'mad': sorted(abs(value - median) for value in samples)[len(samples) // 2], 'reference': reference}
+
+
+BASE = [1.00, 1.01, 0.99, 1.02, 0.98, 1.00, 1.01, 0.99, 1.00, 1.02, 0.98, 1.01, 0.99, 1.00, 1.00]
+
+
+def test_mann_whitney_detects_shift():
+    slower = [value * 1.5 for value in BASE]
+    assert mann_whitney_greater(BASE, slower) < 0.001
+    assert mann_whitney_greater(slower, BASE) > 0.99
+    assert mann_whitney_greater(BASE, []) == 1.0
+    # 全部并列时方差为0，视为没有差异
+    assert mann_whitney_greater([1.0] * 5, [1.0] * 5) == 1.0
+
+
+@pytest.mark.parametrize('factor, verdict', [(1.5, 'regression'), (0.6, 'improvement'), (1.05, 'same')])
+def test_compare_verdicts(factor, verdict):
+    current = {'bench': _result(value * factor for value in BASE)}
+    baseline = {'bench': _result(BASE)}
+    assert compare(current, baseline)[0]['verdict'] == verdict
+
+
+def test_compare_normalizes_machine_speed():
+    # 整台机器慢了一半：参照负载同比例变慢，不判定为回退
+    current = {'bench': _result((value * 1.5 for value in BASE), reference=1.5)}
+    baseline = {'bench': _result(BASE)}
+    assert compare(current, baseline)[0]['verdict'] == 'same'
+    assert compare(current, baseline, normalize=False)[0]['verdict'] == 'regression'
+
+
+def test_compare_marks_new_benchmarks():
+    assert compare({'bench': _result(BASE)}, {})[0]['verdict'] == 'new'
+
+
+def test_run_benchmark_collects_samples():
+    calls = []
+    result = run_benchmark(Benchmark('noop', lambda: lambda: calls.append(1)), repeats=3, min_time=0.001)
+    assert len(result['samples']) == 3
+    assert result['loops'] >= 1
+    assert result['median'] > 0 and result['reference'] > 0
+    assert calls
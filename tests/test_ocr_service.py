@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""OCR服务测试：工作进程数默认为1（每个进程各加载一份模型），可通过配置调整"""
+
+from async_message_handler import AsyncMessageHandler
+from ocr_service import OCRService
+
+
+def test_default_single_worker():
+    assert OCRService().max_workers == 1
+    assert OCRService(max_workers=0).max_workers == 1
+    assert OCRService(max_workers=2).max_workers == 2
+
+
+def test_processor_settings_default_ocr_workers():
+    handler = AsyncMessageHandler.__new__(AsyncMessageHandler)
+    handler.config = {}
+    assert handler._processor_settings()['ocr_workers'] == 1
+    handler.config = {'ocr_workers': 2}
+    assert handler._processor_settings()['ocr_workers'] == 2
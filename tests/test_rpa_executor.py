@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""RPA任务执行器测试"""
+
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+from rpa_executor import RPAChat, SerialTaskExecutor, unwrap_chat
+
+
+@pytest.fixture
+def executor():
+    ex = SerialTaskExecutor("test_rpa", default_timeout=None)
+    yield ex
+    ex.shutdown(wait=True, timeout=2)
+
+
+def test_tasks_run_serially_in_submission_order(executor):
+    order = []
+    threads = set()
+    active = []
+
+    def task(i):
+        active.append(i)
+        assert len(active) == 1  # 同一时刻只执行一个任务
+        threads.add(threading.current_thread().name)
+        time.sleep(0.005)
+        order.append(i)
+        active.remove(i)
+        return i * 2
+
+    futures = [executor.submit(task, i) for i in range(10)]
+    assert [f.result(timeout=2) for f in futures] == [i * 2 for i in range(10)]
+    assert order == list(range(10))
+    assert threads == {"test_rpa"}
+
+
+def test_delayed_task_runs_after_immediate_ones(executor):
+    order = []
+    delayed = executor.submit(order.append, "delayed", delay=0.1)
+    executor.submit(order.append, "now").result(timeout=2)
+    delayed.result(timeout=2)
+    assert order == ["now", "delayed"]
+
+
+def test_exception_is_returned_and_worker_keeps_running(executor):
+    def boom():
+        raise ValueError("失败")
+
+    with pytest.raises(ValueError):
+        executor.submit(boom).result(timeout=2)
+    assert executor.submit(lambda: "ok").result(timeout=2) == "ok"
+    assert executor.stats['failed'] == 1
+
+
+def test_queued_task_expires_after_timeout(executor):
+    release = threading.Event()
+    executor.submit(release.wait, 2)
+    expired = executor.submit(lambda: "late", timeout=0.05)
+    time.sleep(0.15)
+    release.set()
+    with pytest.raises(TimeoutError):
+        expired.result(timeout=2)
+    assert executor.stats['expired'] == 1
+
+
+def test_cancel_pending(executor):
+    release = threading.Event()
+    running = executor.submit(release.wait, 2)
+    queued = [executor.submit(lambda: None) for _ in range(3)]
+    time.sleep(0.05)
+    assert executor.cancel_pending() == 3
+    release.set()
+    assert running.result(timeout=2) is True
+    for future in queued:
+        with pytest.raises(CancelledError):
+            future.result(timeout=2)
+
+
+def test_call_runs_inline_on_worker_thread(executor):
+    def outer():
+        # 在工作线程中同步调用不能等待自身，否则死锁
+        return executor.call(lambda: threading.current_thread().name)
+
+    assert executor.submit(outer).result(timeout=2) == "test_rpa"
+    assert executor.call(lambda x: x + 1, 1) == 2
+
+
+def test_submit_after_shutdown_fails(executor):
+    executor.shutdown()
+    with pytest.raises(RuntimeError):
+        executor.submit(lambda: None).result(timeout=1)
+
+
+def test_rpa_chat_sends_through_executor(executor):
+    class Chat:
+        who = "用户1"
+
+        def __init__(self):
+            self.sent = []
+
+        def SendMsg(self, text, at=None):
+            self.sent.append((threading.current_thread().name, text, at))
+
+    target = Chat()
+    chat = RPAChat(target, executor)
+    chat.SendMsg("你好", at="张三").result(timeout=2)
+    assert target.sent == [("test_rpa", "你好", "张三")]
+    assert chat.who == "用户1"
+    assert unwrap_chat(chat) is target
+    assert unwrap_chat(target) is target
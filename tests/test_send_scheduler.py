@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""发送调度器测试：令牌桶、自适应间隔、按窗口分批与限速"""
+
+from collections import deque
+
+import pytest
+
+from send_scheduler import AdaptivePacer, SendScheduler, TokenBucket
+
+
+def _msg(chat, text="x", at_user=None):
+    return {'chat': chat, 'message': text, 'at_user': at_user}
+
+
+def _key(send_data):
+    return send_data['chat']
+
+
+def _texts(batch):
+    return [(item['chat'], item['message']) for item in batch]
+
+
+# ---------------- 令牌桶 ----------------
+
+def test_token_bucket_burst_and_refill():
+    bucket = TokenBucket(rate=2.0, burst=3)
+    now = bucket.updated
+    assert bucket.available(now) == 3
+    bucket.take(3, now)
+    assert bucket.available(now) == 0
+    assert bucket.wait_time(1, now) == pytest.approx(0.5)
+    assert bucket.available(now + 0.5) == pytest.approx(1.0)
+    # 补充不超过桶容量
+    assert bucket.available(now + 100) == 3
+    assert bucket.wait_time(1, now + 100) == 0.0
+
+
+def test_token_bucket_ignores_earlier_timestamp():
+    # take_batch 先取时间再创建桶：早于创建时间的 now 不应扣减令牌
+    bucket = TokenBucket(rate=1.0, burst=3)
+    assert bucket.available(bucket.updated - 0.01) == 3
+
+
+# ---------------- 自适应间隔 ----------------
+
+def test_pacer_additive_decrease_on_success():
+    pacer = AdaptivePacer(min_gap=0.2, max_gap=5.0, initial_gap=0.5, decrease_step=0.05)
+    pacer.record(0.1, True)
+    assert pacer.gap == pytest.approx(0.45)
+    for _ in range(20):
+        pacer.record(0.1, True)
+    assert pacer.gap == pytest.approx(0.2)  # 不低于最小间隔
+
+
+def test_pacer_multiplicative_increase_on_failure():
+    pacer = AdaptivePacer(min_gap=0.2, max_gap=5.0, initial_gap=0.5)
+    pacer.record(0.1, False)
+    assert pacer.gap == pytest.approx(1.0)
+    for _ in range(10):
+        pacer.record(0.1, False)
+    assert pacer.gap == pytest.approx(5.0)  # 不超过最大间隔
+    assert pacer.get_stats()['failed'] == 11
+
+
+def test_pacer_gap_follows_slow_sends():
+    pacer = AdaptivePacer(min_gap=0.2, max_gap=5.0, initial_gap=0.2)
+    pacer.record(3.0, True)
+    assert pacer.gap == pytest.approx(1.5)  # 至少为平均耗时的一半
+
+
+# ---------------- 分批与重排 ----------------
+
+def test_take_batch_groups_same_chat_and_keeps_other_order():
+    scheduler = SendScheduler(per_chat_per_minute=0, per_chat_burst=5, reorder_window=8)
+    pending = deque([_msg('a', '1'), _msg('b', '1'), _msg('a', '2'), _msg('c', '1'), _msg('a', '3')])
+    batch = scheduler.take_batch(pending, _key)
+    assert _texts(batch) == [('a', '1'), ('a', '2'), ('a', '3')]
+    assert _texts(pending) == [('b', '1'), ('c', '1')]
+    assert scheduler.reordered == 2
+
+
+def test_take_batch_respects_reorder_window_and_burst():
+    scheduler = SendScheduler(per_chat_per_minute=0, per_chat_burst=2, reorder_window=3)
+    pending = deque([_msg('a', '1'), _msg('b', '1'), _msg('a', '2'), _msg('a', '3'), _msg('a', '4')])
+    batch = scheduler.take_batch(pending, _key)
+    assert _texts(batch) == [('a', '1'), ('a', '2')]
+    assert _texts(pending) == [('b', '1'), ('a', '3'), ('a', '4')]
+
+
+def test_reorder_window_of_one_sends_in_arrival_order():
+    scheduler = SendScheduler(per_chat_per_minute=0, per_chat_burst=5, reorder_window=1)
+    pending = deque([_msg('a', '1'), _msg('b', '1'), _msg('a', '2')])
+    assert _texts(scheduler.take_batch(pending, _key)) == [('a', '1')]
+    assert _texts(scheduler.take_batch(pending, _key)) == [('b', '1')]
+    assert _texts(scheduler.take_batch(pending, _key)) == [('a', '2')]
+    assert scheduler.reordered == 0
+
+
+def test_other_chats_deferred_at_most_window():
+    scheduler = SendScheduler(per_chat_per_minute=0, per_chat_burst=10, reorder_window=4)
+    pending = deque([_msg('a', '1'), _msg('b', '1'), _msg('c', '1'), _msg('a', '2'), _msg('a', '3')])
+    assert _texts(scheduler.take_batch(pending, _key)) == [('a', '1'), ('a', '2')]
+    # 同一窗口内顺序不变，其他窗口保持相对顺序
+    assert _texts(pending) == [('b', '1'), ('c', '1'), ('a', '3')]
+
+
+# ---------------- 按窗口限速 ----------------
+
+def test_throttled_chat_is_skipped_without_blocking_others():
+    scheduler = SendScheduler(per_chat_per_minute=60, per_chat_burst=1)
+    pending = deque([_msg('a', '1'), _msg('a', '2'), _msg('b', '1')])
+
+    first = scheduler.take_batch(pending, _key)
+    assert _texts(first) == [('a', '1')]
+    scheduler.delay_before('a', len(first))
+
+    # a 的令牌已用尽：跳过 a，先发送 b，a 的消息留在原位
+    second = scheduler.take_batch(pending, _key)
+    assert _texts(second) == [('b', '1')]
+    assert _texts(pending) == [('a', '2')]
+    assert scheduler.throttled_skips == 1
+    scheduler.delay_before('b', len(second))
+
+    # 只剩限速中的窗口：不取出消息，返回需要等待的时间而不是阻塞
+    assert scheduler.take_batch(pending, _key) == []
+    assert 0 < scheduler.next_ready_delay(pending, _key) <= 1.0
+    assert _texts(pending) == [('a', '2')]
+
+
+def test_batch_size_limited_by_remaining_tokens():
+    scheduler = SendScheduler(per_chat_per_minute=60, per_chat_burst=3)
+    pending = deque(_msg('a', str(i)) for i in range(5))
+    assert len(scheduler.take_batch(pending, _key)) == 3
+    scheduler.delay_before('a', 3)
+    assert scheduler.take_batch(pending, _key) == []
+    assert len(pending) == 2
+
+
+def test_unlimited_rate_has_no_buckets():
+    scheduler = SendScheduler(per_chat_per_minute=0)
+    pending = deque([_msg('a')])
+    assert scheduler.next_ready_delay(pending, _key) == 0.0
+    scheduler.take_batch(pending, _key)
+    scheduler.delay_before('a', 1)
+    assert scheduler.buckets == {}
+
+
+# ---------------- 合并 ----------------
+
+def test_merge_same_at_user_within_limit():
+    scheduler = SendScheduler(merge_replies=True, merge_max_chars=10, merge_separator="|")
+    batch = [_msg('a', 'abc', 'u1'), _msg('a', 'def', 'u1'), _msg('a', 'ghi', 'u2'), _msg('a', 'jklmnopq', 'u2')]
+    merged = scheduler.merge(batch)
+    assert [item['message'] for item in merged] == ['abc|def', 'ghi', 'jklmnopq']
+    assert merged[0]['merged'] == batch[:2]
+    assert scheduler.merged == 1
+    assert 'merged' not in batch[0]  # 不修改原消息
+
+
+def test_merge_disabled_returns_batch_unchanged():
+    scheduler = SendScheduler(merge_replies=False)
+    batch = [_msg('a', 'abc', 'u1'), _msg('a', 'def', 'u1')]
+    assert scheduler.merge(batch) is batch
+    assert scheduler.merged == 0
+
+
+def test_merge_stops_at_length_limit():
+    scheduler = SendScheduler(merge_replies=True, merge_max_chars=7, merge_separator="|")
+    batch = [_msg('a', 'abc'), _msg('a', 'def'), _msg('a', 'g')]
+    merged = scheduler.merge(batch)
+    # 'abc|def' 恰好7个字符，再合并 'g' 会超长
+    assert [item['message'] for item in merged] == ['abc|def', 'g']
+    assert scheduler.get_stats()['merged'] == 1
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""启动耗时统计测试：阶段计时、重复结束与未结束的阶段、并行阶段标注、指标写入"""
+
+import time
+
+from metrics import STARTUP_PHASE
+from startup_timing import StartupTimer
+
+
+def test_phases_recorded_in_start_order():
+    timer = StartupTimer()
+    timer.reset()
+    with timer.phase('import'):
+        time.sleep(0.01)
+    with timer.phase('config'):
+        pass
+    timer.begin('listeners')  # 未结束的阶段不计入
+    durations = timer.durations()
+    assert list(durations) == ['import', 'config']
+    assert durations['import'] >= 0.01
+    assert timer.total() >= durations['import']
+    assert STARTUP_PHASE.get(phase='import') == durations['import']
+
+
+def test_end_only_once():
+    timer = StartupTimer()
+    timer.begin('config')
+    timer.end('config')
+    first = timer.durations()['config']
+    time.sleep(0.01)
+    timer.end('config')
+    timer.end('unknown')
+    assert timer.durations()['config'] == first
+
+
+def test_phase_ends_on_exception():
+    timer = StartupTimer()
+    try:
+        with timer.phase('connectors'):
+            raise RuntimeError("预热失败")
+    except RuntimeError:
+        pass
+    assert 'connectors' in timer.durations()
+
+
+def test_report_marks_overlapping_phases():
+    timer = StartupTimer()
+    timer.reset()
+    with timer.phase('config'):
+        pass
+    timer.begin('listeners')
+    timer.begin('connectors')
+    timer.end('connectors')
+    timer.end('listeners')
+    report = timer.report()
+    assert report.startswith('启动耗时 ')
+    parts = dict(part.split(' ', 1) for part in report.split(': ', 1)[1].split(' | '))
+    assert not parts['config'].endswith('(并行)')
+    assert parts['listeners'].endswith('(并行)') and parts['connectors'].endswith('(并行)')
+
+
+def test_reset_clears_previous_run():
+    timer = StartupTimer()
+    with timer.phase('config'):
+        pass
+    timer.reset()
+    assert timer.durations() == {}
+    assert StartupTimer().total() == 0.0
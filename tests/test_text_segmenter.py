@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""长文本分段测试"""
+
+import re
+
+import pytest
+
+from text_segmenter import iter_segment_offsets, split_text
+
+
+def _fenced(lang, lines, fence='```'):
+    return f"{fence}{lang}\n" + "\n".join(lines) + f"\n{fence}"
+
+
+def _compact(text):
+    return re.sub(r'\s', '', text)
+
+
+def test_short_and_empty_text():
+    assert split_text("", 10) == []
+    assert split_text("你好", 10) == ["你好"]
+
+
+def test_segments_within_limit_and_nothing_lost():
+    text = "这是一段比较长的中文内容，用来测试分段。" * 40 + "\n\n" + "English sentence here. " * 40
+    segments = split_text(text, 100)
+    assert len(segments) > 1
+    assert all(0 < len(segment) <= 100 for segment in segments)
+    assert _compact("".join(segments)) == _compact(text)
+
+
+def test_prefers_sentence_end():
+    text = "第一句话说完了。" + "后" * 10
+    segments = split_text(text, 12)
+    assert segments[0] == "第一句话说完了。"
+
+
+@pytest.mark.parametrize('fence', ['```', '~~~'])
+@pytest.mark.parametrize('prefix_len', [10, 45, 70, 95])
+def test_code_fence_never_split_when_it_fits(fence, prefix_len):
+    code = _fenced('python', [f"print({i})  # 第{i}行" for i in range(4)], fence)
+    assert len(code) < 100
+    text = "前" * prefix_len + "\n" + code + "\n" + "后面的说明文字。" * 20
+    segments = split_text(text, 100)
+    assert all(len(segment) <= 100 for segment in segments)
+    # 代码块完整地出现在某一段中
+    assert sum(code in segment for segment in segments) == 1
+    for segment in segments:
+        assert segment.count(fence) in (0, 2)
+
+
+def test_multiple_fences_kept_whole():
+    blocks = [_fenced('js', [f"let v{n}_{i} = {i};" for i in range(5)]) for n in range(6)]
+    text = "\n\n".join(f"说明{n}：下面是代码。\n{block}" for n, block in enumerate(blocks))
+    segments = split_text(text, 120)
+    for block in blocks:
+        assert any(block in segment for segment in segments)
+
+
+def test_oversized_fence_split_on_line_boundaries():
+    lines = [f"line_{i:03d} = {i}" for i in range(40)]
+    text = _fenced('', lines)
+    segments = split_text(text, 100)
+    assert all(len(segment) <= 100 for segment in segments)
+    # 只在行尾切分，不切断任何一行
+    pieces = [line for segment in segments for line in segment.split("\n")]
+    assert [p for p in pieces if p.startswith("line_")] == lines
+
+
+def test_table_not_split():
+    table = "\n".join(["| 名称 | 数值 |", "| --- | --- |"] + [f"| 项目{i} | {i} |" for i in range(5)])
+    text = "说明文字。" * 12 + "\n" + table + "\n" + "结尾。" * 20
+    segments = split_text(text, 100)
+    assert any(table in segment for segment in segments)
+
+
+def test_offsets_match_segments():
+    text = "段落一。\n\n" * 30
+    offsets = list(iter_segment_offsets(text, 50))
+    assert [text[start:end] for start, end in offsets] == split_text(text, 50)
+    assert all(not text[start].isspace() and not text[end - 1].isspace() for start, end in offsets)
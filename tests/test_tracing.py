@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""消息链路追踪测试：默认关闭，开启后按阶段生成 span 并写入文件"""
+
+import json
+import time
+
+from async_message_handler import AsyncMessageHandler
+from message_envelope import MessageEnvelope
+from tracing import Tracer
+
+
+class Chat:
+    who = '张三'
+
+
+def _envelope():
+    envelope = MessageEnvelope("你好", chat=Chat(), api_config={'id': 'a1', 'name': '默认', 'platform': 'dify'})
+    for stage in ('queued', 'processing', 'api_done', 'sent'):
+        envelope.mark(stage)
+    return envelope
+
+
+def test_disabled_by_default(tmp_path):
+    tracer = Tracer(path=str(tmp_path / "traces.jsonl"))
+    tracer.finish(_envelope())
+    assert tracer.spans == 0
+    assert tracer._thread is None
+
+
+def test_handler_config_opt_in(monkeypatch):
+    from async_message_handler import tracer
+    monkeypatch.setattr(tracer, 'enabled', tracer.enabled)
+    handler = AsyncMessageHandler.__new__(AsyncMessageHandler)
+    handler.config = {}
+    handler._apply_tracing_config()
+    assert tracer.enabled is False
+    handler.config = {'enable_tracing': True}
+    handler._apply_tracing_config()
+    assert tracer.enabled is True
+
+
+def test_span_attributes_and_stages():
+    span = Tracer().build_span(_envelope(), 'error', {'segments': 2})
+    attributes = {item['key']: item['value'] for item in span['attributes']}
+    assert span['name'] == 'wx.message.user'
+    assert span['status'] == {'code': 2}
+    assert attributes['wx.chat'] == {'stringValue': '张三'}
+    assert attributes['wx.api_config.platform'] == {'stringValue': 'dify'}
+    assert attributes['wx.segments'] == {'intValue': '2'}
+    assert 'wx.stage.queued_to_processing_ms' in attributes
+    assert 'wx.stage.processing_to_api_done_ms' in attributes
+    assert [event['name'] for event in span['events']][0] == 'received'
+    assert int(span['endTimeUnixNano']) >= int(span['startTimeUnixNano'])
+
+
+def test_spans_written_in_background(tmp_path):
+    path = tmp_path / "logs" / "traces.jsonl"
+    tracer = Tracer(path=str(path), enabled=True)
+    tracer.finish(_envelope())
+    tracer.finish(_envelope())
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and not (path.exists() and len(path.read_text().splitlines()) == 2):
+        time.sleep(0.01)
+    lines = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert len(lines) == 2
+    assert lines[0]['spanId'] != lines[1]['spanId']
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""机器人管理员指令测试：指令在消息分发线程中执行、同步监听后只回复一次"""
+
+import threading
+
+import pytest
+
+from listener_manager import ListenerReconciler
+
+
+class RecordingChat:
+    who = '管理员'
+
+    def __init__(self):
+        self.sent = []
+        self.event = threading.Event()
+
+    def SendMsg(self, msg, **kwargs):
+        self.sent.append(msg)
+        self.event.set()
+
+
+@pytest.fixture
+def listeners(bot, monkeypatch):
+    """已初始化的监听器（假的添加/移除函数），配置读写替换为空操作"""
+    added = []
+    reconciler = ListenerReconciler(lambda name: added.append(name) or True, lambda name: None,
+                                    log_func=lambda *args: None, retry_scheduler=lambda func, delay: None)
+    monkeypatch.setattr(bot, 'wx', object())
+    monkeypatch.setattr(bot, 'listener_reconciler', reconciler)
+    monkeypatch.setattr(bot, 'get_desired_listeners', lambda include_groups=True: ['用户1', '群1'])
+    monkeypatch.setattr(bot, 'refresh_config', lambda: None)
+    monkeypatch.setattr(bot, 'save_config', lambda: None)
+    monkeypatch.setattr(bot, 'config', {'群机器人开关': 'False'})
+    monkeypatch.setattr(bot, 'group', ['群1'])
+    return added
+
+
+def _settle(bot, chat):
+    """等待首条回复，再排空分发队列，确认之后没有多余的回复"""
+    assert chat.event.wait(2)
+    bot.message_dispatcher.submit(lambda: None).result(timeout=2)
+
+
+def test_commands_run_on_dispatch_thread(bot):
+    assert bot.admin_commands.executor is bot.message_dispatcher
+
+
+def test_reload_config_replies_once(bot, listeners):
+    chat = RecordingChat()
+    bot.cmd_reload_config(chat, '/更新配置', '')
+    _settle(bot, chat)
+    assert chat.sent == ['/更新配置 完成\n监听同步完成：新增 2，移除 0']
+    assert listeners == ['用户1', '群1']
+
+
+def test_enable_group_bot_replies_once(bot, listeners):
+    chat = RecordingChat()
+    bot.cmd_enable_group_bot(chat, '/开启群机器人', '')
+    _settle(bot, chat)
+    assert chat.sent == ['/开启群机器人 完成\n当前群：\n群1\n监听同步完成：新增 2，移除 0']
+
+
+def test_sync_report_runs_on_dispatch_thread(bot, listeners):
+    threads = []
+    done = threading.Event()
+
+    def on_done(result):
+        threads.append(threading.current_thread())
+        done.set()
+
+    bot.sync_wx_listeners(on_done=on_done)
+    assert done.wait(2)
+    assert threads == [bot.message_dispatcher._thread]
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""消息处理日志测试：用户消息内容只在DEBUG级别输出，不写到控制台"""
+
+import logging
+
+import pytest
+
+from benchmarks.fake_wechat import FakeChat, FriendMessage, SendLog
+from message_normalizer import MessageNormalizer
+
+SECRET = "我的银行卡密码是123456"
+
+
+@pytest.fixture
+def routed(bot, monkeypatch):
+    monkeypatch.setattr(bot, 'config', {'listen_rules': {
+        'user_rules': [{'name': '张三', 'enabled': True}],
+        'message_types_filter': {'enabled': False},
+    }})
+    monkeypatch.setattr(bot, 'cmd', '管理员')
+    monkeypatch.setattr(bot, 'message_normalizer', MessageNormalizer('dolphin'))
+    queued = []
+    monkeypatch.setattr(bot.async_message_handler, 'sync_add_message',
+                        lambda chat, message, api_config=None: queued.append(message))
+    return queued
+
+
+def _records_containing(caplog, text):
+    return [record for record in caplog.records if text in record.getMessage()]
+
+
+def test_message_body_only_logged_at_debug(bot, routed, caplog):
+    caplog.set_level(logging.DEBUG)
+    bot.process_message(FakeChat('张三', SendLog()), FriendMessage(SECRET, sender='张三'))
+    assert [envelope.content for envelope in routed] == [SECRET]
+    records = _records_containing(caplog, SECRET)
+    assert records
+    assert all(record.levelno == logging.DEBUG for record in records)
+
+
+def test_nothing_logged_about_body_at_info(bot, routed, caplog):
+    caplog.set_level(logging.INFO)
+    bot.process_message(FakeChat('张三', SendLog()), FriendMessage(SECRET, sender='张三'))
+    assert routed
+    assert _records_containing(caplog, SECRET) == []
+
+
+def test_enqueue_failure_logged_with_traceback(bot, routed, monkeypatch, caplog):
+    def fail(chat, message, api_config=None):
+        raise RuntimeError("队列已关闭")
+
+    replies = []
+    monkeypatch.setattr(bot.async_message_handler, 'sync_add_message', fail)
+    monkeypatch.setattr(bot, 'wx_send_ai_sync', lambda chat, message: replies.append(message))
+    caplog.set_level(logging.INFO)
+    bot.process_message(FakeChat('张三', SendLog()), FriendMessage(SECRET, sender='张三'))
+    assert len(replies) == 1
+    errors = [record for record in caplog.records if record.levelno >= logging.ERROR]
+    assert errors and errors[0].exc_info
+    assert _records_containing(caplog, SECRET) == []
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+长文本分段模块
+按段落、换行、句末标点（含中文标点）、空白的优先级在长度上限内寻找切分点，
+代码块（``` / ~~~）与Markdown表格不被切开（超过上限时才在其内部按行切分）；
+分段过程只计算偏移量，最后一次性切片生成各段文本
+作者：dolphi
+"""
+
+import bisect
+import re
+from typing import Iterator, List, Tuple
+
+# 代码块：从起始围栏到同样的结束围栏（未闭合时到文本末尾）
+_FENCE_RE = re.compile(r'^[ \t]*(```|~~~)[^\n]*\n.*?(?:^[ \t]*\1[ \t]*$|\Z)', re.M | re.S)
+# Markdown表格：连续的以 | 开头的行
+_TABLE_RE = re.compile(r'(?:^[ \t]*\|[^\n]*(?:\n|\Z))+', re.M)
+# 句末标点（中英文）
+_SENTENCE_ENDS = ('。', '！', '？', '；', '…', '!', '?', ';', '. ')
+_CLAUSE_ENDS = ('，', '、', '：', ', ', ': ')
+_SPACE_RE = re.compile(r'\s')
+
+
+def _protected_spans(text: str) -> List[Tuple[int, int]]:
+    """计算不应被切开的区间（代码块、表格），按起点排序且互不重叠"""
+    spans = [m.span() for m in _FENCE_RE.finditer(text)]
+    fences = list(spans)
+    for match in _TABLE_RE.finditer(text):
+        start, end = match.span()
+        # 代码块内部的 | 行不算表格
+        if not any(s <= start < e for s, e in fences):
+            spans.append((start, end))
+    spans.sort()
+    return spans
+
+
+def _rfind_any(text: str, needles, start: int, end: int) -> int:
+    """在 [start, end) 内查找任一分隔符最后出现的位置，返回分隔符之后的偏移，未找到返回-1"""
+    best = -1
+    for needle in needles:
+        index = text.rfind(needle, start, end)
+        if index != -1:
+            best = max(best, index + len(needle))
+    return best
+
+
+def _find_cut(text: str, start: int, end: int) -> int:
+    """在 (start, end] 内寻找最合适的切分点"""
+    # 切分点不宜太靠前，否则分段过碎
+    for floor, needles in ((start + (end - start) // 2, ('\n\n',)),
+                           (start + (end - start) // 2, ('\n',)),
+                           (start + (end - start) // 3, _SENTENCE_ENDS),
+                           (start + (end - start) // 3, _CLAUSE_ENDS)):
+        cut = _rfind_any(text, needles, floor, end)
+        if cut > start:
+            return cut
+    # 空白（避免切断单词、URL）
+    for index in range(end - 1, start, -1):
+        if _SPACE_RE.match(text, index):
+            return index + 1
+    return end
+
+
+def iter_segment_offsets(text: str, max_chars: int = 2000) -> Iterator[Tuple[int, int]]:
+    """
+    计算各分段在原文中的偏移
+
+    Args:
+        text: 原文
+        max_chars: 每段最大字符数
+
+    Yields:
+        (起始偏移, 结束偏移)，各段不含首尾空白，不会产生空段
+    """
+    length = len(text)
+    spans = _protected_spans(text) if ('```' in text or '~~~' in text or '|' in text) else []
+    span_starts = [s for s, _ in spans]
+    pos = 0
+    while pos < length:
+        while pos < length and text[pos].isspace():
+            pos += 1
+        if pos >= length:
+            break
+        if length - pos <= max_chars:
+            cut = length
+        else:
+            limit = pos + max_chars
+            cut = _find_cut(text, pos, limit)
+            # 切分点落在代码块/表格内部时，改为在其起点之前切分
+            index = bisect.bisect_right(span_starts, cut - 1) - 1
+            if index >= 0:
+                span_start, span_end = spans[index]
+                if span_start < cut < span_end:
+                    if span_start > pos:
+                        cut = span_start
+                    else:
+                        # 代码块/表格本身超过上限，只能在其内部按行切分
+                        line_cut = text.rfind('\n', pos, limit)
+                        cut = line_cut + 1 if line_cut > pos else limit
+        end = cut
+        while end > pos and text[end - 1].isspace():
+            end -= 1
+        if end > pos:
+            yield pos, end
+        pos = cut
+
+
+def split_text(text: str, max_chars: int = 2000) -> List[str]:
+    """
+    将长文本按自然边界切分为不超过 max_chars 字符的多段
+
+    Args:
+        text: 原文
+        max_chars: 每段最大字符数
+
+    Returns:
+        分段后的文本列表
+    """
+    if len(text) <= max_chars:
+        return [text] if text else []
+    return [text[start:end] for start, end in iter_segment_offsets(text, max_chars)]
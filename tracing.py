@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+消息链路追踪模块
+消息信封在各处理阶段记录单调时钟时间戳（监听回调、分发、入队、开始处理、内容提取、
+API调用、进入发送队列、发送完成），消息处理结束时生成一条 OpenTelemetry 兼容（OTLP JSON）的span，
+由后台线程按行写入本地文件，便于按聊天窗口、API配置统计各阶段耗时
+作者：dolphi
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 阶段顺序：相邻阶段之间的耗时记为前一阶段到后一阶段的等待/处理时间
+STAGES = ('received', 'dispatched', 'queued', 'processing', 'extracted', 'api_done', 'send_queued', 'sent')
+
+_SPAN_KIND_INTERNAL = 1
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+
+
+def _attribute(key: str, value) -> dict:
+    """OTLP JSON 属性"""
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+
+class Tracer:
+    """span 记录器（文件写入在后台线程中进行）"""
+
+    def __init__(self, path: str = "logs/traces.jsonl", enabled: bool = False, max_bytes: int = 20 * 1024 * 1024,
+                 service_name: str = "dolphin_wxbot"):
+        """
+        Args:
+            path: span 输出文件（每行一个JSON对象）
+            enabled: 是否启用（默认关闭，由配置 enable_tracing 开启）
+            max_bytes: 文件大小上限，超过时轮转为 .1 文件
+            service_name: 服务名（写入 span 的 service.name 属性）
+        """
+        self.path = path
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.service_name = service_name
+        self.spans = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: Optional[bool] = None, path: Optional[str] = None):
+        """更新配置（输出文件在下一批写入时生效）"""
+        if enabled is not None:
+            self.enabled = enabled
+        if path:
+            self.path = path
+
+    def finish(self, envelope, status: str = 'ok', **attributes):
+        """
+        消息处理结束：根据信封上的时间戳生成 span 并排队写出
+
+        Args:
+            envelope: 消息信封
+            status: 'ok' 或 'error'
+            **attributes: 附加属性（如分段数、回复长度）
+        """
+        if not self.enabled:
+            return
+        envelope.mark('finished')
+        self._queue.put(self.build_span(envelope, status, attributes))
+        self.spans += 1
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._writer, name="trace_writer", daemon=True)
+                    self._thread.start()
+
+    def build_span(self, envelope, status: str = 'ok', attributes: Optional[dict] = None) -> dict:
+        """根据消息信封生成 OTLP JSON 格式的 span"""
+        stamps = envelope.timestamps
+        # 单调时钟换算为Unix时间
+        offset = time.time() - time.monotonic()
+        start = stamps.get('received', min(stamps.values()))
+        end = stamps.get('finished', max(stamps.values()))
+
+        api_config = envelope.api_config or {}
+        attrs = [
+            _attribute('service.name', self.service_name),
+            _attribute('wx.message_id', envelope.message_id),
+            _attribute('wx.chat', envelope.chat_key),
+            _attribute('wx.route', envelope.route),
+            _attribute('wx.message_type', envelope.type),
+            _attribute('wx.api_config.id', api_config.get('id', '')),
+            _attribute('wx.api_config.name', api_config.get('name', '')),
+            _attribute('wx.api_config.platform', api_config.get('platform', '')),
+            _attribute('wx.duration_ms', round((end - start) * 1000, 1)),
+        ]
+        # 相邻阶段之间的耗时
+        previous = None
+        for stage in STAGES:
+            if stage not in stamps:
+                continue
+            if previous is not None:
+                attrs.append(_attribute(f'wx.stage.{previous}_to_{stage}_ms',
+                                        round((stamps[stage] - stamps[previous]) * 1000, 1)))
+            previous = stage
+        for key, value in (attributes or {}).items():
+            attrs.append(_attribute(f'wx.{key}', value))
+
+        events = [
+            {'timeUnixNano': str(int((timestamp + offset) * 1e9)), 'name': stage}
+            for stage, timestamp in sorted(stamps.items(), key=lambda item: item[1])
+        ]
+        trace_id = f"{envelope.seq:016x}{int(envelope.created_at * 1e6) & (2 ** 64 - 1):016x}"
+        return {
+            'traceId': trace_id,
+            'spanId': f"{envelope.seq:016x}",
+            'name': f"wx.message.{envelope.route}",
+            'kind': _SPAN_KIND_INTERNAL,
+            'startTimeUnixNano': str(int((start + offset) * 1e9)),
+            'endTimeUnixNano': str(int((end + offset) * 1e9)),
+            'attributes': attrs,
+            'events': events,
+            'status': {'code': _STATUS_OK if status == 'ok' else _STATUS_ERROR},
+        }
+
+    def _writer(self):
+        """后台线程：批量写出 span"""
+        while True:
+            spans = [self._queue.get()]
+            try:
+                while len(spans) < 200:
+                    spans.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            try:
+                path = self.path
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                if self.max_bytes and os.path.exists(path) and os.path.getsize(path) >= self.max_bytes:
+                    os.replace(path, path + ".1")
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write("".join(json.dumps(span, ensure_ascii=False, separators=(',', ':')) + "\n"
+                                    for span in spans))
+            except Exception as e:
+                logger.warning(f"写入追踪数据失败: {e}")
+
+
+# 全局追踪器
+tracer = Tracer()
@@ -5,17 +5,24 @@
 ver = "V2.0.0"         # 当前版本
 ver_log = "日志：全新版本2.0，支持最新wxauto V2"    # 日志
 import time
-import json
-import re
 import traceback
-import email_send
-import win32clipboard
-import win32con
-from openai import OpenAI
+import logging
+import threading
 from datetime import datetime, timedelta
 from wxauto import WeChat
 from wxauto.msgs import (FriendMessage, SystemMessage)
 import async_message_handler
+from listener_manager import ListenerReconciler
+from admin_commands import CommandRegistry
+from message_normalizer import MessageNormalizer
+from message_envelope import MessageEnvelope
+from link_fetcher import extract_url
+from rpa_executor import RPAChat, SerialTaskExecutor, rpa, unwrap_chat
+from text_segmenter import split_text
+from logging_setup import setup_logging, set_level
+from startup_timing import startup
+from config_store import config_store
+# 说明：openai、email_send（导入时读取email.txt）、win32clipboard 等较重或可选的模块在首次使用时才导入，缩短启动时间
 
 # -------------------------------
 # 配置相关
@@ -30,6 +37,7 @@ listen_list = []    # 监听的用户列表
 api_key = ""        # API 密钥
 base_url = ""       # API 基础 URL
 AtMe = ""           # 机器人@的标识
+message_normalizer = MessageNormalizer()  # 消息内容规范化器（登录后按机器人昵称重建）
 bot_name = ""       # 机器人名字
 cmd = ""            # 命令接收账号（管理员）
 group = []          # 群聊ID
@@ -43,17 +51,19 @@ model4 = ""         # 模型4标识
 prompt = ""         # AI提示词
 # 当前使用的模型和 API 客户端
 DS_NOW_MOD = ""
-client = None
+client = None       # OpenAI 客户端（首次调用时由 get_openai_client 创建）
+
+logger = logging.getLogger(__name__)
 
 def is_err(id, err="无"):
     '''错误中断并发送邮件 
     id：邮件主题
     err:错误信息'''
-    print(traceback.format_exc())
-    print(err)
+    logger.exception("程序出错（%s）: %s", id, err)
+    import email_send
     email_send.send_email(subject=id, content='错误信息：\n'+traceback.format_exc()+"\nerr信息：\n"+str(err))
     while True:
-        print("程序已保护现场，检查后请重启程序")
+        logger.error("程序已保护现场，检查后请重启程序")
         time.sleep(100)
 def now_time(time="%Y/%m/%d %H:%M:%S "):
     # 获取当前时间
@@ -72,11 +82,11 @@ def load_config():
     """
     global config
     try:
-        with open(CONFIG_FILE, 'r', encoding='utf-8') as file:
-            config = json.load(file)
-            print("配置文件加载成功")
+        # 经配置存储读取：刚保存但尚未写盘的配置同样能读到
+        config = config_store.load()
+        logger.info("配置文件加载成功")
     except Exception as e:
-        print("打开配置文件失败，请检查配置文件！", e)
+        logger.error("打开配置文件失败，请检查配置文件！%s", e)
         while True:
             time.sleep(100)
 
@@ -156,18 +166,22 @@ def update_global_config():
     global enable_link_url_copy
     enable_link_url_copy = config.get('enable_link_url_copy', False)
     
-    # 初始化 OpenAI 客户端
-    if api_key and base_url:
-        client = OpenAI(api_key=api_key, base_url=base_url)
-    else:
-        print("警告: 未找到有效的API配置，客户端初始化可能失败")
-        client = None
-    
-    print(now_time()+"全局配置更新完成")
-    print(f"监听用户: {listen_list}")
-    print(f"监听群组: {group}")
-    print(f"群机器人开关: {group_switch}")
-    print(f"默认API: {default_api_config.get('name', '未配置') if default_api_config else '未配置'}")
+    # 日志级别（DEBUG 时输出消息明细、请求内容等调试信息）
+    set_level(config.get('log_level', 'INFO'))
+
+    # 同步异步消息处理器的配置（OCR、下载目录等）
+    async_message_handler.async_handler.apply_config(config)
+
+    # OpenAI 客户端在首次调用时按新配置重新创建
+    client = None
+    if not (api_key and base_url):
+        logger.warning("未找到有效的API配置，客户端初始化可能失败")
+
+    logger.info("全局配置更新完成")
+    logger.info("监听用户: %s", listen_list)
+    logger.info("监听群组: %s", group)
+    logger.info("群机器人开关: %s", group_switch)
+    logger.info("默认API: %s", default_api_config.get('name', '未配置') if default_api_config else '未配置')
 
 
 def refresh_config():
@@ -180,13 +194,12 @@ def refresh_config():
 
 def save_config():
     """
-    将当前的配置写回到配置文件
+    将当前的配置写回到配置文件（由配置存储在后台合并、原子写入）
     """
     try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as file:  # 写入配置文件
-            json.dump(config, file, ensure_ascii=False, indent=4)  # 保留中文原格式 
+        config_store.save(config)
     except Exception as e:  # 异常处理
-        print("保存配置文件失败:", e)  # 显示错误信息   
+        logger.error("保存配置文件失败: %s", e)
 
 
 def add_user(name):
@@ -197,9 +210,9 @@ def add_user(name):
         config['监听用户列表'].append(name)  # 添加用户到监听列表
         save_config()  # 保存配置
         refresh_config()  # 刷新配置
-        print("添加后的  监听用户列表:", config['监听用户列表'])  # 显示添加后的列表
+        logger.info("添加后的监听用户列表: %s", config['监听用户列表'])
     else:
-        print(f"用户 {name} 已在监听列表中")  # 显示用户已存在  
+        logger.info("用户 %s 已在监听列表中", name)
 
 
 def remove_user(name):
@@ -210,9 +223,9 @@ def remove_user(name):
         config['监听用户列表'].remove(name)  # 从列表中删除用户
         save_config()  # 保存配置
         refresh_config()  # 刷新配置
-        print("删除后的 监听用户列表:", config['监听用户列表'])  # 显示删除后的列表
+        logger.info("删除后的监听用户列表: %s", config['监听用户列表'])
     else:
-        print(f"用户 {name} 不在监听列表中")
+        logger.info("用户 %s 不在监听列表中", name)
 
 
 def set_group(new_group):
@@ -222,7 +235,7 @@ def set_group(new_group):
     config['监听群组列表'] = new_group  # 更新群聊ID
     save_config()  # 保存配置
     refresh_config()  # 刷新配置
-    print("群组已更改为", config['监听群组列表'])  # 显示更新后的群聊ID
+    logger.info("群组已更改为: %s", config['监听群组列表'])
 
 def add_group(name):
     """
@@ -232,9 +245,9 @@ def add_group(name):
         config['监听群组列表'].append(name)  # 添加用户到监听列表
         save_config()  # 保存配置
         refresh_config()  # 刷新配置
-        print("添加后的  监听群组列表:", config['监听群组列表'])  # 显示添加后的列表
+        logger.info("添加后的监听群组列表: %s", config['监听群组列表'])
     else:
-        print(f"群组 {name} 已在监听列表中")  # 显示用户已存在  
+        logger.info("群组 %s 已在监听列表中", name)
 def remove_group(name):
     """
     删除群组从监听列表，并更新配置
@@ -243,9 +256,9 @@ def remove_group(name):
         config['监听群组列表'].remove(name)  # 从列表中删除用户
         save_config()  # 保存配置
         refresh_config()  # 刷新配置
-        print("删除后的 监听群组列表:", config['监听群组列表'])  # 显示删除后的列表
+        logger.info("删除后的监听群组列表: %s", config['监听群组列表'])
     else:
-        print(f"群组 {name} 不在监听列表中")
+        logger.info("群组 %s 不在监听列表中", name)
 
 def set_group_switch(switch_value):
     """
@@ -254,7 +267,7 @@ def set_group_switch(switch_value):
     config['群机器人开关'] = switch_value  # 更新群机器人开关状态
     save_config()  # 保存配置       
     refresh_config()  # 刷新配置
-    print("群开关设置为", config['群机器人开关'])  # 显示更新后的开关状态
+    logger.info("群开关设置为: %s", config['群机器人开关'])
 def set_config(id, new_content):
     """
     更改配置
@@ -264,7 +277,9 @@ def set_config(id, new_content):
     config[id] = new_content  # 更新
     save_config()  # 保存配置
     refresh_config()  # 刷新配置
-    print(now_time()+id+"已更改为:", config[id])  # 显示更新后的
+    # 配置值可能是AI设定等长文本，只在DEBUG级别输出
+    logger.info("配置项 %s 已更改", id)
+    logger.debug("%s 已更改为: %s", id, config[id])
 
 def extract_info_from_control(message) -> str:
     """
@@ -283,7 +298,7 @@ def extract_info_from_control(message) -> str:
             if hasattr(message.control, 'Name') and message.control.Name:
                 return message.control.Name.strip()
     except Exception as e:
-        print(f"[ERROR] 从 control 对象提取信息失败: {e}")
+        logger.error("从 control 对象提取信息失败: %s", e)
     return ""
 
 def get_message_type_from_content(content):
@@ -327,12 +342,18 @@ def is_message_type_allowed(message_type):
         return message_type in allowed_types
 
     except Exception as e:
-        print(f"[WARNING] 检查消息类型过滤配置失败: {e}")
+        logger.warning("检查消息类型过滤配置失败: %s", e)
         # 出错时默认允许处理
         return True
 
-def preprocess_message_content(message):
-    """预处理消息内容，根据消息内容识别特殊类型并格式化"""
+def preprocess_message_content(message, link_url=None):
+    """
+    预处理消息内容，根据消息内容识别特殊类型并格式化
+
+    Args:
+        message: 消息对象
+        link_url: 链接消息的URL（由 process_message 预先在RPA线程中获取，空字符串表示未取到）
+    """
     content = message.content
 
     # 判断消息类型
@@ -340,26 +361,24 @@ def preprocess_message_content(message):
 
     # 检查是否允许处理此类型的消息
     if not is_message_type_allowed(message_type):
-        print(f"[INFO] 消息类型 '{message_type}' 不在允许处理列表中，跳过处理")
+        logger.debug("消息类型 '%s' 不在允许处理列表中，跳过处理", message_type)
         return None  # 返回None表示不处理此消息
 
-    print(f"[INFO] 处理消息类型: {message_type}")
+    logger.debug("处理消息类型: %s", message_type)
 
     if content == "[链接]":
-        # 检查是否启用了通过UI交互获取URL的功能
-        title = "未知链接"
-        url = "无法获取URL"
-        if enable_link_url_copy:
-            copied_url = try_copy_link_url_via_ui(message)
-            if copied_url:
-                url = copied_url
+        # 优先从消息本身获取URL，网页正文由异步处理器抓取，不阻塞回调
+        title = extract_info_from_control(message)
+        if not title or title == content:
+            title = "未知链接"
+        url = link_url
 
-        return f"用户分享了一个链接：\n标题：{title}\nURL：{url}\n\n请根据这个链接内容进行回复。"
+        return f"用户分享了一个链接：\n标题：{title}\nURL：{url or '无法获取URL'}\n\n请根据这个链接内容进行回复。"
 
     elif content == "[位置]":
         location_name = extract_info_from_control(message)
         if location_name:
-            print(f"[INFO] 提取到位置名称: {location_name}")
+            logger.debug("提取到位置名称: %s", location_name)
             return f"用户分享了一个位置：\n名称：{location_name}\n\n请根据这个位置信息进行回复。"
         else:
             return "用户分享了一个位置，但无法获取其名称。"
@@ -382,13 +401,70 @@ def get_clipboard_text():
     """获取剪贴板中的文本内容"""
     text = ""
     try:
+        import win32clipboard
+        import win32con
         win32clipboard.OpenClipboard()
         text = win32clipboard.GetClipboardData(win32con.CF_UNICODETEXT)
         win32clipboard.CloseClipboard()
     except Exception as e:
-        print(f"[ERROR] 读取剪贴板失败: {e}")
+        logger.error("读取剪贴板失败: %s", e)
     return text
 
+def needs_link_url(message) -> bool:
+    """需要处理的链接消息返回True（获取URL需访问微信界面，先在RPA线程中获取）"""
+    return message.content == "[链接]" and is_message_type_allowed(get_message_type_from_content(message.content))
+
+
+def resolve_link_url(message) -> str:
+    """
+    获取链接URL（在RPA线程中调用）：先从消息本身读取（get_url()、info、控件值），
+    取不到且启用了UI复制时再模拟右键复制，仍取不到时返回空字符串
+    """
+    url = extract_url(message)
+    if not url and enable_link_url_copy:
+        url = try_copy_link_url_via_ui(message)
+    return url or ""
+
+
+def resolve_link_url_then_process(chat, message, received_at=None):
+    """
+    在RPA线程中获取链接URL（与其他UI操作串行执行），完成后将消息连同URL重新放入分发队列处理，
+    分发线程不等待，其他消息照常处理；URL只获取一次，后续各环节复用
+    """
+    def on_resolved(future):
+        try:
+            url = future.result() or ""
+        except Exception as e:
+            logger.warning("获取链接URL未完成: %s", e)
+            url = ""
+        message_dispatcher.submit(process_message, chat, message, received_at, url, name="dispatch_message")
+
+    rpa.submit(resolve_link_url, message, name="resolve_link_url", timeout=None).add_done_callback(on_resolved)
+
+
+def needs_voice_transcript(message) -> bool:
+    """需要处理的语音消息返回True（先转文字，再按文字内容路由）"""
+    is_voice = getattr(message, 'type', None) == 'voice' or message.content == "[语音]"
+    return is_voice and is_message_type_allowed("voice")
+
+
+def transcribe_voice_then_process(chat, message, received_at=None):
+    """
+    在异步处理器的事件循环中进行语音转文字（本地识别或微信自带转文字），完成后将消息连同转写结果
+    重新放入分发队列处理，使路由、@判断与接口选择都基于文字内容；转写失败时按原语音消息处理
+    """
+    def on_transcribed(future):
+        try:
+            transcript = future.result() or ""
+        except Exception as e:
+            logger.warning("语音转文字未完成: %s", e)
+            transcript = ""
+        message_dispatcher.submit(process_message, chat, message, received_at, transcript=transcript,
+                                  name="dispatch_message")
+
+    async_message_handler.async_handler.transcribe_voice(message).add_done_callback(on_transcribed)
+
+
 def try_copy_link_url_via_ui(message) -> str:
     """
     尝试通过模拟UI交互（右键->复制链接）来获取链接的URL。
@@ -398,7 +474,7 @@ def try_copy_link_url_via_ui(message) -> str:
         return None
 
     try:
-        print("[INFO] 尝试通过UI交互复制链接URL...")
+        logger.info("尝试通过UI交互复制链接URL...")
         # 1. 右键点击消息控件
         message.control.RightClick()
         time.sleep(0.5)  # 等待菜单弹出
@@ -413,24 +489,25 @@ def try_copy_link_url_via_ui(message) -> str:
             for option in copy_options:
                 menu_item = menu.GetMenuItemControl(Name=option)
                 if menu_item:
-                    print(f"[INFO] 找到菜单项 '{option}' 并点击")
+                    logger.debug("找到菜单项 '%s' 并点击", option)
                     menu_item.Click()
                     time.sleep(0.5) # 等待剪贴板更新
 
                     # 3. 从剪贴板读取URL
                     clipboard_content = get_clipboard_text()
                     if clipboard_content and clipboard_content.startswith('http'):
-                        print(f"[INFO] 成功从剪贴板获取URL: {clipboard_content}")
+                        logger.debug("成功从剪贴板获取URL: %s", clipboard_content)
                         return clipboard_content
                     else:
-                        print(f"[WARNING] 点击了'{option}'，但剪贴板内容不是有效URL: {clipboard_content}")
+                        logger.warning("点击了'%s'，但剪贴板内容不是有效URL", option)
+                        logger.debug("剪贴板内容: %s", clipboard_content)
                 else:
-                    print(f"[DEBUG] 未找到菜单项: {option}")
+                    logger.debug("未找到菜单项: %s", option)
         else:
-            print("[WARNING] 未找到弹出的右键菜单")
+            logger.warning("未找到弹出的右键菜单")
 
     except Exception as e:
-        print(f"[ERROR] UI交互复制链接失败: {e}")
+        logger.error("UI交互复制链接失败: %s", e)
         # 确保菜单被关闭，避免干扰
         try:
             wx.UiaAPI.GetRootControl().SendKeys('{ESC}')
@@ -439,9 +516,8 @@ def try_copy_link_url_via_ui(message) -> str:
     return None
 
 def split_long_text(text, chunk_size=2000):
-    # 使用range生成切割起始位置序列：0, chunk_size, 2*chunk_size...
-    # 通过列表推导式循环截取每个分段
-    return [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
+    # 按段落、句子等自然边界分段，代码块和表格保持完整
+    return split_text(text, chunk_size)
 
 
 
@@ -449,6 +525,15 @@ def split_long_text(text, chunk_size=2000):
 # DeepSeek API 调用
 # -------------------------------
 
+def get_openai_client():
+    """获取 OpenAI 客户端（首次调用时导入 openai 并按当前配置创建）"""
+    global client
+    if client is None and api_key and base_url:
+        from openai import OpenAI
+        client = OpenAI(api_key=api_key, base_url=base_url)
+    return client
+
+
 def deepseek_chat(message, model, stream, prompt):
     """
     调用 DeepSeek API 获取对话回复
@@ -462,7 +547,7 @@ def deepseek_chat(message, model, stream, prompt):
         str: AI 返回的回复
     """
     try:
-        response = client.chat.completions.create(
+        response = get_openai_client().chat.completions.create(
             model=model,
             messages=[
                 {"role": "system", "content": prompt},
@@ -471,7 +556,7 @@ def deepseek_chat(message, model, stream, prompt):
             stream=stream
         )
     except Exception as e:
-        print("调用 DeepSeek API 出错:", e)
+        logger.error("调用 DeepSeek API 出错: %s", e)
         raise
 
     # 流式输出处理
@@ -481,30 +566,28 @@ def deepseek_chat(message, model, stream, prompt):
         for chunk in response: 
             if hasattr(chunk.choices[0].delta, 'reasoning_content') and chunk.choices[0].delta.reasoning_content: # 判断是否为思维链
                 chunk_message = chunk.choices[0].delta.reasoning_content # 获取思维链
-                print(chunk_message, end="", flush=True)  # 打印思维链
                 if chunk_message:
                     reasoning_content += chunk_message  # 累加思维链
             else:
                 chunk_message = chunk.choices[0].delta.content # 获取回复
-                print(chunk_message, end="", flush=True)  # 打印回复
                 if chunk_message: 
                     content += chunk_message  # 累加回复
-                
-        print("\n")
+
+        # 思维链与回复内容只在DEBUG级别输出
+        logger.debug("思维链: %s", reasoning_content)
+        logger.debug("回复: %s", content)
         return content.strip()  # 返回回复内容
 
         full_response = ""
         for chunk in response:
             chunk_message = chunk.choices[0].delta.content
-            print(chunk_message, end='', flush=True)
             if chunk_message:
-                # print(chunk_message, end='', flush=True)
                 full_response += chunk_message
-        print("\n")
+        logger.debug("回复: %s", full_response)
         return full_response.strip()
     else:
         output = response.choices[0].message.content  # 获取回复内容
-        print(output)  # 打印回复
+        logger.debug("回复: %s", output)
         return output  # 返回回复内容
 
 
@@ -519,95 +602,206 @@ wx = None
 def safe_add_listen(nickname: str, retries: int = 3, delay: float = 1.5) -> bool:
     """
     安全添加监听：对 wx.AddListenChat 进行重试，避免微信UI未就绪导致的 LookupError。
+    监听器同步时每个窗口只尝试一次（retries=1），失败的窗口由 ListenerReconciler 在后台退避重试
     """
     for attempt in range(1, retries + 1):
         try:
             wx.AddListenChat(nickname=nickname, callback=message_handle_callback)
-            print(f"添加监听成功: {nickname}")
+            logger.info("添加监听成功: %s", nickname)
             return True
         except LookupError as e:
             # 常见报错: Find Control Timeout: IDS_FAV_SEARCH_RESULT ListControl
-            print(
-                f"AddListenChat 失败({attempt}/{retries}): {e}\n"
+            logger.warning(
+                "AddListenChat 失败(%s/%s): %s\n"
                 "提示: 请确保微信 Windows 客户端已登录，主界面处于前台且会话列表可见；"
-                "不要最小化微信窗口。稍后将自动重试..."
+                "不要最小化微信窗口。稍后将自动重试...", attempt, retries, e
             )
             try:
                 # 尝试重新启动监听，以触发UI刷新
                 wx.StartListening()
             except Exception:
                 pass
-            time.sleep(delay)
         except Exception as e:
-            print(f"AddListenChat 异常({attempt}/{retries}): {e}，稍后重试...")
+            logger.warning("AddListenChat 异常(%s/%s): %s", attempt, retries, e)
+        if attempt < retries:
             time.sleep(delay)
-    print(f"添加监听失败（已重试 {retries} 次）: {nickname}")
+    logger.warning("添加监听失败（已尝试 %s 次）: %s", retries, nickname)
     return False
 
 
-def init_wx_listeners():
+def remove_listen(nickname: str):
+    """移除监听窗口"""
+    wx.RemoveListenChat(nickname)
+    logger.info("移除监听成功: %s", nickname)
+
+
+# 监听器增量同步器（在 init_wx_listeners 中初始化）
+listener_reconciler = None
+# 记录曾经成功注册过的监听窗口，下次启动时优先注册
+LISTENER_STATE_FILE = 'listener_state.json'
+
+
+def _schedule_listen_retry(func, delay: float):
+    """监听注册失败后的后台重试提交到RPA执行器，与发送消息等UI操作串行执行"""
+    rpa.submit(func, name="listen_retry", delay=delay, timeout=None)
+
+
+def _rpa_add_listen(nickname: str) -> bool:
+    """在RPA线程中添加监听（只尝试一次），与发送消息等UI操作串行执行"""
+    return rpa.call(safe_add_listen, nickname, 1, name=f"add_listen:{nickname}", timeout=None)
+
+
+def _rpa_remove_listen(nickname: str):
+    """在RPA线程中移除监听"""
+    rpa.call(remove_listen, nickname, name=f"remove_listen:{nickname}", timeout=None)
+
+
+def get_listener_status() -> dict:
     """
-    初始化微信监听器，根据新版 listen_rules 配置添加监听用户和群聊
+    监听窗口就绪状态（供图形界面展示）
+
+    返回:
+        {'summary': {'total', 'ready', 'pending', 'retrying', 'failed'}, 'chats': {窗口名: 状态}}，
+        监听器尚未初始化时返回 None
     """
-    global wx, AtMe
-    if not wx:
-        print("本次未获取客户端，正在初始化微信客户端...")
-        wx = WeChat()
+    if listener_reconciler is None:
+        return None
+    return {'summary': listener_reconciler.summary(), 'chats': listener_reconciler.get_readiness()}
 
-    AtMe = "@"+wx.nickname # 绑定AtMe
-    print('启动wxautox监听器...')
-    wx.StartListening() # 启动监听器
-    
-    # 添加管理员监听（带重试）
+
+def get_desired_listeners(include_groups: bool = True) -> list:
+    """
+    根据新版 listen_rules 配置计算期望的监听窗口列表（管理员、用户、群组）
+
+    参数:
+        include_groups (bool): 是否包含群组监听
+    """
+    desired = []
     if cmd:
-        if safe_add_listen(cmd):
-            print(f"添加管理员监听完成: {cmd}")
-    
+        desired.append(cmd)
+
     # 获取新版监听规则配置
     listen_rules = config.get('listen_rules', {})
-    
+
     # 添加用户监听（仅启用的用户）
     user_rules = listen_rules.get('user_rules', [])
     enabled_users = [rule['name'] for rule in user_rules if rule.get('enabled', True)]
-    
+
     # 如果新版配置为空，回退到旧版配置
     if not enabled_users:
         enabled_users = listen_list
-    
+
     for user in enabled_users:
         if user and user != cmd:  # 避免重复添加管理员
-            if safe_add_listen(user):
-                print(f"添加用户监听: {user}")
-    
+            desired.append(user)
+
     # 添加群组监听（检查全局开关和各群组启用状态）
     global_bot_enabled = listen_rules.get('global_bot_enabled', True)
-    if global_bot_enabled:
+    if include_groups and global_bot_enabled:
         group_rules = listen_rules.get('group_rules', [])
         enabled_groups = [rule['name'] for rule in group_rules if rule.get('enabled', True)]
-        
+
         # 如果新版配置为空，回退到旧版配置
         if not enabled_groups and group_switch == "True":
             enabled_groups = group
-        
-        for group_name in enabled_groups:
-            if group_name:
-                if safe_add_listen(group_name):
-                    print(f"添加群组监听: {group_name}")
-        
-        if enabled_groups:
-            print(f"群组监听设置完成，共 {len(enabled_groups)} 个群组")
-    else:
-        print("全局群机器人开关已关闭，跳过群组监听")
-    
-    print(f"监听器初始化完成 - 用户: {len(enabled_users)}, 群组: {len([rule for rule in listen_rules.get('group_rules', []) if rule.get('enabled', True)]) if global_bot_enabled else 0}")
+
+        desired.extend(group_name for group_name in enabled_groups if group_name)
+
+    return desired
+
+
+def init_wx_listeners():
+    """
+    初始化微信监听器，根据新版 listen_rules 配置添加监听用户和群聊
+    仅在启动时全量执行，运行中的配置变更请使用 sync_wx_listeners 增量同步
+
+    返回:
+        同步结果 {'added', 'removed', 'failed'}
+    """
+    global wx, AtMe, listener_reconciler, message_normalizer
+    if not wx:
+        logger.info("本次未获取客户端，正在初始化微信客户端...")
+        wx = WeChat()
+
+    AtMe = "@"+wx.nickname # 绑定AtMe
+    message_normalizer = MessageNormalizer(wx.nickname) # 每次登录构建一次
+    logger.info("启动wxautox监听器...")
+    wx.StartListening() # 启动监听器
+
+    if listener_reconciler is None:
+        listener_reconciler = ListenerReconciler(_rpa_add_listen, _rpa_remove_listen,
+                                                 log_func=logger.info, retry_scheduler=_schedule_listen_retry,
+                                                 state_file=LISTENER_STATE_FILE)
+    # 以微信客户端实际的监听列表为准（若可获取）
+    current_listen = getattr(wx, 'listen', None)
+    listener_reconciler.reset(current_listen.keys() if isinstance(current_listen, dict) else ())
+
+    result = listener_reconciler.reconcile(get_desired_listeners())
+    if cmd and cmd in listener_reconciler.registered:
+        logger.info("添加管理员监听完成: %s", cmd)
+
+    listen_rules = config.get('listen_rules', {})
+    if not listen_rules.get('global_bot_enabled', True):
+        logger.info("全局群机器人开关已关闭，跳过群组监听")
+    logger.info("监听器初始化完成 - 已监听: %s, 失败: %s%s", len(listener_reconciler.registered), len(result['failed']),
+                f"（后台重试中: {', '.join(result['failed'])}）" if result['failed'] else "")
+    return result
+
+
+def sync_wx_listeners(chat=None, include_groups: bool = True, on_done=None):
+    """
+    后台增量同步监听器：只添加/移除与当前配置不一致的监听窗口，不阻塞消息处理
+
+    参数:
+        chat: 用于汇报同步结果的会话对象（可选）
+        include_groups (bool): 是否包含群组监听
+        on_done: 同步完成回调 on_done(result)，提供时由回调负责汇报结果；
+            回调在消息分发线程中执行，可与管理员指令一样修改配置而不与消息处理并发
+    """
+    def report(result):
+        if on_done:
+            on_done(result)
+        elif chat:
+            chat.SendMsg(format_sync_result(result))
+
+    if not wx or listener_reconciler is None:
+        report(init_wx_listeners())
+        return
+
+    def on_progress(done, total, name, ok):
+        logger.info("监听同步进度 %s/%s: %s %s", done, total, name, '成功' if ok else '失败')
+
+    def on_synced(result):
+        message_dispatcher.submit(report, result, name="listener_sync_report")
+
+    listener_reconciler.reconcile_async(get_desired_listeners(include_groups), on_progress, on_synced)
+
+
+def format_sync_result(result) -> str:
+    """监听同步结果的汇报文本"""
+    text = f"监听同步完成：新增 {len(result['added'])}，移除 {len(result['removed'])}"
+    if result['failed']:
+        text += "\n失败：" + ", ".join(result['failed'])
+    return text
+
+
+# 消息分发线程：监听回调只负责入队，消息在该线程中按到达顺序处理
+message_dispatcher = SerialTaskExecutor("msg_dispatch", default_timeout=None)
+
+
 def message_handle_callback(msg, chat):
-    """消息处理回调"""
-    text = datetime.now().strftime("%Y/%m/%d %H:%M:%S ") + f'类型：{msg.type} 属性：{msg.attr} 窗口：{chat.who} 发送人：{msg.sender_remark} - 消息：{msg.content}'
-    print(text)
+    """消息处理回调：只将消息放入分发队列后立即返回，不阻塞wxauto监听线程"""
+    message_dispatcher.submit(dispatch_message, msg, chat, time.monotonic(), name="dispatch_message")
 
 
+def dispatch_message(msg, chat, received_at=None):
+    """在分发线程中处理单条消息，聊天窗口的UI操作提交到RPA执行器串行执行"""
+    logger.debug("类型：%s 属性：%s 窗口：%s 发送人：%s - 消息：%s",
+                 msg.type, msg.attr, chat.who, msg.sender_remark, msg.content)
+
+    chat = RPAChat(chat)
     if isinstance(msg, FriendMessage): # 好友群友的消息
-        process_message(chat, msg)
+        process_message(chat, msg, received_at)
     elif isinstance(msg, SystemMessage): # 系统的消息
         if group_welcome: # 群新人欢迎语开关
             send_group_welcome_msg(chat, msg) # 获取子窗口对象与消息对象送入处理
@@ -674,7 +868,7 @@ def get_api_config_for_chat(chat_who):
         }
         
     except Exception as e:
-        print(f"获取API配置失败: {e}")
+        logger.error("获取API配置失败: %s", e)
         # 返回兼容配置
         return {
             'id': 'fallback',
@@ -691,26 +885,29 @@ def wx_send_ai(chat, message):
     """
     异步AI消息处理（新版本）
     使用异步消息队列处理，支持并发和详细日志
+
+    参数:
+        chat: 消息所属的会话对象
+        message: MessageEnvelope 消息信封
     """
     try:
-        # 获取对应的API配置
+        # 获取对应的API配置（路由决策记录在消息信封上）
         api_config = get_api_config_for_chat(chat.who)
+        message.api_config = api_config
         
-        # 记录消息接收日志
-        #print(f"{now_time()}[异步处理] 收到消息 - 窗口: {chat.who}, 内容: {message.content[:100]}")
-        print(f"{now_time()}[异步处理] 收到消息 - 窗口: {chat.who}, 内容: {message}")
-        print(f"{now_time()}[异步处理] 使用API配置: {api_config.get('name', 'Unknown')} ({api_config.get('id', 'Unknown')})")
-        
+        # 记录消息接收日志（消息内容只在DEBUG级别输出）
+        logger.debug("[异步处理] 收到消息 - 窗口: %s, 类型: %s, 路由: %s, 内容: %s",
+                     chat.who, message.type, message.route, message.content[:100])
+        logger.debug("[异步处理] 使用API配置: %s (%s)", api_config.get('name', 'Unknown'), api_config.get('id', 'Unknown'))
+
         # 发送到异步处理队列
-        
         async_message_handler.sync_add_message(chat, message, api_config)
         
         # 可选：立即回复处理状态（避免用户等待焦虑）
         # chat.SendMsg("收到消息，正在为您处理...")
         
     except Exception as e:
-        print(f"{now_time()}[错误] 异步处理失败: {e}")
-        print(traceback.format_exc())
+        logger.exception("[异步处理] 加入处理队列失败，改为同步处理: %s", e)
         # 降级到同步处理
         wx_send_ai_sync(chat, message)
 
@@ -724,14 +921,13 @@ def wx_send_ai_sync(chat, message):
     try:
         reply = deepseek_chat(message.content, DS_NOW_MOD, stream=True, prompt=prompt)
     except Exception:
-        print(traceback.format_exc())
+        logger.exception("同步调用接口失败")
         reply = "API返回错误，请稍后再试"
             
     if len(reply) >= 2000:
         segments = split_long_text(reply)
         # 处理分段后的内容
         for index, segment in enumerate(segments, 1):
-            # print(f"第 {index} 段内容（{len(segment)} 字符）: {segment}")
             reply_ = segment
             chat.SendMsg(reply_)
     else:
@@ -747,53 +943,269 @@ def find_new_group_friend(msg, flag):
         first_quote_content = text.split('"')[flag]
     except:
         first_quote_content = text.split('"')[1]
-    # print("新人:", first_quote_content)  # 输出: Gary10
     return first_quote_content
 def send_group_welcome_msg(chat, message):
     '''
     监听群组欢迎新人
     '''
-    print(now_time()+f"{chat.who} 系统消息:", message.content)
+    logger.debug("%s 系统消息: %s", chat.who, message.content)
     if "加入群聊" in message.content:
         new_friend = find_new_group_friend(message.content, 1) # 扫码加入
-        print(f"{chat.who} 新群友:", new_friend)
-        time.sleep(2) # 等待2秒微信刷新
-        chat.SendMsg(msg=group_welcome_msg, at=new_friend)
+        logger.info("%s 新群友加入", chat.who)
+        logger.debug("%s 新群友: %s", chat.who, new_friend)
+        # 等待2秒微信刷新后发送，延迟期间不占用RPA线程
+        rpa.submit(unwrap_chat(chat).SendMsg, msg=group_welcome_msg, at=new_friend, name="group_welcome", delay=2, timeout=60)
     elif "加入了群聊" in message.content:
         new_friend = find_new_group_friend(message.content, 3) # 个人邀请
-        print(f"{chat.who} 新群友:", new_friend)
-        time.sleep(2) # 等待2秒微信刷新
-        chat.SendMsg(msg=group_welcome_msg, at=new_friend)
+        logger.info("%s 新群友加入", chat.who)
+        logger.debug("%s 新群友: %s", chat.who, new_friend)
+        rpa.submit(unwrap_chat(chat).SendMsg, msg=group_welcome_msg, at=new_friend, name="group_welcome", delay=2, timeout=60)
     return
-def process_message(chat, message):
+# -------------------------------
+# 管理员指令
+# -------------------------------
+
+# 管理员指令注册表：指令提交到消息分发线程，排在当前消息之后执行，
+# 修改监听列表、群开关和配置时不与消息处理并发，也不阻塞消息回调
+admin_commands = CommandRegistry(executor=message_dispatcher)
+
+
+@admin_commands.command("/当前用户", help="(返回当前监听用户列表)")
+def cmd_current_users(chat, content, arg):
+    chat.SendMsg(content + '\n' + ", ".join(listen_list))
+
+
+@admin_commands.command("/添加用户", help="（将用户***添加进监听列表）", exact=False)
+def cmd_add_user(chat, content, arg):
+    fail_text = ' 失败\n请检查添加的用户是否为好友或者备注是否正确或者备注名 昵称中是否含有非法中文字符\n当前用户：\n'
+
+    def on_user_added(result):
+        if arg in result['failed']:
+            remove_user(arg)
+            listener_reconciler.forget(arg)  # 已回滚配置，不再后台重试
+            chat.SendMsg(content + fail_text + ", ".join(listen_list))
+        else:
+            chat.SendMsg(content + ' 完成\n' + ", ".join(listen_list))
+    try:
+        add_user(arg)
+        sync_wx_listeners(chat, on_done=on_user_added)
+    except:
+        logger.exception("添加监听用户失败: %s", arg)
+        remove_user(arg)
+        if listener_reconciler is not None:
+            listener_reconciler.forget(arg)
+        chat.SendMsg(content + fail_text + ", ".join(listen_list))
+
+
+@admin_commands.command("/删除用户", exact=False)
+def cmd_remove_user(chat, content, arg):
+    remove_user(arg)
+    sync_wx_listeners() # 增量移除监听窗口
+    chat.SendMsg(content + ' 完成\n' + ", ".join(listen_list))
+
+
+@admin_commands.command("/当前群")
+def cmd_current_groups(chat, content, arg):
+    chat.SendMsg(content + '\n'+ ", ".join(group))
+
+
+@admin_commands.command("/添加群", exact=False)
+def cmd_add_group(chat, content, arg):
+    def report_group_failure():
+        chat.SendMsg(content + ' 失败\n请重新配置群名称或者检查机器人号是否在群内\n当前群:\n' + ", ".join(group) + '\n当前群机器人状态:'+group_switch)
+
+    def on_group_added(result):
+        if arg in result['failed']:
+            remove_group(arg)
+            listener_reconciler.forget(arg)  # 已回滚配置，不再后台重试
+            report_group_failure()
+        else:
+            chat.SendMsg(content + ' 完成\n' + ", ".join(group))
+    try:
+        add_group(arg)
+        sync_wx_listeners(chat, on_done=on_group_added)
+    except Exception:
+        logger.exception("添加监听群组失败: %s", arg)
+        remove_group(arg)
+        if listener_reconciler is not None:
+            listener_reconciler.forget(arg)
+        set_group_switch("False")
+        sync_wx_listeners()
+        report_group_failure()
+
+
+@admin_commands.command("/删除群", exact=False)
+def cmd_remove_group(chat, content, arg):
+    remove_group(arg) # 在配置中删除
+    sync_wx_listeners() # 增量移除监听窗口
+    chat.SendMsg(content + ' 完成\n' + ", ".join(group))
+
+
+@admin_commands.command("/开启群机器人")
+def cmd_enable_group_bot(chat, content, arg):
+    try:
+        set_group_switch("True")
+        sync_wx_listeners(on_done=lambda result: chat.SendMsg(
+            content + ' 完成\n' + '当前群：\n' + ", ".join(group) + '\n' + format_sync_result(result)))
+    except Exception as e:
+        logger.exception("开启群机器人失败")
+        set_group_switch("False")
+        sync_wx_listeners(include_groups=False)
+        chat.SendMsg(content + ' 失败\n请重新配置群名称或者检查机器人号是否在群或者群名中是否含有非法中文字符\n当前群:'+ ", ".join(group) +'\n当前群机器人状态:'+group_switch)
+
+
+@admin_commands.command("/关闭群机器人")
+def cmd_disable_group_bot(chat, content, arg):
+    set_group_switch("False")
+    sync_wx_listeners(include_groups=False) # 增量移除群组监听窗口
+    chat.SendMsg(content + ' 完成\n' +'当前群：\n' + ", ".join(group))
+
+
+@admin_commands.command("/群机器人状态")
+def cmd_group_bot_status(chat, content, arg):
+    if group_switch == 'False':
+        chat.SendMsg(content + '为关闭')
+    else:
+        chat.SendMsg(content + '为开启')
+
+
+@admin_commands.command("/开启群机器人欢迎语")
+def cmd_enable_group_welcome(chat, content, arg):
+    global group_welcome
+    group_welcome = True
+    chat.SendMsg(content + ' 完成\n' +'当前群：\n' + ", ".join(group))
+
+
+@admin_commands.command("/关闭群机器人欢迎语")
+def cmd_disable_group_welcome(chat, content, arg):
+    global group_welcome
+    group_welcome = False
+    chat.SendMsg(content + ' 完成\n' +'当前群：\n' + ", ".join(group))
+
+
+@admin_commands.command("/群机器人欢迎语状态")
+def cmd_group_welcome_status(chat, content, arg):
+    if group_welcome:
+        chat.SendMsg("/群机器人欢迎语状态 为开启\n" +'当前群：\n' + ", ".join(group))
+    else:
+        chat.SendMsg("/群机器人欢迎语状态 为关闭\n" +'当前群：\n' + ", ".join(group))
+
+
+@admin_commands.command("/当前群机器人欢迎语")
+def cmd_current_group_welcome(chat, content, arg):
+    chat.SendMsg(content + '\n' +group_welcome_msg)
+
+
+@admin_commands.command("/更改群机器人欢迎语为", exact=False)
+def cmd_set_group_welcome(chat, content, arg):
+    global group_welcome_msg
+    group_welcome_msg = arg
+    chat.SendMsg('群机器人欢迎语已更新\n' + group_welcome_msg)
+
+
+@admin_commands.command("/当前模型", help="（返回当前模型）")
+def cmd_current_model(chat, content, arg):
+    chat.SendMsg(content + " " + DS_NOW_MOD)
+
+
+def _switch_model_command(index, help=""):
+    """注册 /切换模型N 指令"""
+    @admin_commands.command(f"/切换模型{index}", help=help)
+    def cmd_switch_model(chat, content, arg):
+        global DS_NOW_MOD
+        DS_NOW_MOD = globals()[f"model{index}"]
+        chat.SendMsg(content + ' 完成\n当前模型:' + DS_NOW_MOD)
+    return cmd_switch_model
+
+
+_switch_model_command(1, help="（切换回复模型为配置中的 model1）")
+_switch_model_command(2)
+_switch_model_command(3)
+_switch_model_command(4)
+
+
+@admin_commands.command("/当前AI设定", help="（返回当前AI设定）")
+def cmd_current_prompt(chat, content, arg):
+    chat.SendMsg('当前AI设定：\n' + config['prompt'])
+
+
+@admin_commands.command("/更改AI设定为", help="（更改AI设定，***为AI设定）", exact=False, aliases=("/更改ai设定为",))
+def cmd_set_prompt(chat, content, arg):
+    config['prompt'] = arg
+    save_config()
+    refresh_config()
+    chat.SendMsg('AI设定已更新\n' + config['prompt'])
+
+
+@admin_commands.command("/更新配置", help="（若在程序运行时修改过配置，请发送此指令以更新配置）")
+def cmd_reload_config(chat, content, arg):
+    refresh_config()
+    sync_wx_listeners(on_done=lambda result: chat.SendMsg(content + ' 完成\n' + format_sync_result(result)))
+
+
+@admin_commands.command("/当前版本", help="(返回当前版本)")
+def cmd_version(chat, content, arg):
+    chat.SendMsg(content + 'wxbot_' + ver + '\n' + ver_log + '\n作者:dolphi')
+
+
+@admin_commands.command("/指令", aliases=("指令",))
+def cmd_help(chat, content, arg):
+    chat.SendMsg(admin_commands.help_text(
+        header='指令列表[发送中括号里内容]：',
+        footer='作者:dolphi  若有非法传播请告知'
+    ))
+
+
+def process_message(chat, message, received_at=None, link_url=None, transcript=None):
     """
     处理收到的单条消息，并根据不同情况调用 DeepSeek API 或执行命令
 
     参数:
         chat: 消息所属的会话对象（包含 who 等信息）
         message: 消息对象（包含 type, sender, content 等信息）
+        received_at: 监听回调收到消息的时间（time.monotonic()），用于链路追踪
+        link_url: 在RPA线程中获取的链接URL（获取完成后重新处理时传入，空字符串表示未取到）
+        transcript: 语音消息的转写文本（转写完成后重新处理时传入，空字符串表示转写失败）
     """
-    global DS_NOW_MOD, group_welcome, group_welcome_msg
-
-
 
     # 只处理好友消息
     if message.attr != 'friend':
         return
 
-    print(now_time()+f"\n{chat.who} 窗口 {message.sender} 说：{message.content}")
-    # print(message.info) # 原始消息
+    # 链接消息先在RPA线程中获取URL，完成后再回到这里处理
+    if link_url is None and needs_link_url(message):
+        resolve_link_url_then_process(chat, message, received_at)
+        return
+
+    # 语音消息先转文字，完成后再回到这里按转写内容处理
+    if transcript is None and needs_voice_transcript(message):
+        transcribe_voice_then_process(chat, message, received_at)
+        return
+
+    # 消息内容只在DEBUG级别输出
+    logger.debug("%s 窗口 %s 说：%s", chat.who, message.sender, message.content)
 
     # 预处理消息内容，特别处理链接消息等特殊类型
-    processed_content = preprocess_message_content(message)
+    processed_content = preprocess_message_content(message, link_url)
 
     # 如果返回None，说明消息类型不在允许处理列表中，直接返回
     if processed_content is None:
-        print(now_time()+f"消息类型不在允许处理列表中，跳过处理：{message.content}")
+        logger.debug("消息类型不在允许处理列表中，跳过处理：%s", message.content)
         return
 
     if processed_content != message.content:
-        print(now_time()+f"消息预处理：{message.content} -> {processed_content[:100]}...")
+        logger.debug("消息预处理：%s -> %s...", message.content, processed_content[:100])
+
+    # 规范化消息内容（@识别、空白与表情标签），后续各环节复用同一结果
+    if transcript:
+        # 语音消息按转写文本进行@判断与路由
+        normalized = message_normalizer.normalize(transcript)
+        processed_content = f"[语音转文字] {normalized.text}"
+    else:
+        normalized = message_normalizer.normalize(message.content)
+        if processed_content == message.content:
+            # 普通文本使用规范化后的内容；特殊类型的预处理结果中不含@
+            processed_content = normalized.text
 
     # 检查是否为需要监听的对象（使用新版 listen_rules）
     listen_rules = config.get('listen_rules', {})
@@ -818,7 +1230,7 @@ def process_message(chat, message):
         return
 
     # 如果用户询问“你是谁”，直接回复机器人名称
-    if message.content == '你是谁' or re.sub(AtMe, "", message.content).strip() == '你是谁':
+    if normalized.plain == '你是谁':
         chat.SendMsg('我是' + bot_name)
         return 
 
@@ -837,257 +1249,120 @@ def process_message(chat, message):
             at_required = True
         
         # 根据 at_required 设置决定是否处理消息
-        should_reply = False
-        content_to_process = message.content
-        
-        if at_required:
-            # 需要 @ 才回复
-            if AtMe in message.content:
-                should_reply = True
-                content_to_process = re.sub(AtMe, "", message.content).strip()
-        else:
-            # 不需要 @，直接回复
-            should_reply = True
-            content_to_process = message.content
-        
+        # 需要 @ 时仅在@了机器人时回复，不需要 @ 时直接回复
+        should_reply = normalized.mentioned or not at_required
+
         if should_reply:
-            print(now_time()+f"群组 {chat.who} 消息（@要求: {at_required}）：{content_to_process}")
+            logger.debug("群组 %s 消息（@要求: %s）：%s", chat.who, at_required, normalized.text)
             # 创建临时消息对象用于异步处理，使用预处理后的内容
             # 如果预处理返回None，说明消息类型不允许处理，直接返回
             if processed_content is None:
-                print(now_time()+f"群组消息类型不在允许处理列表中，跳过处理：{message.content}")
+                logger.debug("群组消息类型不在允许处理列表中，跳过处理：%s", message.content)
                 return
 
-            if AtMe in message.content:
-                # 如果原消息包含@，使用去除@后的预处理内容
-                final_content = re.sub(AtMe, "", processed_content).strip()
-            else:
-                # 否则直接使用预处理后的内容
-                final_content = processed_content
-
-            temp_message = type('obj', (object,), {
-                'content': final_content,
-                'sender': message.sender,
-                'attr': message.attr,
-                'type': getattr(message, 'type', 'text'),  # 添加消息类型
-                'info': getattr(message, 'info', {})  # 保留原始信息用于链接解析
-            })
+            envelope = MessageEnvelope.from_message(message, chat, processed_content, route='group',
+                                                    received_at=received_at, transcript=transcript)
             # 使用异步处理群组消息
-            wx_send_ai(chat, temp_message)
+            wx_send_ai(chat, envelope)
             return
         return
 
-    # 命令处理：当消息来自指定命令账号时，执行相应的管理操作
+    # 命令处理：当消息来自指定命令账号时，执行相应的管理操作（指令在独立线程中异步执行）
     if chat.who == cmd:
-        if "/添加用户" in message.content:
-            try:
-                user_to_add = re.sub("/添加用户", "", message.content).strip()
-                add_user(user_to_add)
-                init_wx_listeners()
-                chat.SendMsg(message.content + ' 完成\n' + ", ".join(listen_list))
-            except:
-                user_to_add = re.sub("/添加用户", "", message.content).strip()
-                remove_user(user_to_add)
-                init_wx_listeners()
-                chat.SendMsg(message.content + ' 失败\n请检查添加的用户是否为好友或者备注是否正确或者备注名 昵称中是否含有非法中文字符\n当前用户：\n'+", ".join(listen_list))
-        elif "/删除用户" in message.content:
-            user_to_remove = re.sub("/删除用户", "", message.content).strip()
-            # if is_wxautox: # 如果是wxautox则删除监听窗口
-            wx.RemoveListenChat(user_to_remove) # 删除监听窗口
-            remove_user(user_to_remove)
-            # init_wx_listeners()
-            chat.SendMsg(message.content + ' 完成\n' + ", ".join(listen_list))
-        elif "/当前用户" == message.content:
-            chat.SendMsg(message.content + '\n' + ", ".join(listen_list))
-        elif "/当前群" == message.content:
-            chat.SendMsg(message.content + '\n'+ ", ".join(group))
-        elif "/群机器人状态" == message.content:
-            if group_switch == 'False':
-                chat.SendMsg(message.content + '为关闭')
-            else:
-                chat.SendMsg(message.content + '为开启')
-        elif "/添加群" in message.content:
-            try:
-                new_group = re.sub("/添加群", "", message.content).strip()
-                # if is_wxautox: # 如果是wxautox则删除群组监听窗口
-                # wx.RemoveListenChat(config.get('group')) # 删除群组监听窗口
-                add_group(new_group)
-                init_wx_listeners()
-                chat.SendMsg(message.content + ' 完成\n' + ", ".join(group))
-            except Exception:
-                print(traceback.format_exc())
-                remove_group(new_group)
-                set_group_switch("False")
-                init_wx_listeners()
-                chat.SendMsg(message.content + ' 失败\n请重新配置群名称或者检查机器人号是否在群内\n当前群:\n' + ", ".join(group) + '\n当前群机器人状态:'+group_switch)
-        elif "/删除群" in message.content:
-            group_to_remove = re.sub("/删除群", "", message.content).strip()
-            wx.RemoveListenChat(group_to_remove) # 删除监听窗口
-            remove_group(group_to_remove) # 在配置中删除
-            chat.SendMsg(message.content + ' 完成\n' + ", ".join(group))
-        elif message.content == "/开启群机器人":
-            try:
-                set_group_switch("True")
-                init_wx_listeners()
-                chat.SendMsg(message.content + ' 完成\n' +'当前群：\n'+", ".join(group))
-            except Exception as e:
-                print(traceback.format_exc())
-                set_group_switch("False")
-                init_wx_listeners()
-                chat.SendMsg(message.content + ' 失败\n请重新配置群名称或者检查机器人号是否在群或者群名中是否含有非法中文字符\n当前群:'+ ", ".join(group) +'\n当前群机器人状态:'+group_switch)
-        elif message.content == "/关闭群机器人":
-            set_group_switch("False")
-            # if is_wxautox: # 如果是wxautox则删除群组监听窗口
-            for user in group:
-                wx.RemoveListenChat(user) # 删除群组监听窗口
-            # init_wx_listeners()
-            chat.SendMsg(message.content + ' 完成\n' +'当前群：\n' + ", ".join(group))
-        elif message.content == "/开启群机器人欢迎语":
-            group_welcome = True
-            chat.SendMsg(message.content + ' 完成\n' +'当前群：\n' + ", ".join(group))
-        elif message.content == "/关闭群机器人欢迎语":
-            group_welcome = False
-            chat.SendMsg(message.content + ' 完成\n' +'当前群：\n' + ", ".join(group))
-        elif message.content == "/群机器人欢迎语状态":
-            if group_welcome:
-                chat.SendMsg("/群机器人欢迎语状态 为开启\n" +'当前群：\n' + ", ".join(group))
-            else:
-                chat.SendMsg("/群机器人欢迎语状态 为关闭\n" +'当前群：\n' + ", ".join(group))
-        elif message.content == "/当前群机器人欢迎语":
-            chat.SendMsg(message.content + '\n' +group_welcome_msg)
-        elif "/更改群机器人欢迎语为" in message.content:
-            new_welcome = re.sub("/更改群机器人欢迎语为", "", message.content).strip()
-            group_welcome_msg = new_welcome
-            chat.SendMsg('群机器人欢迎语已更新\n' + group_welcome_msg)
-        elif message.content == "/当前模型":
-            chat.SendMsg(message.content + " " + DS_NOW_MOD)
-        elif message.content == "/切换模型1": # 1
-            # global DS_NOW_MOD
-            DS_NOW_MOD = model1
-            chat.SendMsg(message.content + ' 完成\n当前模型:' + DS_NOW_MOD)
-        elif message.content == "/切换模型2": # 2
-            # global DS_NOW_MOD
-            DS_NOW_MOD = model2
-            chat.SendMsg(message.content + ' 完成\n当前模型:' + DS_NOW_MOD)
-        elif message.content == "/切换模型3": # 3
-            # global DS_NOW_MOD
-            DS_NOW_MOD = model3
-            chat.SendMsg(message.content + ' 完成\n当前模型:' + DS_NOW_MOD)
-        elif message.content == "/切换模型4": # 4
-            # global DS_NOW_MOD
-            DS_NOW_MOD = model4
-            chat.SendMsg(message.content + ' 完成\n当前模型:' + DS_NOW_MOD)
-        elif message.content == "/当前AI设定":
-            chat.SendMsg('当前AI设定：\n' + config['prompt'])
-        elif "/更改AI设定为" in message.content or "/更改ai设定为" in message.content:
-            if "AI设定" in message.content:
-                new_prompt = re.sub("/更改AI设定为", "", message.content).strip()
-            else:
-                new_prompt = re.sub("/更改ai设定为", "", message.content).strip()
-            config['prompt'] = new_prompt
-            save_config()
-            refresh_config()
-            chat.SendMsg('AI设定已更新\n' + config['prompt'])
-        elif message.content == "/更新配置":
-            refresh_config()
-            init_wx_listeners()
-            chat.SendMsg(message.content + ' 完成\n')
-        elif message.content == "/当前版本":
-            global ver
-            chat.SendMsg(message.content + 'wxbot_' + ver + '\n' + ver_log + '\n作者:dolphi')
-        elif message.content == "/指令" or message.content == "指令":
-            commands = (
-                '指令列表[发送中括号里内容]：\n'
-                '[/当前用户] (返回当前监听用户列表)\n'
-                '[/添加用户***] （将用户***添加进监听列表）\n'
-                '[/删除用户***]\n'
-                '[/当前群]\n'
-                '[/添加群***] \n'
-                '[/删除群***] \n'
-                '[/开启群机器人]\n'
-                '[/关闭群机器人]\n'
-                '[/群机器人状态]\n'
-                '[/开启群机器人欢迎语]\n'
-                '[/关闭群机器人欢迎语]\n'
-                '[/群机器人欢迎语状态]\n'
-                '[/当前群机器人欢迎语]\n'
-                '[/更改群机器人欢迎语为***]\n'
-                '[/当前模型] （返回当前模型）\n'
-                '[/切换模型1] （切换回复模型为配置中的 model1）\n'
-                '[/切换模型2]\n'
-                '[/切换模型3]\n'
-                '[/切换模型4]\n'
-                '[/当前AI设定] （返回当前AI设定）\n'
-                '[/更改AI设定为***] （更改AI设定，***为AI设定）\n'
-                '[/更新配置] （若在程序运行时修改过配置，请发送此指令以更新配置）\n'
-                '[/当前版本] (返回当前版本)\n'
-                '作者:dolphi  若有非法传播请告知'
-            )
-            chat.SendMsg(commands)
-        else:
-            # 默认：使用预处理后的内容回复 AI 生成的消息
-            # 如果预处理返回None，说明消息类型不允许处理，直接返回
-            if processed_content is None:
-                print(now_time()+f"管理员消息类型不在允许处理列表中，跳过处理：{message.content}")
-                return
+        # 语音转写内容不作为管理员指令执行
+        if transcript is None and admin_commands.dispatch(chat, normalized.text):
+            return
+        # 默认：使用预处理后的内容回复 AI 生成的消息
+        # 如果预处理返回None，说明消息类型不允许处理，直接返回
+        if processed_content is None:
+            logger.debug("管理员消息类型不在允许处理列表中，跳过处理：%s", message.content)
+            return
 
-            processed_message = type('obj', (object,), {
-                'content': processed_content,
-                'sender': message.sender,
-                'attr': message.attr,
-                'info': getattr(message, 'info', {})  # 保留原始信息用于链接解析
-            })
-            wx_send_ai(chat, processed_message)
+        envelope = MessageEnvelope.from_message(message, chat, processed_content, route='admin',
+                                                received_at=received_at, transcript=transcript)
+        wx_send_ai(chat, envelope)
         return
 
     # 普通好友消息：使用预处理后的内容调用 AI 接口获取回复
     # 如果预处理返回None，说明消息类型不允许处理，直接返回
     if processed_content is None:
-        print(now_time()+f"好友消息类型不在允许处理列表中，跳过处理：{message.content}")
+        logger.debug("好友消息类型不在允许处理列表中，跳过处理：%s", message.content)
         return
 
-    # 创建包含预处理内容的消息对象
-    processed_message = type('obj', (object,), {
-        'content': processed_content,
-        'sender': message.sender,
-        'attr': message.attr,
-        'info': getattr(message, 'info', {})  # 保留原始信息用于链接解析
-    })
-    wx_send_ai(chat, processed_message)
+    # 创建包含预处理内容的消息信封
+    envelope = MessageEnvelope.from_message(message, chat, processed_content, route='user',
+                                            received_at=received_at, transcript=transcript)
+    wx_send_ai(chat, envelope)
+
+def warm_up_connectors():
+    """
+    预热API连接器：按已启用的接口配置导入对应的连接器模块（OpenAI兼容平台需导入较重的 openai 包），
+    并创建共享HTTP会话；在后台线程中与监听器初始化并行执行，避免首条消息承担导入开销
+    """
+    platforms = {api_config.get('platform', 'openai').lower()
+                 for api_config in config.get('api_configs', []) if api_config.get('enabled', True)}
+    from API import get_session
+    get_session()
+    if platforms - {'ragflow', 'coze', 'dify'} or (api_key and base_url):
+        import openai  # noqa: F401  只为提前完成导入
+    logger.info("API连接器预热完成: %s", ', '.join(sorted(platforms)) or '无接口配置')
+
+
+def _start_connector_warmup() -> threading.Thread:
+    """在后台线程中预热API连接器（计入启动阶段 connectors）"""
+    def run():
+        try:
+            with startup.phase('connectors'):
+                warm_up_connectors()
+        except Exception as e:
+            logger.warning("API连接器预热失败（将在首次调用时重试导入）: %s", e)
+
+    thread = threading.Thread(target=run, name="connector_warmup", daemon=True)
+    thread.start()
+    return thread
+
 
 run_flag = True  # 运行标记，用于控制程序退出
 def main():
     # 输出版本信息
     global ver, run_flag
-    print(f"wxbot\n版本: wxbot_{ver}\n作者: dolphi")
-    
+    # 配置日志（由图形界面启动时已配置，此处只会更新级别）
+    setup_logging()
+    logger.info("wxbot\n版本: wxbot_%s\n作者: dolphi", ver)
+
     # 加载配置并更新全局变量
-    refresh_config()
+    with startup.phase('config'):
+        refresh_config()
     
     # 启动异步消息处理器
-    print(now_time() + "启动异步消息处理器...")
-    async_message_handler.async_handler.start()
+    logger.info("启动异步消息处理器...")
+    with startup.phase('async_handler'):
+        async_message_handler.async_handler.start()
 
+    # API连接器预热与微信监听器初始化并行进行（后者主要等待微信UI）
+    warmup = _start_connector_warmup()
     try:
         # 初始化微信监听器
-        init_wx_listeners()
+        with startup.phase('listeners'):
+            init_wx_listeners()
     except Exception as e:
-        print(traceback.format_exc())
-        print("初始化微信监听器失败，请检查微信是否启动登录正确")
+        logger.exception("初始化微信监听器失败，请检查微信是否启动登录正确")
         run_flag = False
+    warmup.join(timeout=30)
 
     
     wait_time = 1  # 每1秒检查一次新消息
     check_interval = 10  # 每10次循环检查一次进程状态
     check_counter = 0
-    print(now_time()+'dolphin_wxbot初始化完成，开始监听消息(作者:dolphi)')
+    logger.info("dolphin_wxbot初始化完成，开始监听消息(作者:dolphi)")
+    logger.info("%s", startup.report())
     
     # 发送启动通知给管理员（如果配置了）
     if cmd and wx:
         try:
-            wx.SendMsg('dolphin_wxbot初始化完成', who=cmd)
+            rpa.submit(wx.SendMsg, 'dolphin_wxbot初始化完成', who=cmd, name="startup_notice").result(timeout=30)
         except:
-            print("发送启动通知给管理员失败")
+            logger.warning("发送启动通知给管理员失败")
     
     # 主循环：保持运行
     while run_flag:
@@ -1098,9 +1373,9 @@ def main():
         if check_counter % check_interval == 0:
             status = async_message_handler.async_handler.get_status()
             if status['queue_size'] > 0 or status['processing_count'] > 0:
-                print(f"{now_time()}异步处理器状态: 队列:{status['queue_size']}, 处理中:{status['processing_count']}")
-    
-    print(now_time()+'dolphin_wxbot已停止运行')
+                logger.info("异步处理器状态: 队列:%s, 处理中:%s", status['queue_size'], status['processing_count'])
+
+    logger.info("dolphin_wxbot已停止运行")
 
 def start_bot():
     """启动机器人"""
@@ -1108,26 +1383,31 @@ def start_bot():
 def stop_bot():
     """停止机器人"""
     global run_flag, wx
-    print(now_time() + "正在停止机器人...")
+    logger.info("正在停止机器人...")
     
     # 停止异步消息处理器（优先处理队列中的消息）
     try:
-        print(now_time() + "停止异步消息处理器...")
+        logger.info("停止异步消息处理器...")
         async_message_handler.async_handler.stop()
     except Exception as e:
-        print(f"停止异步消息处理器时出现异常: {e}")
+        logger.warning("停止异步消息处理器时出现异常: %s", e)
     
+    # 丢弃尚未处理的消息、管理员指令和UI任务
+    admin_commands.shutdown()
+    message_dispatcher.cancel_pending()
+    rpa.cancel_pending()
+
     # 停止wxauto监听器（若已初始化）
     try:
-        print(now_time() + "停止微信监听器...")
+        logger.info("停止微信监听器...")
         if wx:
             wx.StopListening()
     except Exception as e:
-        print(f"停止监听器时出现异常: {e}")
+        logger.warning("停止监听器时出现异常: %s", e)
     
     # 标记主循环退出
     run_flag = False
-    print(now_time()+"dolphin_wxbot已停止运行")
+    logger.info("dolphin_wxbot已停止运行")
 
 if __name__ == "__main__":
     main()  # 执行主函数